@@ -0,0 +1,117 @@
+"""
+Parsing helpers for the agents' <accounting_entry> output and the <transaction> block of
+the junior prompt, shared by the junior/senior pipeline and the evaluation scripts.
+
+    entry = parse_entry(llm_output)
+    posting = target_posting(entry, "Assets:Lloyds:Checking")
+    posting["account"]  # -> "Expenses:Food:Coffee"
+"""
+import re
+from decimal import Decimal, InvalidOperation
+
+ENTRY_RE = re.compile(r"<entry>(.*?)</entry>", re.DOTALL)
+HEADER_RE = re.compile(r'^\s*(\d{4}-\d{2}-\d{2})\s+([*!])\s*(?:"([^"]*)")?\s*(?:"([^"]*)")?')
+POSTING_RE = re.compile(
+    r"^\s*((?:Assets|Liabilities|Expenses|Income|Equity)(?::\s*[A-Za-z0-9][A-Za-z0-9-]*)+)"
+    r"(?:\s+([-+]?[\d,]*\.?\d+)\s+([A-Z][A-Z0-9'._-]*))?"
+)
+ACCOUNT_SPACE_RE = re.compile(r"(Assets|Liabilities|Expenses|Income|Equity):\s+")
+
+TXN_FIELDS = {
+    "date": r"Date:\s*(\S+)",
+    "payee": r"Payee:\s*(.*)",
+    "description": r"Description:\s*(.*)",
+    "amount": r"Amount:\s*(\S+)\s+(\S+)",
+    "source": r"Source Account:\s*(.*)",
+}
+TRANSACTION_RE = re.compile(r"<transaction>(.*?)</transaction>", re.DOTALL)
+
+
+def normalise_account(account):
+    """'Assets: Lloyds:Checking' -> 'Assets:Lloyds:Checking' (the janitor's space fix)."""
+    return ACCOUNT_SPACE_RE.sub(r"\1:", account.strip())
+
+
+def parse_transaction(prompt):
+    """Reads Date/Payee/Description/Amount/Source Account from the junior prompt's <transaction> block."""
+    match = TRANSACTION_RE.search(prompt)
+    block = match.group(1) if match else prompt
+    found = {key: re.search(pattern, block) for key, pattern in TXN_FIELDS.items()}
+    txn = {
+        "date": found["date"].group(1) if found["date"] else None,
+        "payee": found["payee"].group(1).strip() if found["payee"] else "Unknown",
+        "description": found["description"].group(1).strip() if found["description"] else "",
+        "source": normalise_account(found["source"].group(1)) if found["source"] else None,
+        "amount": None,
+        "currency": None,
+    }
+    if found["amount"]:
+        try:
+            txn["amount"] = Decimal(found["amount"].group(1))
+            txn["currency"] = found["amount"].group(2)
+        except InvalidOperation:
+            pass
+    return txn
+
+
+def parse_entry(text):
+    """
+    Parses the Beancount code inside <entry>...</entry>. Returns None if there is no entry
+    or no postings. Each posting carries its character span in `text` (start/end of the
+    account name), so token log-probabilities can be lined up with it.
+    """
+    match = ENTRY_RE.search(text or "")
+    if not match:
+        return None
+
+    entry = {"date": None, "flag": None, "payee": None, "narration": None, "postings": []}
+    offset = match.start(1)
+    for line in match.group(1).split("\n"):
+        header = HEADER_RE.match(line)
+        if header and entry["date"] is None:
+            entry["date"], entry["flag"], entry["payee"], entry["narration"] = header.groups()
+        else:
+            posting = POSTING_RE.match(line)
+            if posting:
+                amount = None
+                if posting.group(2):
+                    try:
+                        amount = Decimal(posting.group(2).replace(",", ""))
+                    except InvalidOperation:
+                        pass
+                entry["postings"].append({
+                    "account": normalise_account(posting.group(1)),
+                    "amount": amount,
+                    "currency": posting.group(3),
+                    "start": offset + posting.start(1),
+                    "end": offset + posting.end(1),
+                })
+        offset += len(line) + 1
+
+    return entry if entry["postings"] else None
+
+
+def target_posting(entry, source_account=None):
+    """
+    The posting the model actually had to decide on: the first one that isn't the
+    source (bank) account. Without a source account, the first non-Assets posting.
+    """
+    if not entry:
+        return None
+    source = normalise_account(source_account) if source_account else None
+    for posting in entry["postings"]:
+        if source and posting["account"] != source:
+            return posting
+        if not source and not posting["account"].startswith("Assets:"):
+            return posting
+    return None
+
+
+def is_balanced(entry):
+    """True if every posting has an amount and each currency sums to zero."""
+    if not entry or any(p["amount"] is None for p in entry["postings"]):
+        return False
+    totals = {}
+    for p in entry["postings"]:
+        totals[p["currency"]] = totals.get(p["currency"], Decimal(0)) + p["amount"]
+    return all(total == 0 for total in totals.values())
@@ -0,0 +1,148 @@
+"""
+Shared reader/writer for pipeline artefacts (Label Studio tasks, training pairs, reports).
+
+The format comes from the file name, so every stage accepts the same names:
+
+  tasks.json           plain JSON (indent=2, as before: readable, Label Studio imports it)
+  tasks.jsonl          one record per line
+  tasks.json.gz        gzip-compressed (stdlib)
+  tasks.jsonl.zst      zstd-compressed (needs `pip install zstandard`)
+
+Compressed files are written without indentation. Indented .json is always written by
+the json module, so it is byte-for-byte what json.dump(indent=2) wrote before (non-ASCII
+escaped). Everything else is encoded and decoded with orjson when it is installed, the json
+module otherwise; either reads the other's files. orjson writes non-ASCII as UTF-8 instead
+of ASCII escapes, so compact files differ in bytes but not in data. NumPy scalars and arrays
+are written as plain numbers/lists on both paths.
+
+    from artefact_io import load, save
+    tasks = load("pre_senior_accountant.json.zst")
+    save(tasks, "training_data.jsonl.gz")
+
+    with JsonlWriter("pre_senior_accountant.jsonl") as out:   # Records written as they come
+        out.write(task)
+"""
+import gzip
+import io
+import json
+import os
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# ================= CONFIGURATION =================
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3   # zstd's default: much faster than gzip at a similar ratio
+JSON_INDENT = 2  # Uncompressed .json only
+
+
+def compression(filename):
+    """'gzip', 'zstd' or None, from the file extension."""
+    if filename.endswith(".gz"):
+        return "gzip"
+    if filename.endswith(".zst"):
+        return "zstd"
+    return None
+
+
+def is_jsonl(filename):
+    base = filename[:-len(os.path.splitext(filename)[1])] if compression(filename) else filename
+    return base.endswith(".jsonl")
+
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError("Reading/writing .zst artefacts needs zstandard (pip install zstandard)") from None
+    return zstandard
+
+
+def open_artefact(filename, mode='rb'):
+    """A binary file handle ('rb' or 'wb') that (de)compresses according to the extension."""
+    kind = compression(filename)
+    if kind == "gzip":
+        return gzip.open(filename, mode, compresslevel=GZIP_LEVEL) if 'w' in mode else gzip.open(filename, mode)
+    if kind == "zstd":
+        zstandard = _zstd()
+        if 'w' in mode:
+            return zstandard.ZstdCompressor(level=ZSTD_LEVEL).stream_writer(open(filename, mode), closefd=True)
+        return zstandard.ZstdDecompressor().stream_reader(open(filename, mode), closefd=True)
+    return open(filename, mode)
+
+
+def _default(obj):
+    """NumPy values (e.g. numpy.float64 scores) for the json module."""
+    if hasattr(obj, "tolist"):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj, indent=None):
+    """JSON bytes; indented output comes from the json module, compact output from orjson if installed."""
+    if orjson is not None and not indent:
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY, default=_default)
+    return json.dumps(obj, indent=indent or None, default=_default).encode("utf-8")
+
+
+def loads(data):
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+def load(filename):
+    """A .json file's object, or a .jsonl file's records as a list (compressed or not)."""
+    if is_jsonl(filename):
+        return list(iter_jsonl(filename))
+    with open_artefact(filename, 'rb') as f:
+        return loads(f.read())
+
+
+def iter_jsonl(filename):
+    """Records of a (possibly compressed) .jsonl file, one at a time."""
+    with open_artefact(filename, 'rb') as f:
+        for line in io.BufferedReader(f) if compression(filename) == "zstd" else f:
+            if line.strip():
+                yield loads(line)
+
+
+def save(obj, filename, indent=None):
+    """
+    Writes a .json file or, for .jsonl, one line per record of `obj`. Creates the parent
+    directory. indent=None means indent=2 for plain .json and none when compressed; 0 = none.
+    """
+    os.makedirs(os.path.dirname(filename) or ".", exist_ok=True)
+    with open_artefact(filename, 'wb') as f:
+        if is_jsonl(filename):
+            for record in obj:
+                f.write(dumps(record) + b"\n")
+        else:
+            if indent is None and not compression(filename):
+                indent = JSON_INDENT
+            f.write(dumps(obj, indent))
+
+
+class JsonlWriter:
+    """Appends records to a new (possibly compressed) .jsonl file one at a time, e.g. as a stage produces them."""
+
+    def __init__(self, filename):
+        if not is_jsonl(filename):
+            raise ValueError(f"{filename}: records are streamed as JSONL (.jsonl, .jsonl.gz or .jsonl.zst)")
+        os.makedirs(os.path.dirname(filename) or ".", exist_ok=True)
+        self.filename = filename
+        self.count = 0
+        self._file = open_artefact(filename, 'wb')
+
+    def write(self, record):
+        self._file.write(dumps(record) + b"\n")
+        self.count += 1
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,234 @@
+"""
+Queryable store for pipeline artefacts: an embedded SQLite database with full-text indexes
+over prompts and model outputs, so ad-hoc questions don't reload whole JSON files.
+
+  tasks     one row per distinct prompt (keyed by its hash) with the parsed transaction
+  outputs   junior predictions, senior annotations, training responses... (stage, file, text, score)
+  entries   each output's parsed <entry>: header, target account, balanced, postings
+  *_fts     FTS5 indexes over tasks.prompt and outputs.text
+
+Set ARTEFACT_DB=artefacts.db and the junior (save_for_label_studio) and senior (run_audit)
+ingest what they save. Older files can be loaded by hand; re-ingesting a file replaces it.
+
+    python artefact_store.py ingest data/json/training_data.json data/json/refined_data.json
+    python artefact_store.py count "### Analysis"
+    python artefact_store.py corrections --limit 10
+    python artefact_store.py sql "SELECT stage, count(*) FROM outputs GROUP BY stage"
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import time
+
+from accounting_entry import is_balanced, parse_entry, parse_transaction, target_posting
+from task_store import load_tasks
+
+# ================= CONFIGURATION =================
+ARTEFACT_DB = os.getenv("ARTEFACT_DB", "")  # Empty = the pipeline doesn't ingest anything
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    task_key TEXT PRIMARY KEY,
+    transaction_id TEXT,
+    date TEXT, payee TEXT, description TEXT, amount REAL, currency TEXT, source_account TEXT,
+    prompt TEXT
+);
+CREATE TABLE IF NOT EXISTS outputs (
+    id INTEGER PRIMARY KEY,
+    task_key TEXT NOT NULL REFERENCES tasks(task_key),
+    stage TEXT NOT NULL,
+    source_file TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    model_version TEXT,
+    score REAL,
+    text TEXT,
+    ingested_at REAL
+);
+CREATE TABLE IF NOT EXISTS entries (
+    output_id INTEGER PRIMARY KEY REFERENCES outputs(id) ON DELETE CASCADE,
+    date TEXT, flag TEXT, payee TEXT, narration TEXT,
+    target_account TEXT,
+    balanced INTEGER,
+    postings TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_payee ON tasks(payee);
+CREATE INDEX IF NOT EXISTS idx_tasks_transaction ON tasks(transaction_id);
+CREATE INDEX IF NOT EXISTS idx_outputs_task ON outputs(task_key, stage);
+CREATE INDEX IF NOT EXISTS idx_outputs_file ON outputs(source_file);
+CREATE INDEX IF NOT EXISTS idx_entries_target ON entries(target_account);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS outputs_fts USING fts5(text, content='outputs', content_rowid='id');
+CREATE VIRTUAL TABLE IF NOT EXISTS prompts_fts USING fts5(prompt, content='tasks', content_rowid='rowid');
+CREATE TRIGGER IF NOT EXISTS outputs_ai AFTER INSERT ON outputs BEGIN
+    INSERT INTO outputs_fts(rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS outputs_ad AFTER DELETE ON outputs BEGIN
+    INSERT INTO outputs_fts(outputs_fts, rowid, text) VALUES ('delete', old.id, old.text);
+END;
+CREATE TRIGGER IF NOT EXISTS tasks_ai AFTER INSERT ON tasks BEGIN
+    INSERT INTO prompts_fts(rowid, prompt) VALUES (new.rowid, new.prompt);
+END;
+
+-- Tasks where the senior (or a human) booked a different account than the junior
+CREATE VIEW IF NOT EXISTS corrections AS
+SELECT t.task_key, t.payee, t.description, je.target_account AS junior_account, se.target_account AS senior_account
+FROM tasks t
+JOIN outputs j ON j.task_key = t.task_key AND j.stage = 'junior'
+JOIN entries je ON je.output_id = j.id
+JOIN outputs s ON s.task_key = t.task_key AND s.stage = 'senior'
+JOIN entries se ON se.output_id = s.id
+WHERE je.target_account IS NOT se.target_account;
+"""
+WORD_RE = re.compile(r"\w+")
+
+
+def connect(db_file=None):
+    conn = sqlite3.connect(db_file or ARTEFACT_DB)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA foreign_keys=ON")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def task_outputs(task):
+    """(stage, model_version, score, text) for every output a task carries."""
+    for key, stage in (('predictions', 'junior'), ('annotations', 'senior')):
+        for item in task.get(key) or []:
+            try:
+                text = item['result'][0]['value']['text'][0]
+            except (KeyError, IndexError, TypeError):
+                continue
+            yield stage, item.get('model_version'), item.get('score'), text
+    if 'response' in task:
+        yield 'response', None, None, task['response']
+    if 'text' in task:
+        yield 'output', None, None, task['text']
+
+
+def ingest(conn, tasks, source_file):
+    """Adds (or replaces) the tasks of one artefact file. Returns the number of outputs stored."""
+    source_file = os.path.abspath(source_file)
+    now = time.time()
+    stored = 0
+    with conn:
+        conn.execute("DELETE FROM outputs WHERE source_file = ?", (source_file,))
+        for position, task in enumerate(tasks):
+            data = task['data'] if isinstance(task.get('data'), dict) else task
+            prompt = data.get('prompt') or ""
+            task_key = hashlib.sha1(prompt.encode("utf-8")).hexdigest()
+            txn = parse_transaction(prompt)
+            conn.execute(
+                "INSERT OR IGNORE INTO tasks VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (task_key, data.get('transaction_id'), txn['date'], txn['payee'], txn['description'],
+                 float(txn['amount']) if txn['amount'] is not None else None, txn['currency'], txn['source'], prompt))
+
+            for stage, model_version, score, text in task_outputs(task):
+                output_id = conn.execute(
+                    "INSERT INTO outputs (task_key, stage, source_file, position, model_version, score, text, ingested_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (task_key, stage, source_file, position, model_version, score, text, now)).lastrowid
+                entry = parse_entry(text)
+                if entry:
+                    target = target_posting(entry, txn['source'])
+                    postings = [{"account": p['account'], "amount": str(p['amount']) if p['amount'] is not None else None,
+                                 "currency": p['currency']} for p in entry['postings']]
+                    conn.execute("INSERT INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                                 (output_id, entry['date'], entry['flag'], entry['payee'], entry['narration'],
+                                  target['account'] if target else None, int(is_balanced(entry)), json.dumps(postings)))
+                stored += 1
+    return stored
+
+
+def ingest_file(conn, filename):
+    """Ingests a plain, compact (task_store) or compressed (artefact_io) task file."""
+    return ingest(conn, load_tasks(filename), filename)
+
+
+def maybe_ingest(tasks, source_file):
+    """Pipeline hook: ingests into ARTEFACT_DB when it is set, otherwise does nothing."""
+    if not ARTEFACT_DB:
+        return
+    conn = connect()
+    try:
+        stored = ingest(conn, tasks, source_file)
+    finally:
+        conn.close()
+    print(f"🗄️ Ingested {stored} outputs from {source_file} into {ARTEFACT_DB}")
+
+
+def fts_phrase(text):
+    """An FTS5 query for the words of `text` as a phrase, or None if it has no words."""
+    words = WORD_RE.findall(text)
+    return '"' + " ".join(words) + '"' if words else None
+
+
+def count_containing(conn, text, stage=None):
+    """
+    Outputs whose text contains `text` exactly. The FTS index narrows the candidates to
+    outputs with the same words in order; instr() then checks punctuation/case.
+    """
+    query = fts_phrase(text)
+    stage_sql, params = (" AND o.stage = ?", [stage]) if stage else ("", [])
+    if query is None:
+        sql = "SELECT count(*) FROM outputs o WHERE instr(o.text, ?) > 0" + stage_sql
+        return conn.execute(sql, [text] + params).fetchone()[0]
+    sql = ("SELECT count(*) FROM outputs_fts f JOIN outputs o ON o.id = f.rowid"
+           " WHERE outputs_fts MATCH ? AND instr(o.text, ?) > 0" + stage_sql)
+    return conn.execute(sql, [query, text] + params).fetchone()[0]
+
+
+def top_corrected_payees(conn, limit=10):
+    """(payee, corrections, most common junior -> senior change) for the most corrected payees."""
+    return conn.execute("""
+        SELECT payee, count(*) AS n,
+               (SELECT junior_account || ' -> ' || senior_account FROM corrections c2 WHERE c2.payee = c.payee
+                GROUP BY junior_account, senior_account ORDER BY count(*) DESC LIMIT 1)
+        FROM corrections c GROUP BY payee ORDER BY n DESC LIMIT ?""", (limit,)).fetchall()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Query pipeline artefacts in an embedded SQLite store')
+    parser.add_argument('--db', default=ARTEFACT_DB or "artefacts.db")
+    commands = parser.add_subparsers(dest='command', required=True)
+    ingest_cmd = commands.add_parser('ingest', help='Load task files (re-ingesting a file replaces it)')
+    ingest_cmd.add_argument('files', nargs='+')
+    count_cmd = commands.add_parser('count', help='Outputs containing a string')
+    count_cmd.add_argument('text')
+    count_cmd.add_argument('--stage', default=None, help='junior, senior, response or output')
+    corrections_cmd = commands.add_parser('corrections', help='Payees whose account the senior changed most often')
+    corrections_cmd.add_argument('--limit', type=int, default=10)
+    sql_cmd = commands.add_parser('sql', help='Run any SQL')
+    sql_cmd.add_argument('query')
+    commands.add_parser('stats', help='Rows per table and stage')
+    args = parser.parse_args()
+
+    conn = connect(args.db)
+    started = time.perf_counter()
+    if args.command == 'ingest':
+        for filename in args.files:
+            print(f"🗄️ {filename}: {ingest_file(conn, filename)} outputs")
+    elif args.command == 'count':
+        total = conn.execute("SELECT count(*) FROM outputs" + (" WHERE stage = ?" if args.stage else ""),
+                             [args.stage] if args.stage else []).fetchone()[0]
+        print(f"🕵️ {count_containing(conn, args.text, args.stage)} of {total} outputs contain {args.text!r}")
+    elif args.command == 'corrections':
+        for payee, n, change in top_corrected_payees(conn, args.limit):
+            print(f"   {n:5d}  {payee}  ({change})")
+    elif args.command == 'sql':
+        for row in conn.execute(args.query):
+            print("   " + " | ".join(str(value) for value in row))
+    else:
+        print(f"   tasks: {conn.execute('SELECT count(*) FROM tasks').fetchone()[0]}")
+        for stage, n in conn.execute("SELECT stage, count(*) FROM outputs GROUP BY stage"):
+            print(f"   outputs[{stage}]: {n}")
+        print(f"   entries: {conn.execute('SELECT count(*) FROM entries').fetchone()[0]}")
+    print(f"⏱️ {1000 * (time.perf_counter() - started):.1f} ms")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,9 @@
-import json
 import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))  # Repo root (artefact_io, task_store)
+import artefact_io
+from task_store import load_tasks
 
 # --- CONFIGURATION ---
 INPUT_FILE = "training_data.json"       # Your current file (with predictions)
@@ -26,8 +30,7 @@ def convert_predictions_to_annotations():
 
     print(f"📂 Reading {INPUT_FILE}...")
     
-    with open(INPUT_FILE, 'r') as f:
-        data = json.load(f)
+    data = load_tasks(INPUT_FILE)
     
     converted_data = []
     count = 0
@@ -61,8 +64,7 @@ def convert_predictions_to_annotations():
             converted_data.append({"data": task['data']})
 
     # 3. Save the new file
-    with open(OUTPUT_FILE, 'w') as f:
-        json.dump(converted_data, f, indent=2)
+    artefact_io.save(converted_data, OUTPUT_FILE)
         
     print(f"✅ Success! Converted {count} tasks.")
     print(f"💾 Saved to: {OUTPUT_FILE}")
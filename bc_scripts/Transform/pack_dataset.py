@@ -0,0 +1,230 @@
+import os
+import bisect
+import sys
+import json
+import hashlib
+import argparse
+from datasets import Dataset, load_from_disk
+from transformers import AutoTokenizer
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))  # Repo root (artefact_io)
+import artefact_io
+import telemetry
+
+# Pre-tokenises the SFT JSON once (same chat formatting as train.ipynb's formatting_prompts_func)
+# and saves it as a memory-mapped Arrow dataset keyed by data + tokenizer hash, so training
+# runs just load_from_disk() it. With packing, short examples are concatenated into rows of up
+# to MAX_SEQ_LENGTH tokens; position_ids restart at 0 for every example so attention stays
+# inside each example (flash-attention varlen, or the 4D mask from collate_packed).
+
+# ================= CONFIGURATION =================
+INPUT_FILE = "final_train.json"
+TOKENIZER = "unsloth/Ministral-3-3B-Instruct-2512"
+CACHE_DIR = "data/cache/tokenized"
+MAX_SEQ_LENGTH = 2048
+BATCH_SIZE = 2  # train.ipynb per_device_train_batch_size, for the dynamic-padding comparison
+
+# Must match the system prompt used in train.ipynb
+SYSTEM_PROMPT = """You are an expert accountant using Beancount syntax.
+Instructions:
+1. Analyze the transaction and the historical <context>.
+2. FORMULATE A PLAN inside <plan> tags. Decide the high-level category (Asset, Liability, Income, Expense) and the double-entry logic.
+3. EXECUTE THE PLAN inside <reasoning> tags. Verify the account name against history and confirm the math balances to zero.
+4. WRITE THE CODE inside <entry> tags. Use strict Beancount syntax.
+IMPORTANT: Output ONLY the raw XML."""
+
+
+def file_hash(filename):
+    digest = hashlib.sha256()
+    with open(filename, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def tokenizer_hash(tokenizer):
+    """Changes whenever the vocab/merges, special tokens or chat template change."""
+    digest = hashlib.sha256()
+    if getattr(tokenizer, 'is_fast', False):
+        digest.update(tokenizer.backend_tokenizer.to_str().encode('utf-8'))
+    else:
+        digest.update(json.dumps(tokenizer.get_vocab(), sort_keys=True).encode('utf-8'))
+    digest.update(str(tokenizer.chat_template).encode('utf-8'))
+    digest.update(json.dumps(tokenizer.special_tokens_map, sort_keys=True, default=str).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def cache_path(input_file, tokenizer, max_seq_length, pack, cache_dir=CACHE_DIR):
+    prompt_hash = hashlib.sha256(SYSTEM_PROMPT.encode('utf-8')).hexdigest()[:8]
+    mode = f"packed{max_seq_length}" if pack else f"unpacked{max_seq_length}"
+    key = f"{file_hash(input_file)[:12]}-{tokenizer_hash(tokenizer)[:12]}-{prompt_hash}-{mode}"
+    return os.path.join(cache_dir, key)
+
+
+def format_example(tokenizer, prompt, response):
+    messages = [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": prompt},
+        {"role": "assistant", "content": response}
+    ]
+    return tokenizer.apply_chat_template(messages, tokenize=False, add_generation_prompt=False)
+
+
+def tokenize_examples(tokenizer, records, max_seq_length):
+    """Returns one token list per example, truncated to max_seq_length like SFTTrainer does."""
+    texts = [format_example(tokenizer, r['prompt'], r['response']) for r in records]
+    # The chat template usually writes the BOS token itself
+    add_special = not (tokenizer.bos_token and texts and texts[0].startswith(tokenizer.bos_token))
+    encoded = tokenizer(texts, add_special_tokens=add_special)['input_ids']
+    truncated = sum(1 for ids in encoded if len(ids) > max_seq_length)
+    return [ids[:max_seq_length] for ids in encoded], truncated
+
+
+def pack_examples(examples, max_seq_length):
+    """
+    Best-fit decreasing: longest examples first, each into the open row with the least room
+    that still fits it (bisect over rows sorted by free space). Returns rows as lists of
+    example indices.
+    """
+    order = sorted(range(len(examples)), key=lambda i: -len(examples[i]))
+    rows, room = [], []  # room: sorted (free tokens, row index) of rows that aren't full
+    for i in order:
+        length = len(examples[i])
+        slot = bisect.bisect_left(room, (length, -1))
+        if slot < len(room):
+            free, r = room.pop(slot)
+            rows[r].append(i)
+        else:
+            free, r = max_seq_length, len(rows)
+            rows.append([i])
+        if free > length:
+            bisect.insort(room, (free - length, r))
+    return rows
+
+
+def build_rows(examples, groups):
+    """
+    Concatenates each group into one row. position_ids restart per example, and the first
+    token of every example after the first gets label -100 so nothing is learned across the
+    boundary (same convention as transformers' DataCollatorWithFlattening).
+    """
+    columns = {"input_ids": [], "labels": [], "position_ids": [], "seq_lengths": []}
+    for group in groups:
+        input_ids, labels, position_ids, lengths = [], [], [], []
+        for n, i in enumerate(group):
+            ids = examples[i]
+            input_ids.extend(ids)
+            labels.extend(([-100] + ids[1:]) if n else ids)
+            position_ids.extend(range(len(ids)))
+            lengths.append(len(ids))
+        columns["input_ids"].append(input_ids)
+        columns["labels"].append(labels)
+        columns["position_ids"].append(position_ids)
+        columns["seq_lengths"].append(lengths)
+    return columns
+
+
+def padding_report(lengths, row_lengths, max_seq_length, batch_size=BATCH_SIZE):
+    """Share of computed positions that are padding, for each way of batching."""
+    tokens = sum(lengths)
+    batches = [lengths[i:i + batch_size] for i in range(0, len(lengths), batch_size)]
+    dynamic = sum(max(b) * len(b) for b in batches)
+    return {
+        "examples": len(lengths),
+        "tokens": tokens,
+        "rows_packed": len(row_lengths),
+        "waste_pad_to_max": round(1 - tokens / (len(lengths) * max_seq_length), 4),
+        "waste_dynamic_batch": round(1 - tokens / dynamic, 4),
+        "waste_packed": round(1 - tokens / (len(row_lengths) * max_seq_length), 4),
+    }
+
+
+def build_cache(input_file, tokenizer, max_seq_length=MAX_SEQ_LENGTH, pack=True, cache_dir=CACHE_DIR, force=False):
+    """Tokenises (and packs) input_file unless a cache for this data + tokenizer already exists."""
+    path = cache_path(input_file, tokenizer, max_seq_length, pack, cache_dir)
+    if os.path.exists(os.path.join(path, "cache_info.json")) and not force:
+        print(f"♻️ Cache hit: {path}")
+        telemetry.incr("cache_hits", cache="tokenized_dataset")
+        return path
+    telemetry.incr("cache_misses", cache="tokenized_dataset")
+
+    records = artefact_io.load(input_file)  # .json/.jsonl, optionally .gz/.zst
+    print(f"🔤 Tokenising {len(records)} examples...")
+    examples, truncated = tokenize_examples(tokenizer, records, max_seq_length)
+    groups = pack_examples(examples, max_seq_length) if pack else [[i] for i in range(len(examples))]
+    columns = build_rows(examples, groups)
+
+    Dataset.from_dict(columns).save_to_disk(path)
+    stats = padding_report([len(e) for e in examples], [sum(l) for l in columns["seq_lengths"]], max_seq_length)
+    stats.update({"input_file": input_file, "tokenizer": tokenizer.name_or_path, "max_seq_length": max_seq_length,
+                  "packed": pack, "truncated": truncated})
+    with open(os.path.join(path, "cache_info.json"), 'w') as f:
+        json.dump(stats, f, indent=2)
+    return path
+
+
+def load_cache(path):
+    """Memory-mapped: nothing is read into RAM until rows are accessed."""
+    return load_from_disk(path)
+
+
+def block_diagonal_mask(seq_lengths, length):
+    """4D additive mask (1, 1, L, L) for eager/SDPA attention: causal within each packed example only."""
+    import torch
+    mask = torch.full((length, length), float('-inf'))
+    start = 0
+    for n in seq_lengths:
+        mask[start:start + n, start:start + n] = torch.triu(torch.full((n, n), float('-inf')), diagonal=1)
+        start += n
+    return mask[None, None]
+
+
+def collate_packed(rows, pad_token_id, block_mask=False):
+    """
+    Pads a batch of packed rows. Returns input_ids/labels/position_ids (enough for
+    flash-attention varlen); with block_mask=True also a 4D attention_mask for other kernels.
+    """
+    import torch
+    width = max(len(r["input_ids"]) for r in rows)
+    batch = {"input_ids": [], "labels": [], "position_ids": []}
+    masks = []
+    for r in rows:
+        pad = width - len(r["input_ids"])
+        batch["input_ids"].append(list(r["input_ids"]) + [pad_token_id] * pad)
+        batch["labels"].append(list(r["labels"]) + [-100] * pad)
+        batch["position_ids"].append(list(r["position_ids"]) + list(range(pad)))
+        if block_mask:
+            masks.append(block_diagonal_mask(list(r["seq_lengths"]) + ([pad] if pad else []), width))
+    batch = {k: torch.tensor(v) for k, v in batch.items()}
+    if block_mask:
+        batch["attention_mask"] = torch.cat(masks)
+    return batch
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pre-tokenise (and pack) the SFT dataset into an Arrow cache')
+    parser.add_argument('--input', default=INPUT_FILE)
+    parser.add_argument('--tokenizer', default=TOKENIZER, help='Hub name or local path')
+    parser.add_argument('--max-seq-length', type=int, default=MAX_SEQ_LENGTH)
+    parser.add_argument('--cache-dir', default=CACHE_DIR)
+    parser.add_argument('--no-pack', action='store_true', help='One example per row (still pre-tokenised)')
+    parser.add_argument('--force', action='store_true', help='Rebuild even if the cache exists')
+    args = parser.parse_args()
+
+    tokenizer = AutoTokenizer.from_pretrained(args.tokenizer)
+    path = build_cache(args.input, tokenizer, args.max_seq_length, not args.no_pack, args.cache_dir, args.force)
+
+    with open(os.path.join(path, "cache_info.json"), 'r') as f:
+        stats = json.load(f)
+    print(f"📦 {stats['examples']} examples ({stats['tokens']:,} tokens) -> {len(load_cache(path))} rows")
+    if stats['truncated']:
+        print(f"⚠️ {stats['truncated']} examples were longer than {args.max_seq_length} tokens and were truncated")
+    print(f"🧱 Padding waste: {100 * stats['waste_pad_to_max']:.1f}% padded to {args.max_seq_length}, "
+          f"{100 * stats['waste_dynamic_batch']:.1f}% with per-batch padding, "
+          f"{100 * stats['waste_packed']:.1f}% packed")
+    print(f"✅ Saved to {path}")
+    print("🚀 In train.ipynb: dataset = load_from_disk(path) instead of load_dataset + formatting_prompts_func")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,4 @@
-import yaml
-import json
+from yaml_stream import yaml_to_json
 
 INPUT_FILE = "human_edits.yaml"
 OUTPUT_FILE = "final_train_edited.json" # Load THIS into Unsloth
@@ -7,13 +6,10 @@ OUTPUT_FILE = "final_train_edited.json" # Load THIS into Unsloth
 def main():
     try:
         print(f"📖 Reading {INPUT_FILE}...")
-        with open(INPUT_FILE, 'r') as f:
-            data = yaml.safe_load(f)
-            
-        print(f"📦 Converting {len(data)} records to strict JSON...")
-        with open(OUTPUT_FILE, 'w') as f:
-            json.dump(data, f, indent=2)
+        # Works for both the streamed multi-document YAML and old single-list files
+        count = yaml_to_json(INPUT_FILE, OUTPUT_FILE)
             
+        print(f"📦 Converted {count} records to strict JSON")
         print(f"✅ Success! Saved to {OUTPUT_FILE}")
         print("🚀 You are ready to train!")
         
@@ -21,4 +17,4 @@ def main():
         print(f"❌ Error: {e}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
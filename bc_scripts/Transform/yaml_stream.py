@@ -0,0 +1,158 @@
+import re
+import json
+import argparse
+import yaml
+
+# One converter for both directions, one task at a time:
+#   JSON array / JSONL  ->  multi-document YAML stream (for reviewing in an IDE)
+#   YAML (stream or old single-list file)  ->  JSON array (for training)
+# libyaml (CSafeDumper / CSafeLoader) is used when PyYAML was built with it.
+# Layout: libyaml always writes block lists flush with their parent key
+#   annotations:
+#   - result:
+# where the old IndentedDumper indented them ("  - result:"). Both load to the same data.
+
+BaseDumper = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+BaseLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+READ_CHUNK = 1 << 20  # 1 MB of JSON text at a time
+SEPARATOR_RE = re.compile(r'[\s,]*')  # Whitespace and commas between array items
+
+# Function to clean tokenizer artifacts recursively
+def clean_text(obj):
+    if isinstance(obj, str):
+        # specific unsloth/mistral artifact cleaning
+        s = obj.replace('\u010a', '\n').replace('\u0120', ' ')
+        # remove carriage returns
+        s = s.replace('\r', '')
+        # remove trailing spaces from each line to encourage block style
+        s = '\n'.join([line.rstrip() for line in s.split('\n')])
+        return s
+    elif isinstance(obj, list):
+        return [clean_text(item) for item in obj]
+    elif isinstance(obj, dict):
+        return {k: clean_text(v) for k, v in obj.items()}
+    return obj
+
+class StreamDumper(BaseDumper):
+    pass
+
+def str_presenter(dumper, data):
+    """Configures YAML to use the '|' style for multi-line strings"""
+    if '\n' in data:
+        return dumper.represent_scalar('tag:yaml.org,2002:str', data, style='|')
+    return dumper.represent_scalar('tag:yaml.org,2002:str', data)
+
+yaml.add_representer(str, str_presenter, Dumper=StreamDumper)
+
+def iter_json_records(filename):
+    """
+    Yields the items of a top-level JSON array (or the lines of a JSONL file)
+    without loading the whole file.
+    """
+    decoder = json.JSONDecoder()
+    with open(filename, 'r', encoding='utf-8') as f:
+        first = f.read(1)
+        while first.isspace():
+            first = f.read(1)
+        f.seek(0)
+
+        if first != '[':
+            # JSONL: one record per line
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+            return
+
+        # Walk the buffer with an index; it is only cut down (and topped up) when refilling
+        buffer = f.read(READ_CHUNK)
+        index = buffer.index('[') + 1
+        eof = False
+
+        def refill(size=READ_CHUNK):
+            nonlocal buffer, index, eof
+            more = f.read(size)
+            eof = not more
+            buffer = buffer[index:] + more
+            index = 0
+
+        while True:
+            index = SEPARATOR_RE.match(buffer, index).end()
+            if index == len(buffer):
+                if eof:
+                    raise ValueError(f"{filename}: JSON array is not closed")
+                refill()
+                continue
+            if buffer[index] == ']':
+                return
+            try:
+                record, end = decoder.raw_decode(buffer, index)
+            except json.JSONDecodeError:
+                # Record cut off at the chunk boundary: read at least as much again and retry
+                if eof:
+                    raise
+                refill(max(READ_CHUNK, len(buffer) - index))
+                continue
+            if end == len(buffer) and not eof:
+                refill()  # A value ending exactly at the boundary may be cut short (e.g. a number)
+                continue
+            yield record
+            index = end
+            if len(buffer) - index < READ_CHUNK // 2 and not eof:
+                refill()
+
+def json_to_yaml(input_file, output_file, clean=True):
+    """Writes each task as its own YAML document ('---'), keeping '|' blocks for multi-line text."""
+    records = iter_json_records(input_file)
+    if clean:
+        records = (clean_text(r) for r in records)
+
+    count = 0
+    def counted(items):
+        nonlocal count
+        for item in items:
+            count += 1
+            yield item
+
+    with open(output_file, 'w', encoding='utf-8') as f:
+        yaml.dump_all(counted(records), f, Dumper=StreamDumper, explicit_start=True, allow_unicode=True,
+                      sort_keys=False, default_flow_style=False, width=120)
+    return count
+
+def iter_yaml_records(filename):
+    """Yields tasks from a multi-document YAML stream, or from an old single-document list."""
+    with open(filename, 'r', encoding='utf-8') as f:
+        for doc in yaml.load_all(f, Loader=BaseLoader):
+            if isinstance(doc, list):
+                yield from doc
+            elif doc is not None:
+                yield doc
+
+def yaml_to_json(input_file, output_file):
+    """Streams YAML tasks back into a JSON array (indent=2 per task, like the rest of the pipeline)."""
+    count = 0
+    with open(output_file, 'w', encoding='utf-8') as f:
+        f.write('[\n')
+        for record in iter_yaml_records(input_file):
+            if count:
+                f.write(',\n')
+            f.write(json.dumps(record, indent=2))
+            count += 1
+        f.write('\n]\n')
+    return count
+
+def main():
+    parser = argparse.ArgumentParser(description='Stream Label Studio/SFT JSON to reviewable YAML and back')
+    parser.add_argument('direction', choices=['to-yaml', 'to-json'])
+    parser.add_argument('input')
+    parser.add_argument('output')
+    parser.add_argument('--no-clean', action='store_true', help='Keep strings byte-for-byte (no tokenizer artefact cleanup)')
+    args = parser.parse_args()
+
+    if args.direction == 'to-yaml':
+        count = json_to_yaml(args.input, args.output, clean=not args.no_clean)
+    else:
+        count = yaml_to_json(args.input, args.output)
+    print(f"✅ Converted {count} records to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+import os
+import re
+import sys
+import zlib
+import argparse
+from collections import defaultdict
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))  # Repo root (artefact_io)
+import artefact_io
+
+# Near-duplicate removal for SFT data (final_train.json / ready_to_train.json).
+# Many examples are the same payee -> same account with only the date/amount changed.
+# We MinHash the normalised transaction + response text, bucket the signatures with
+# LSH bands (no all-pairs comparison), merge candidates into clusters and keep the
+# first N examples of each cluster.
+
+# ================= CONFIGURATION =================
+INPUT_FILE = "final_train.json"
+OUTPUT_FILE = "final_train_dedup.json"
+
+NUM_PERM = 128          # MinHash signature length
+THRESHOLD = 0.8         # Estimated Jaccard similarity that counts as a near-duplicate
+SHINGLE_WORDS = 3       # Word n-grams
+KEEP_PER_CLUSTER = 1
+EXAMPLES_PER_STEP = 8   # train.ipynb: per_device_train_batch_size=2 * gradient_accumulation_steps=4
+CHARS_PER_TOKEN = 4     # Rough token estimate when no tokenizer is loaded
+
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+
+DATE_RE = re.compile(r'\b\d{4}-\d{2}-\d{2}\b')
+AMOUNT_RE = re.compile(r'-?\d[\d,]*(?:\.\d+)?')
+ID_RE = re.compile(r'\b[0-9a-f]{10}\b')
+TRANSACTION_RE = re.compile(r'<transaction>(.*?)</transaction>', re.DOTALL)
+ENTRY_RE = re.compile(r'<entry>(.*?)</entry>', re.DOTALL)
+WORD_RE = re.compile(r"[a-z<>/:_'!*]+|\S")
+
+
+def extract_pair(record):
+    """Accepts the flat {prompt, response} format or a Label Studio task."""
+    if 'prompt' in record:
+        return record['prompt'], record['response']
+    return record['data']['prompt'], record['annotations'][0]['result'][0]['value']['text'][0]
+
+
+def block(pattern, text):
+    match = pattern.search(text)
+    return match.group(1) if match else text
+
+
+def normalise(prompt, response, full_response=False):
+    """
+    Only the <transaction> block of the prompt is kept: the instructions are identical
+    in every example and the retrieved <history> differs between otherwise identical rows.
+    Likewise only the <entry> of the response, since the free-text reasoning is reworded
+    every time. Dates, amounts and ids are replaced by placeholders.
+    """
+    text = block(TRANSACTION_RE, prompt) + "\n" + (response if full_response else block(ENTRY_RE, response))
+    text = text.lower()
+    text = ID_RE.sub(' <id> ', text)
+    text = DATE_RE.sub(' <date> ', text)
+    text = AMOUNT_RE.sub(' <num> ', text)
+    return WORD_RE.findall(text)
+
+
+def shingles(words, n=SHINGLE_WORDS):
+    if len(words) < n:
+        return {' '.join(words)}
+    return {' '.join(words[i:i + n]) for i in range(len(words) - n + 1)}
+
+
+def make_permutations(num_perm, seed):
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+    b = rng.integers(0, MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+    return a, b
+
+
+def minhash(shingle_set, perms):
+    """One signature row: min over shingles of (a*h + b) mod p, for each permutation."""
+    a, b = perms
+    hashes = np.fromiter((zlib.crc32(s.encode('utf-8')) for s in shingle_set),
+                         dtype=np.uint64, count=len(shingle_set))
+    # uint64 overflow wraps, which is fine for hashing (same trick as datasketch)
+    values = (np.outer(hashes, a) + b) % MERSENNE_PRIME & MAX_HASH
+    return values.min(axis=0).astype(np.uint32)
+
+
+def choose_bands(num_perm, threshold):
+    """Picks (bands, rows) with bands*rows == num_perm whose S-curve midpoint is closest to the threshold."""
+    options = [(b, num_perm // b) for b in range(1, num_perm + 1) if num_perm % b == 0]
+    return min(options, key=lambda br: abs((1.0 / br[0]) ** (1.0 / br[1]) - threshold))
+
+
+def find_root(parent, i):
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+def cluster(signatures, threshold, bands, rows):
+    """
+    LSH: rows that share any band bucket are candidates. Each candidate is checked against
+    the bucket's first member (signature agreement ~ Jaccard) before the clusters are merged.
+    """
+    parent = list(range(len(signatures)))
+    for band in range(bands):
+        buckets = defaultdict(list)
+        band_rows = np.ascontiguousarray(signatures[:, band * rows:(band + 1) * rows])
+        for i, key in enumerate(band_rows):
+            buckets[key.tobytes()].append(i)
+
+        for members in buckets.values():
+            if len(members) < 2:
+                continue
+            first = members[0]
+            similarity = (signatures[members[1:]] == signatures[first]).mean(axis=1)
+            for other, sim in zip(members[1:], similarity):
+                if sim >= threshold:
+                    root_a, root_b = find_root(parent, first), find_root(parent, other)
+                    if root_a != root_b:
+                        parent[max(root_a, root_b)] = min(root_a, root_b)
+
+    return [find_root(parent, i) for i in range(len(signatures))]
+
+
+def estimate_tokens(prompt, response):
+    return (len(prompt) + len(response)) // CHARS_PER_TOKEN
+
+
+def dedup(records, threshold=THRESHOLD, keep=KEEP_PER_CLUSTER, num_perm=NUM_PERM, seed=1, full_response=False):
+    """Returns (kept records in original order, cluster id per input record)."""
+    perms = make_permutations(num_perm, seed)
+    signatures = np.empty((len(records), num_perm), dtype=np.uint32)
+    for i, record in enumerate(records):
+        signatures[i] = minhash(shingles(normalise(*extract_pair(record), full_response)), perms)
+
+    bands, rows = choose_bands(num_perm, threshold)
+    labels = cluster(signatures, threshold, bands, rows)
+
+    seen = defaultdict(int)
+    kept = []
+    for record, label in zip(records, labels):
+        seen[label] += 1
+        if seen[label] <= keep:
+            kept.append(record)
+    return kept, labels
+
+
+def report(records, kept, labels):
+    sizes = defaultdict(int)
+    for label in labels:
+        sizes[label] += 1
+    tokens_before = sum(estimate_tokens(*extract_pair(r)) for r in records)
+    tokens_after = sum(estimate_tokens(*extract_pair(r)) for r in kept)
+    steps_before = -(-len(records) // EXAMPLES_PER_STEP)
+    steps_after = -(-len(kept) // EXAMPLES_PER_STEP)
+
+    print(f"🧮 {len(records)} examples -> {len(sizes)} clusters "
+          f"({sum(1 for s in sizes.values() if s > 1)} with near-duplicates, largest {max(sizes.values())})")
+    print(f"✂️ Kept {len(kept)} examples ({100 * (1 - len(kept) / len(records)):.1f}% fewer)")
+    print(f"🔤 ~{tokens_before:,} -> ~{tokens_after:,} tokens per epoch")
+    print(f"⏱️ Estimated training time per epoch: {100 * (1 - tokens_after / tokens_before):.1f}% less "
+          f"({steps_before} -> {steps_after} optimizer steps at {EXAMPLES_PER_STEP} examples/step)")
+
+    biggest = sorted(sizes.items(), key=lambda kv: -kv[1])[:5]
+    for label, size in biggest:
+        if size < 2:
+            break
+        prompt, _ = extract_pair(records[label])
+        snippet = ' '.join(block(TRANSACTION_RE, prompt).split())[:100]
+        print(f"   {size:>4} x {snippet}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Remove near-duplicate SFT examples with MinHash/LSH')
+    parser.add_argument('--input', default=INPUT_FILE)
+    parser.add_argument('--output', default=OUTPUT_FILE)
+    parser.add_argument('--threshold', type=float, default=THRESHOLD, help='Jaccard similarity for near-duplicates')
+    parser.add_argument('--keep', type=int, default=KEEP_PER_CLUSTER, help='Examples kept per cluster')
+    parser.add_argument('--num-perm', type=int, default=NUM_PERM)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--full-response', action='store_true',
+                        help='Compare the whole response (plan/reasoning too), not just the <entry>')
+    args = parser.parse_args()
+
+    records = artefact_io.load(args.input)
+    print(f"📖 Loaded {len(records)} examples from {args.input}")
+    if not records:
+        print("❌ Nothing to deduplicate")
+        return
+
+    kept, labels = dedup(records, args.threshold, args.keep, args.num_perm, args.seed,
+                         args.full_response)
+    report(records, kept, labels)
+
+    artefact_io.save(kept, args.output)
+    print(f"✅ Saved {len(kept)} examples to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
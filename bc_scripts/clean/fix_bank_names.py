@@ -1,5 +1,10 @@
-import json
+import os
 import re
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))  # Repo root (artefact_io, task_store)
+import artefact_io
+from task_store import load_tasks
 
 # --- CONFIGURATION ---
 INPUT_FILE = "ready_for_labeling.json"
@@ -57,8 +62,7 @@ def fix_xml_entry(xml_text):
 
 def run_fix():
     print(f"🔧 Reading {INPUT_FILE}...")
-    with open(INPUT_FILE, 'r') as f:
-        data = json.load(f)
+    data = load_tasks(INPUT_FILE)
     
     count = 0
     for task in data:
@@ -78,8 +82,7 @@ def run_fix():
 
     print(f"✅ Fixed {count} records.")
     
-    with open(OUTPUT_FILE, 'w') as f:
-        json.dump(data, f, indent=2)
+    artefact_io.save(data, OUTPUT_FILE)
     
     print(f"💾 Saved to {OUTPUT_FILE}")
     print("🚀 Import this new file into Label Studio (Delete the old project first to be clean!)")
@@ -1,6 +1,11 @@
-import pandas as pd
+import os
 import re
-import json
+import sys
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))  # Repo root (artefact_io, task_store)
+import artefact_io
+from task_store import load_tasks
 
 # Input/Output
 INPUT_FILE = "refined_data.json" # Or whatever your latest export is
@@ -32,11 +37,10 @@ def clean_senior_output(text):
 
     return text.strip()
 
-def main():
+def main(input_file=INPUT_FILE, output_file=OUTPUT_FILE):
     # Load Data (Handling the Label Studio Export structure)
     try:
-        with open(INPUT_FILE, 'r') as f:
-            data = json.load(f)
+        data = load_tasks(input_file)  # Plain or compact, optionally .gz/.zst
             
         print(f"🧹 Janitor starting on {len(data)} records...")
         
@@ -63,14 +67,13 @@ def main():
                 continue
 
         # Save as the flat format Unsloth likes
-        with open(OUTPUT_FILE, 'w') as f:
-            json.dump(training_pairs, f, indent=2)
+        artefact_io.save(training_pairs, output_file)
             
-        print(f"✨ Done! Saved {len(training_pairs)} clean pairs to {OUTPUT_FILE}")
+        print(f"✨ Done! Saved {len(training_pairs)} clean pairs to {output_file}")
         print("🚀 You can load this directly into Unsloth now!")
 
     except FileNotFoundError:
-        print(f"❌ Could not find {INPUT_FILE}")
+        print(f"❌ Could not find {input_file}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
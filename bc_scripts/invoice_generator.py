@@ -1,12 +1,51 @@
+import os
 import csv
 import json
 import random
-from datetime import datetime, timedelta
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+import numpy as np
+import pandas as pd
 from faker import Faker
 
 # Initialize Faker
 fake = Faker('en_GB')  # UK context for your Guildford connection
 
+# Service types (for line items): (name, min unit price, max unit price)
+SERVICES = [
+    ("Consulting", 500, 2000),
+    ("Server Hosting", 100, 5000),
+    ("Software License", 50, 300),
+    ("Audit Services", 1000, 5000),
+    ("Legal Retainer", 500, 1500),
+    ("Office Supplies", 10, 200),
+    ("IT Services", 50, 200),
+    ("Marketing Agency", 100, 5000),
+    ("Recruitment Agency - Temporary", 500, 40000),
+    ("Recruitment Agency - Permanent", 500, 40000),
+    ("Accounting", 100, 5000),
+    ("Staff Compensation", 500, 2000),
+    ("Travel", 500, 2000),
+    ("Office ", 500, 2000),
+    ("Legal ", 500, 2000),
+    ("Catering ", 500, 2000),
+    ("Building ", 500, 2000),
+    ("Insurance ", 500, 2000),
+    ("Telecommunications ", 500, 2000),
+    ("Printing ", 500, 2000),
+    ("Postage ", 500, 2000),
+    ("Hardware", 500, 2000),
+]
+
+CSV_HEADER = [
+    "Invoice_ID", "Date", "Vendor", "Customer",
+    "Description", "Quantity", "Unit_Price", "Line_Total",
+    "Invoice_Subtotal", "Invoice_Tax", "Invoice_Total"
+]
+
+TAX_RATE = 0.20  # UK VAT
+
 def generate_b2b_invoices(num_invoices=50):
     invoices = []
     
@@ -20,30 +59,7 @@ def generate_b2b_invoices(num_invoices=50):
         })
 
     # 2. Setup some service types (for line items)
-    services = [
-        ("Consulting", 500, 2000),
-        ("Server Hosting", 100, 5000),
-        ("Software License", 50, 300),
-        ("Audit Services", 1000, 5000),
-        ("Legal Retainer", 500, 1500),
-        ("Office Supplies", 10, 200),
-        ("IT Services", 50, 200),
-        ("Marketing Agency", 100, 5000),
-        ("Recruitment Agency - Temporary", 500, 40000),
-        ("Recruitment Agency - Permanent", 500, 40000),
-        ("Accounting", 100, 5000),
-        ("Staff Compensation", 500, 2000),
-        ("Travel", 500, 2000),
-        ("Office ", 500, 2000),
-        ("Legal ", 500, 2000),
-        ("Catering ", 500, 2000),
-        ("Building ", 500, 2000),
-        ("Insurance ", 500, 2000),
-        ("Telecommunications ", 500, 2000),
-        ("Printing ", 500, 2000),
-        ("Postage ", 500, 2000),
-        ("Hardware", 500, 2000),
-    ]
+    services = SERVICES
         
     for _ in range(num_invoices):
         # Pick a random vendor
@@ -74,7 +90,7 @@ def generate_b2b_invoices(num_invoices=50):
             })
             
         # Calculate Tax (20% VAT)
-        tax_rate = 0.20
+        tax_rate = TAX_RATE
         tax_amount = round(subtotal * tax_rate, 2)
         total_amount = round(subtotal + tax_amount, 2)
 
@@ -102,11 +118,7 @@ def save_to_csv(invoices, filename="synthetic_b2b_invoices.csv"):
     with open(filename, mode='w', newline='', encoding='utf-8') as f:
         writer = csv.writer(f)
         # Header matches a standard "Export" format
-        writer.writerow([
-        "Invoice_ID", "Date", "Vendor", "Customer", 
-        "Description", "Quantity", "Unit_Price", "Line_Total", 
-        "Invoice_Subtotal", "Invoice_Tax", "Invoice_Total"
-    ])
+        writer.writerow(CSV_HEADER)
     
         for inv in invoices:
             for item in inv['line_items']:
@@ -125,10 +137,214 @@ def save_to_csv(invoices, filename="synthetic_b2b_invoices.csv"):
                 ])
     print(f"Saved {len(invoices)} invoices to {filename}")
 
-# Run it
-data = generate_b2b_invoices(100)
-save_to_csv(data)
+# ================= HIGH-VOLUME MODE =================
+# Pre-sampled pools: Faker is only called a few thousand times, whatever the row count
+def build_pools(seed, num_vendors=10, num_customers=500, num_phrases=2000):
+    """Samples vendor (name, address, VAT number)/customer/catch-phrase pools once with a seeded Faker."""
+    pool_fake = Faker('en_GB')
+    pool_fake.seed_instance(seed)
+    return {
+        "vendors": np.array([pool_fake.company() for _ in range(num_vendors)], dtype=object),
+        # Same formats as generate_b2b_invoices, index-aligned with "vendors"
+        "vendor_addresses": np.array([pool_fake.address().replace('\n', ', ') for _ in range(num_vendors)], dtype=object),
+        "vendor_tax_ids": np.array([f"GB{pool_fake.random_number(digits=9)}" for _ in range(num_vendors)], dtype=object),
+        "customers": np.array([pool_fake.company() for _ in range(num_customers)], dtype=object),
+        "phrases": np.array([pool_fake.catch_phrase() for _ in range(num_phrases)], dtype=object),
+    }
+
+def generate_invoice_chunk(rng, pools, first_invoice_no, num_invoices, end_date):
+    """
+    Builds `num_invoices` invoices as one flat DataFrame of line items (the CSV export's columns
+    plus Vendor_Address and Vendor_Tax_ID), sampling every field as a NumPy array.
+    """
+    service_names = np.array([name for name, _, _ in SERVICES], dtype=object)
+    min_prices = np.array([lo for _, lo, _ in SERVICES], dtype=np.float64)
+    max_prices = np.array([hi for _, _, hi in SERVICES], dtype=np.float64)
+
+    # Invoice-level fields
+    invoice_nos = np.arange(first_invoice_no, first_invoice_no + num_invoices)
+    days_back = rng.integers(0, 366, num_invoices)
+    invoice_dates = np.datetime64(end_date) - days_back.astype("timedelta64[D]")
+    vendor_idx = rng.integers(0, len(pools["vendors"]), num_invoices)
+    customer_idx = rng.integers(0, len(pools["customers"]), num_invoices)
+    items_per_invoice = rng.integers(1, 6, num_invoices)  # 1 to 5 line items
+
+    # Line-item fields
+    num_items = int(items_per_invoice.sum())
+    owner = np.repeat(np.arange(num_invoices), items_per_invoice)
+    service_idx = rng.integers(0, len(SERVICES), num_items)
+    qty = rng.integers(1, 11, num_items)
+    unit_price = np.round(rng.uniform(min_prices[service_idx], max_prices[service_idx]), 2)
+    line_total = np.round(qty * unit_price, 2)
+    phrase_idx = rng.integers(0, len(pools["phrases"]), num_items)
+
+    # Totals: sum each invoice's slice of line items
+    starts = np.concatenate(([0], np.cumsum(items_per_invoice)[:-1]))
+    subtotal = np.round(np.add.reduceat(line_total, starts), 2)
+    tax_amount = np.round(subtotal * TAX_RATE, 2)
+    total_amount = np.round(subtotal + tax_amount, 2)
+
+    invoice_ids = pd.Series(invoice_nos).map("INV-{:09d}".format).to_numpy()
+    return pd.DataFrame({
+        "Invoice_ID": invoice_ids[owner],
+        "Date": invoice_dates.astype(str)[owner],
+        "Vendor": pools["vendors"][vendor_idx][owner],
+        "Vendor_Address": pools["vendor_addresses"][vendor_idx][owner],
+        "Vendor_Tax_ID": pools["vendor_tax_ids"][vendor_idx][owner],
+        "Customer": pools["customers"][customer_idx][owner],
+        "Description": service_names[service_idx] + " - " + pools["phrases"][phrase_idx],
+        "Quantity": qty,
+        "Unit_Price": unit_price,
+        "Line_Total": line_total,
+        "Invoice_Subtotal": subtotal[owner],
+        "Invoice_Tax": tax_amount[owner],
+        "Invoice_Total": total_amount[owner],
+    })
+
+def chunk_to_invoices(chunk):
+    """Regroups a flat chunk into the nested invoice records used by the JSON export."""
+    # Line items of one invoice are contiguous, so split on the rows where the ID changes
+    ids = chunk["Invoice_ID"].to_numpy()
+    bounds = np.flatnonzero(ids[1:] != ids[:-1]) + 1
+    starts = np.concatenate(([0], bounds)).tolist()
+    stops = np.concatenate((bounds, [len(ids)])).tolist()
+
+    cols = {name: chunk[name].tolist() for name in chunk.columns}
+    invoices = []
+    for start, stop in zip(starts, stops):
+        invoice_date = cols["Date"][start]
+        invoices.append({
+            "invoice_id": cols["Invoice_ID"][start],
+            "date": invoice_date,
+            "due_date": (date.fromisoformat(invoice_date) + timedelta(days=30)).isoformat(),
+            "vendor_name": cols["Vendor"][start],
+            "vendor_address": cols["Vendor_Address"][start],
+            "vendor_tax_id": cols["Vendor_Tax_ID"][start],
+            "customer_name": cols["Customer"][start],
+            "line_items": [
+                {"description": cols["Description"][i], "quantity": cols["Quantity"][i],
+                 "unit_price": cols["Unit_Price"][i], "line_total": cols["Line_Total"][i]}
+                for i in range(start, stop)
+            ],
+            "subtotal": cols["Invoice_Subtotal"][start],
+            "tax_amount": cols["Invoice_Tax"][start],
+            "total_amount": cols["Invoice_Total"][start],
+            "currency": "GBP",
+        })
+    return invoices
+
+class ChunkWriter:
+    """Appends chunks to CSV, JSONL (one nested invoice per line) or Parquet without holding them in memory."""
+
+    def __init__(self, filename, fmt):
+        self.filename = filename
+        self.fmt = fmt
+        self._parquet = None
+        self._first = True
+        if fmt == "parquet":
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                raise ImportError("Parquet output needs pyarrow: pip install pyarrow")
+        else:
+            self._file = open(filename, "w", newline="", encoding="utf-8")
+
+    def write(self, chunk):
+        if self.fmt == "csv":
+            chunk[CSV_HEADER].to_csv(self._file, header=self._first, index=False)  # Same columns as save_to_csv
+        elif self.fmt == "jsonl":
+            for invoice in chunk_to_invoices(chunk):
+                self._file.write(json.dumps(invoice) + "\n")
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if self._parquet is None:
+                self._parquet = pq.ParquetWriter(self.filename, table.schema)
+            self._parquet.write_table(table)
+        self._first = False
+
+    def close(self):
+        if self._parquet is not None:
+            self._parquet.close()
+        elif self.fmt != "parquet":
+            self._file.close()
+
+def generate_to_file(filename, fmt, num_invoices, seed_seq, pools, first_invoice_no=0,
+                     chunk_size=100_000, end_date=None):
+    """Streams `num_invoices` invoices to disk in chunks. Returns (invoices, line items) written."""
+    rng = np.random.default_rng(seed_seq)
+    end_date = end_date or date.today().isoformat()
+    writer = ChunkWriter(filename, fmt)
+    line_items = 0
+    try:
+        for start in range(0, num_invoices, chunk_size):
+            count = min(chunk_size, num_invoices - start)
+            chunk = generate_invoice_chunk(rng, pools, first_invoice_no + start, count, end_date)
+            writer.write(chunk)
+            line_items += len(chunk)
+    finally:
+        writer.close()
+    return num_invoices, line_items
+
+def _worker(job):
+    return generate_to_file(**job)
+
+def generate_bulk(num_invoices, out, fmt="csv", seed=42, workers=1, chunk_size=100_000, end_date=None):
+    """
+    High-volume generator. Each worker process gets a disjoint child seed (SeedSequence.spawn),
+    a disjoint invoice-number range and its own part file, so runs are reproducible for a given
+    seed, worker count and end date.
+    """
+    end_date = end_date or date.today().isoformat()
+    pools = build_pools(seed)
+    child_seeds = np.random.SeedSequence(seed).spawn(workers)
+    per_worker = -(-num_invoices // workers)  # ceil
+
+    jobs = []
+    for i, child in enumerate(child_seeds):
+        first = i * per_worker
+        count = min(per_worker, num_invoices - first)
+        if count <= 0:
+            break
+        filename = out if workers == 1 else f"{os.path.splitext(out)[0]}.part-{i:03d}.{fmt}"
+        jobs.append(dict(filename=filename, fmt=fmt, num_invoices=count, seed_seq=child, pools=pools,
+                         first_invoice_no=first, chunk_size=chunk_size, end_date=end_date))
+
+    start = datetime.now()
+    if len(jobs) == 1:
+        results = [_worker(jobs[0])]
+    else:
+        with ProcessPoolExecutor(max_workers=len(jobs)) as pool:
+            results = list(pool.map(_worker, jobs))
+    elapsed = (datetime.now() - start).total_seconds()
+
+    invoices = sum(r[0] for r in results)
+    line_items = sum(r[1] for r in results)
+    print(f"Saved {invoices:,} invoices ({line_items:,} line items) to {len(jobs)} {fmt} file(s) "
+          f"in {elapsed:.1f}s ({line_items / max(elapsed, 1e-9):,.0f} rows/s)")
+    return [job["filename"] for job in jobs]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Generate synthetic B2B invoices')
+    parser.add_argument('--bulk', action='store_true', help='Vectorised high-volume mode (streams to disk)')
+    parser.add_argument('--invoices', type=int, default=100)
+    parser.add_argument('--out', default=None, help='Output file (bulk mode)')
+    parser.add_argument('--format', default="csv", choices=["csv", "jsonl", "parquet"])
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--workers', type=int, default=1, help='Processes, each with a disjoint seed')
+    parser.add_argument('--chunk-size', type=int, default=100_000, help='Invoices sampled per chunk')
+    parser.add_argument('--end-date', default=None, help='Latest invoice date (YYYY-MM-DD), default today')
+    args = parser.parse_args()
+
+    if args.bulk:
+        out = args.out or f"synthetic_b2b_invoices.{args.format}"
+        generate_bulk(args.invoices, out, args.format, args.seed, args.workers, args.chunk_size, args.end_date)
+    else:
+        # Run it
+        data = generate_b2b_invoices(args.invoices)
+        save_to_csv(data)
 
-# Optional: Save JSON if you want to train an Agent to read the whole structure later
-with open("synthetic_b2b_invoices.json", "w") as f:
-    json.dump(data, f, indent=2)
\ No newline at end of file
+        # Optional: Save JSON if you want to train an Agent to read the whole structure later
+        with open("synthetic_b2b_invoices.json", "w") as f:
+            json.dump(data, f, indent=2)
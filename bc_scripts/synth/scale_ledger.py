@@ -0,0 +1,230 @@
+import os
+import csv
+import hashlib
+import argparse
+from collections import defaultdict
+from datetime import date, timedelta
+import numpy as np
+from beancount import loader
+from beancount.core.data import Transaction
+
+# ================= CONFIGURATION =================
+SEED_LEDGER = "my_accounts.beancount"
+SOURCE_ACCOUNT = "Assets:US:BofA:Checking"
+OUTPUT_LEDGER = "scaled_accounts.beancount"
+OUTPUT_CSV = "scaled_bank_statement.csv"
+
+CHUNK_TXNS = 200_000     # Transactions generated and written per chunk
+BALANCE_EVERY_DAYS = 30  # Emit a balance assertion roughly monthly so the ledger checks itself
+MAX_REL_STD = 0.25       # Cap on amount jitter relative to a template's mean
+
+# Description variants, so distinct descriptions (and the brain's index) grow with the ledger
+# like a real statement export instead of repeating the seed's few payee/narration pairs
+SPELLING_RATE = 0.3      # Share of rows with another bank spelling of the payee
+STORE_RATE = 0.3         # Share of rows with a store/branch number after the payee
+STORE_NUMBERS = 200      # Distinct store/branch numbers per payee
+REFERENCE_RATE = 0.2     # Share of rows whose narration carries a payment reference (unique per row)
+PAYEE_PREFIXES = ["POS ", "CARD ", "DD ", "BGC "]  # How banks prefix card, direct debit and credit payees
+
+
+def learn_profile(beancount_file, source_account):
+    """
+    Reads the seed ledger and learns "templates" from the transactions with one posting on
+    the source account: (payee, narration, source currency, other postings) with how often
+    they occur and the mean/std of the source amount (in cents, signed for the source account).
+    Other postings are (account, currency, amount per unit of the source amount), so splits
+    like a payslip scale with the generated amount.
+    """
+    entries, errors, _ = loader.load_file(beancount_file)
+    if errors:
+        print(f"Note: {len(errors)} errors found in seed ledger (often normal for generated data).")
+
+    amounts = defaultdict(list)   # template key -> [source cents]
+    others = defaultdict(list)    # template key -> [[other postings' cents]]
+    for entry in entries:
+        if not isinstance(entry, Transaction):
+            continue
+        source = [p for p in entry.postings if p.account == source_account]
+        other = [p for p in entry.postings if p.account != source_account]
+        if len(source) != 1 or not other or source[0].units is None or not source[0].units.number:
+            continue
+        if any(p.units is None or p.cost is not None or p.price is not None for p in entry.postings):
+            continue
+        key = (entry.payee or "", entry.narration or "", source[0].units.currency,
+               tuple((p.account, p.units.currency) for p in other))
+        amounts[key].append(int(round(source[0].units.number * 100)))
+        others[key].append([int(round(p.units.number * 100)) for p in other])
+
+    if not amounts:
+        raise ValueError(f"No transactions on {source_account} found in {beancount_file}")
+
+    keys = list(amounts)
+    counts = np.array([len(amounts[k]) for k in keys], dtype=np.float64)
+    means = np.array([np.mean(amounts[k]) for k in keys])
+    stds = np.array([np.std(amounts[k]) for k in keys])
+    rel_std = np.minimum(np.divide(stds, np.abs(means), out=np.zeros_like(stds), where=means != 0), MAX_REL_STD)
+    templates = []
+    for key, mean in zip(keys, means):
+        ratios = np.mean(others[key], axis=0) / mean
+        templates.append(key[:3] + (tuple((account, currency, float(ratio))
+                                          for (account, currency), ratio in zip(key[3], ratios)),))
+    return {
+        "templates": templates,
+        "weights": counts / counts.sum(),
+        "mean_cents": means,
+        "rel_std": rel_std,
+        "counter_accounts": sorted({account for t in templates for account, _, _ in t[3]}),
+        "currencies": sorted({t[2] for t in templates}),
+        "split_templates": sum(len(t[3]) > 1 for t in templates),
+    }
+
+
+def payee_spellings(payee):
+    """Other ways a bank export writes the payee (the normalised text differs for every one)."""
+    if not payee:
+        return [payee]
+    short = payee[:max(4, len(payee) * 2 // 3)].rstrip()
+    return [prefix + payee.upper() for prefix in PAYEE_PREFIXES] + [short, f"{payee} Online"]
+
+
+def other_postings(postings, source_currency, cents):
+    """[(account, cents, currency)] of a template's other postings, balancing `cents` on the source account."""
+    amounts = [int(round(ratio * cents)) for _, _, ratio in postings]
+    # Rounding residue goes to the largest posting of each currency
+    for currency in {c for _, c, _ in postings}:
+        members = [i for i, (_, c, _) in enumerate(postings) if c == currency]
+        target = -cents if currency == source_currency else 0
+        largest = max(members, key=lambda i: abs(amounts[i]))
+        amounts[largest] += target - sum(amounts[i] for i in members)
+    return [(account, amount, currency) for (account, currency, _), amount in zip(postings, amounts) if amount]
+
+
+def quote(text):
+    return '"' + text.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+def format_cents(cents):
+    sign = "-" if cents < 0 else ""
+    cents = abs(cents)
+    return f"{sign}{cents // 100}.{cents % 100:02d}"
+
+
+def transaction_id(date_str, payee, description, amount_str, account_name):
+    """Same stable ID as bean_to_csv.export_to_csv."""
+    unique_string = f"{date_str}{payee}{description}{amount_str}{account_name}"
+    return hashlib.md5(unique_string.encode('utf-8')).hexdigest()[:10]
+
+
+def write_header(f, profile, source_account, start):
+    f.write(';; THIS FILE HAS BEEN AUTO-GENERATED by scale_ledger.py.\n')
+    f.write('option "title" "Scaled synthetic ledger"\n')
+    f.write(f'option "operating_currency" "{profile["currencies"][0]}"\n\n')
+    opened_on = (start - timedelta(days=1)).isoformat()
+    f.write(f"{opened_on} open {source_account}  {','.join(profile['currencies'])}\n")
+    for account in profile["counter_accounts"]:
+        f.write(f"{opened_on} open {account}\n")
+    f.write("\n")
+
+
+def scale(profile, num_txns, source_account, bank_name, ledger_out, csv_out, start, end, seed=0):
+    """
+    Streams `num_txns` balancing transactions to the ledger and the matching rows to the
+    bank CSV, chunk by chunk, in date order. Payees and narrations get variants (spellings,
+    store numbers, payment references) at the configured rates.
+    """
+    rng = np.random.default_rng(seed)
+    days = (end - start).days + 1
+
+    # Spread transactions over the days up front (cheap), then walk the days in order
+    per_day = rng.multinomial(num_txns, np.full(days, 1.0 / days))
+    day_of_txn = np.repeat(np.arange(days), per_day)
+
+    csv_source = bank_name or source_account
+    templates = profile["templates"]
+    spellings = [payee_spellings(t[0]) for t in templates]
+    running = defaultdict(int)  # cents per currency on the source account
+    last_balance_day = 0
+    written = 0
+
+    with open(ledger_out, "w", encoding="utf-8") as lf, open(csv_out, "w", newline="", encoding="utf-8") as cf:
+        write_header(lf, profile, source_account, start)
+        writer = csv.writer(cf)
+        writer.writerow(['Date', 'Payee', 'Description', 'Amount', 'Currency', 'Beancount_Id', 'Source_Account'])
+
+        for lo in range(0, num_txns, CHUNK_TXNS):
+            hi = min(lo + CHUNK_TXNS, num_txns)
+            n = hi - lo
+            picks = rng.choice(len(templates), size=n, p=profile["weights"])
+            jitter = 1.0 + rng.normal(0.0, 1.0, n) * profile["rel_std"][picks]
+            cents = np.round(profile["mean_cents"][picks] * jitter).astype(np.int64)
+            zero = cents == 0  # never emit a 0.00 posting
+            cents[zero] = np.where(profile["mean_cents"][picks][zero] < 0, -1, 1)
+            spelling = np.where(rng.random(n) < SPELLING_RATE, rng.integers(0, 1 << 30, n), -1)
+            store = np.where(rng.random(n) < STORE_RATE, rng.integers(1, STORE_NUMBERS + 1, n), 0)
+            reference = np.where(rng.random(n) < REFERENCE_RATE, rng.integers(100_000, 10_000_000, n), 0)
+
+            lines = []
+            rows = []
+            for day_idx, t, c, sp, st, ref in zip(day_of_txn[lo:hi].tolist(), picks.tolist(), cents.tolist(),
+                                                  spelling.tolist(), store.tolist(), reference.tolist()):
+                # Balance assertions apply at the start of their day, so only emit one
+                # when moving past a day boundary (everything before it is already written)
+                if day_idx - last_balance_day >= BALANCE_EVERY_DAYS:
+                    check_date = (start + timedelta(days=day_idx)).isoformat()
+                    for currency, total in sorted(running.items()):
+                        lines.append(f"{check_date} balance {source_account}  {format_cents(total)} {currency}\n\n")
+                    last_balance_day = day_idx
+
+                payee, narration, currency, postings = templates[t]
+                if payee and sp >= 0:
+                    payee = spellings[t][sp % len(spellings[t])]
+                if payee and st:
+                    payee = f"{payee} #{st:04d}"
+                if ref:
+                    narration = f"{narration} REF {ref}".strip()
+                txn_date = (start + timedelta(days=day_idx)).isoformat()
+                amount = format_cents(c)
+                running[currency] += c
+                lines.append(f"{txn_date} * {quote(payee)} {quote(narration)}\n  {source_account}  {amount} {currency}\n"
+                             + "".join(f"  {account}  {format_cents(a)} {cur}\n"
+                                       for account, a, cur in other_postings(postings, currency, c)) + "\n")
+                rows.append([txn_date, payee, narration, amount, currency,
+                             transaction_id(txn_date, payee, narration, amount, source_account), csv_source])
+
+            lf.write("".join(lines))
+            writer.writerows(rows)
+            written += n
+            print(f"   ✍️ {written:,}/{num_txns:,} transactions written")
+
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Scale a Beancount ledger and matching bank CSV for load testing')
+    parser.add_argument('--file', default=SEED_LEDGER, help='Seed beancount file (payee/account distribution)')
+    parser.add_argument('--account', default=SOURCE_ACCOUNT, help='Bank account to learn from and generate for')
+    parser.add_argument('--bank-name', default=None, help='Short bank name for the CSV Source_Account column (e.g. Lloyds); '
+                                                         'the ledger then uses Assets:<bank>:Checking')
+    parser.add_argument('--transactions', type=int, default=1_000_000, help='Transactions to generate')
+    parser.add_argument('--start', default="2000-01-01")
+    parser.add_argument('--end', default="2025-12-31")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', default=OUTPUT_LEDGER, help='Output beancount file')
+    parser.add_argument('--csv', default=OUTPUT_CSV, help='Output bank CSV')
+    args = parser.parse_args()
+
+    print(f"📖 Learning payee/account distribution from {args.file}...")
+    profile = learn_profile(args.file, args.account)
+    print(f"   {len(profile['templates'])} transaction templates ({profile['split_templates']} with split postings) "
+          f"across {len(profile['counter_accounts'])} accounts")
+
+    source_account = f"Assets:{args.bank_name}:Checking" if args.bank_name else args.account
+    start, end = date.fromisoformat(args.start), date.fromisoformat(args.end)
+    written = scale(profile, args.transactions, source_account, args.bank_name, args.out, args.csv, start, end, args.seed)
+
+    size_mb = (os.path.getsize(args.out) + os.path.getsize(args.csv)) / 1e6
+    print(f"✅ Wrote {written:,} transactions to {args.out} and {args.csv} ({size_mb:,.0f} MB)")
+
+
+if __name__ == "__main__":
+    main()
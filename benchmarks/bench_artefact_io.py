@@ -0,0 +1,99 @@
+"""
+Artefact I/O benchmark: the old json.dump(indent=2)/json.load against artefact_io's
+formats (JSON and JSONL, plain, gzip and zstd) on a data/json artefact tiled up to --tasks.
+
+Reports file size, save and load time for each, and checks every load against the
+input. --codec json forces the stdlib codec even when orjson is installed.
+
+    python -m benchmarks.bench_artefact_io --input data/json/refined_data.json --tasks 50000
+"""
+import argparse
+import json
+import os
+import tempfile
+
+import artefact_io
+from benchmarks.bench_utils import Stopwatch, print_table, save_report
+
+# ================= CONFIGURATION =================
+DEFAULT_INPUT = "data/json/refined_data.json"
+FORMATS = [".json", ".jsonl", ".json.gz", ".jsonl.gz", ".json.zst", ".jsonl.zst"]
+
+
+def tile(input_file, tasks):
+    with open(input_file, 'r') as f:
+        data = json.load(f)
+    copies = -(-tasks // len(data))  # ceil
+    return (data * copies)[:tasks]
+
+
+def legacy_save(data, filename):
+    with open(filename, 'w') as f:
+        json.dump(data, f, indent=2)
+
+
+def legacy_load(filename):
+    with open(filename, 'r') as f:
+        return json.load(f)
+
+
+def best_of(repeat, fn):
+    """Fastest of `repeat` runs (seconds) and the last result."""
+    best, result = None, None
+    for _ in range(repeat):
+        with Stopwatch() as sw:
+            result = fn()
+        best = sw.elapsed if best is None else min(best, sw.elapsed)
+    return best, result
+
+
+def run(name, save, load, filename, data, repeat):
+    save_s, _ = best_of(repeat, lambda: save(data, filename))
+    load_s, loaded = best_of(repeat, lambda: load(filename))
+    return {"format": name, "mb": round(os.path.getsize(filename) / 1e6, 2),
+            "save_s": round(save_s, 3), "load_s": round(load_s, 3), "round_trip_ok": loaded == data}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark compressed/fast-codec artefact I/O')
+    parser.add_argument('--input', default=DEFAULT_INPUT, help='JSON artefact to tile (list of tasks)')
+    parser.add_argument('--tasks', type=int, default=50_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--formats', nargs='+', default=FORMATS)
+    parser.add_argument('--codec', choices=['auto', 'json'], default='auto', help='json = ignore orjson')
+    parser.add_argument('--out', default=None, help='Optional JSON report path')
+    args = parser.parse_args()
+
+    if args.codec == 'json':
+        artefact_io.orjson = None
+    codec = "orjson" if artefact_io.orjson is not None else "json"
+    data = tile(args.input, args.tasks)
+    print(f"📄 {len(data):,} tasks from {args.input}, codec: {codec}")
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        print("⏱️ legacy json.dump(indent=2)...")
+        results.append(run("legacy .json", legacy_save, legacy_load, os.path.join(tmp, "legacy.json"), data, args.repeat))
+        for ext in args.formats:
+            print(f"⏱️ {ext}...")
+            try:
+                results.append(run(f"artefact_io {ext}", artefact_io.save, artefact_io.load,
+                                   os.path.join(tmp, "tasks" + ext), data, args.repeat))
+            except ImportError as e:
+                print(f"   ⚠️ skipped: {e}")
+
+    base = results[0]
+    for r in results:
+        r["size_x"] = round(r["mb"] / base["mb"], 3)
+        r["save_speedup"] = round(base["save_s"] / r["save_s"], 2)
+        r["load_speedup"] = round(base["load_s"] / r["load_s"], 2)
+
+    print(f"\n📊 Artefact I/O ({len(data):,} tasks, codec {codec})")
+    print_table(results, ["format", "mb", "size_x", "save_s", "load_s", "save_speedup", "load_speedup", "round_trip_ok"])
+
+    if args.out:
+        save_report({"config": vars(args), "codec": codec, "results": results}, args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Artefact store benchmark: ad-hoc questions answered by reloading the JSON files (what
+investigation.py does) vs indexed queries on artefact_store's SQLite database.
+
+The junior (training_data.json) and senior (refined_data.json) files are tiled up to
+--tasks, each copy with its own prompt so the copies stay distinct tasks. Questions:
+
+  count      outputs containing --phrase
+  corrected  payees whose account the senior changed most often (junior vs senior entry)
+
+    python -m benchmarks.bench_artefact_store --tasks 50000 --phrase "Double Entry"
+"""
+import argparse
+import hashlib
+import json
+import os
+import tempfile
+from collections import Counter
+
+import artefact_io
+import artefact_store
+from accounting_entry import parse_entry, parse_transaction, target_posting
+from benchmarks.bench_utils import Stopwatch, latency_summary, print_table, save_report
+
+# ================= CONFIGURATION =================
+DEFAULT_JUNIOR = "data/json/training_data.json"
+DEFAULT_SENIOR = "data/json/refined_data.json"
+
+
+def tile(input_file, tasks):
+    """Copies of the file's tasks up to `tasks`, each copy's prompts made unique."""
+    data = artefact_io.load(input_file)
+    tiled = []
+    for i in range(tasks):
+        task = json.loads(json.dumps(data[i % len(data)]))
+        copy = i // len(data)
+        if copy:
+            task['data']['prompt'] += f"\n<!-- copy {copy} -->"
+        tiled.append(task)
+    return tiled
+
+
+def output_text(task, key):
+    return task[key][0]['result'][0]['value']['text'][0]
+
+
+def scan_count(files, phrase):
+    """The investigation.py way: load every file, loop over every output."""
+    count = 0
+    for filename, key in files:
+        for task in artefact_io.load(filename):
+            count += phrase in output_text(task, key)
+    return count
+
+
+def scan_corrected(junior_file, senior_file, limit=10):
+    """Load both files, parse every entry and match junior to senior by prompt."""
+    def targets(filename, key):
+        found = {}
+        for task in artefact_io.load(filename):
+            prompt = task['data']['prompt']
+            posting = target_posting(parse_entry(output_text(task, key)), parse_transaction(prompt)['source'])
+            found[hashlib.sha1(prompt.encode("utf-8")).hexdigest()] = (parse_transaction(prompt)['payee'],
+                                                                       posting['account'] if posting else None)
+        return found
+    junior, senior = targets(junior_file, 'predictions'), targets(senior_file, 'annotations')
+    counts = Counter(payee for key, (payee, account) in junior.items()
+                     if key in senior and senior[key][1] != account)
+    return counts.most_common(limit)
+
+
+def timed(repeat, fn):
+    samples, result = [], None
+    for _ in range(repeat):
+        with Stopwatch() as sw:
+            result = fn()
+        samples.append(sw.elapsed)
+    return latency_summary(samples)["p50_ms"], result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark JSON rescans vs the SQLite artefact store')
+    parser.add_argument('--junior', default=DEFAULT_JUNIOR)
+    parser.add_argument('--senior', default=DEFAULT_SENIOR)
+    parser.add_argument('--tasks', type=int, default=20_000)
+    parser.add_argument('--phrase', default="Double Entry")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--out', default=None, help='Optional JSON report path')
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        junior_file, senior_file = os.path.join(tmp, "junior.json"), os.path.join(tmp, "senior.json")
+        artefact_io.save(tile(args.junior, args.tasks), junior_file)
+        artefact_io.save(tile(args.senior, args.tasks), senior_file)
+        json_mb = (os.path.getsize(junior_file) + os.path.getsize(senior_file)) / 1e6
+
+        db_file = os.path.join(tmp, "artefacts.db")
+        conn = artefact_store.connect(db_file)
+        with Stopwatch() as ingest:
+            artefact_store.ingest_file(conn, junior_file)
+            artefact_store.ingest_file(conn, senior_file)
+        db_mb = sum(os.path.getsize(os.path.join(tmp, f)) for f in os.listdir(tmp) if f.startswith("artefacts.db")) / 1e6
+        print(f"🗄️ Ingested {2 * args.tasks:,} outputs in {ingest.elapsed:.1f}s ({json_mb:.0f} MB JSON -> {db_mb:.0f} MB db)")
+
+        files = [(junior_file, 'predictions'), (senior_file, 'annotations')]
+        scan_ms, scan_n = timed(max(1, args.repeat // 5), lambda: scan_count(files, args.phrase))
+        query_ms, query_n = timed(args.repeat, lambda: artefact_store.count_containing(conn, args.phrase))
+        results.append({"question": f"count {args.phrase!r}", "scan_ms": scan_ms, "query_ms": query_ms,
+                        "speedup": round(scan_ms / query_ms, 1), "same_answer": scan_n == query_n})
+
+        scan_ms, scan_top = timed(max(1, args.repeat // 5), lambda: scan_corrected(junior_file, senior_file))
+        query_ms, query_top = timed(args.repeat, lambda: artefact_store.top_corrected_payees(conn))
+        same = [n for _, n in scan_top] == [n for _, n, _ in query_top]
+        results.append({"question": "most corrected payees", "scan_ms": scan_ms, "query_ms": query_ms,
+                        "speedup": round(scan_ms / query_ms, 1), "same_answer": same})
+        conn.close()
+
+    print(f"\n📊 Ad-hoc questions over {args.tasks:,} junior + {args.tasks:,} senior tasks")
+    print_table(results, ["question", "scan_ms", "query_ms", "speedup", "same_answer"])
+
+    if args.out:
+        save_report({"config": vars(args), "ingest_s": round(ingest.elapsed, 2), "json_mb": round(json_mb, 1),
+                     "db_mb": round(db_mb, 1), "results": results}, args.out)
+
+
+if __name__ == "__main__":
+    main()
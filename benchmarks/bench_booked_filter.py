@@ -0,0 +1,116 @@
+"""
+Already-booked filter benchmark: re-importing a statement that overlaps the ledger.
+
+A ledger and its statement export are generated with bc_scripts/synth/scale_ledger.py.
+The re-import is the last --overlap of the export with dates moved by -1..+2 days (bank
+posting delay), plus --new rows the ledger doesn't have: near misses of booked rows (one
+cent off, another payee, a week late) and second copies of re-imported rows.
+
+Reports index build time, filter time per row and how many rows reach retrieval/the LLM.
+new_dropped counts new rows (per kind) that were dropped anyway: the synthetic ledger
+repeats fixed-amount templates, so a row a week late or a second copy often does match
+another real posting with the same payee and amount within the tolerance.
+
+    python -m benchmarks.bench_booked_filter --transactions 200000 --overlap 0.1 --new 2000
+"""
+import argparse
+import os
+import random
+import subprocess
+import sys
+import tempfile
+from collections import Counter
+from datetime import date, timedelta
+
+import pandas as pd
+
+from beancount import loader
+
+from booked_index import BookedIndex
+from junior_accountant import prepare_rows
+from benchmarks.bench_utils import Stopwatch, print_table, save_report
+
+# ================= CONFIGURATION =================
+SOURCE_ACCOUNT = "Assets:US:BofA:Checking"
+NEW_KINDS = ["amount", "payee", "late"]  # Near misses: a cent off, another payee, a week after a booked row
+
+
+def build_ledger(ledger, csv_file, transactions):
+    subprocess.run([sys.executable, os.path.join("bc_scripts", "synth", "scale_ledger.py"), "--transactions",
+                    str(transactions), "--account", SOURCE_ACCOUNT, "--out", ledger, "--csv", csv_file],
+                   check=True, capture_output=True)
+
+
+def shift(day, days):
+    return (date.fromisoformat(day) + timedelta(days=days)).isoformat()
+
+
+def reimport(export, overlap, new, seed=0):
+    """(statement DataFrame, set of Beancount_Ids that are new rows)."""
+    rng = random.Random(seed)
+    booked = export.tail(max(1, int(len(export) * overlap))).copy()
+    booked['Date'] = [shift(d, rng.randint(-1, 2)) for d in booked['Date']]
+
+    # Near misses come from anywhere in the ledger; second copies from the re-imported rows
+    extra = pd.concat([export.sample(n=new - new // 4, random_state=seed, replace=len(export) < new),
+                       booked.sample(n=new // 4, random_state=seed, replace=len(booked) < new // 4)])
+    kinds = []
+    for position in range(len(extra)):
+        kind = NEW_KINDS[position % 3] if position < len(extra) - new // 4 else "copy"
+        if kind == "amount":
+            extra.iat[position, 3] = f"{float(extra.iat[position, 3]) + 0.01:.2f}"
+        elif kind == "payee":
+            extra.iat[position, 1] = f"{extra.iat[position, 1]} Refund"
+        elif kind == "late":
+            extra.iat[position, 0] = shift(extra.iat[position, 0], 7)
+        kinds.append(kind)
+    extra['Beancount_Id'] = [f"new-{kind}-{i}" for i, kind in enumerate(kinds)]
+    # Booked rows first, so a second copy is the one left over
+    return pd.concat([booked, extra]), set(extra['Beancount_Id'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the already-booked statement row filter')
+    parser.add_argument('--transactions', type=int, default=50_000, help='Ledger size')
+    parser.add_argument('--overlap', type=float, default=0.1, help='Fraction of the ledger re-imported')
+    parser.add_argument('--new', type=int, default=1000, help='Rows the ledger does not have')
+    parser.add_argument('--tolerance-days', type=int, nargs='+', default=[0, 3])
+    parser.add_argument('--out', default=None, help='Optional JSON report path')
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        ledger, csv_file = os.path.join(tmp, "ledger.beancount"), os.path.join(tmp, "statement.csv")
+        print(f"🧱 Generating a {args.transactions:,}-transaction ledger...")
+        build_ledger(ledger, csv_file, args.transactions)
+        export = pd.read_csv(csv_file, dtype={'Amount': str})
+        statement, new_ids = reimport(export, args.overlap, args.new)
+        rows = list(prepare_rows(statement).itertuples(index=False, name=None))
+        booked_rows = len(rows) - len(new_ids)
+        print(f"📄 Re-import: {len(rows):,} rows ({booked_rows:,} booked, {len(new_ids):,} new)")
+
+        with Stopwatch() as load:
+            entries, _, _ = loader.load_file(ledger)
+        for tolerance in args.tolerance_days:
+            with Stopwatch() as build:
+                index = BookedIndex.from_entries(entries, tolerance)
+            dropped = []
+            with Stopwatch() as sw:
+                kept = list(index.filter_rows(rows, dropped))
+            wrongly_dropped = Counter(i.split("-")[1] for i in new_ids - {row[0] for row in kept})
+            results.append({"tolerance_days": tolerance, "index_build_s": round(build.elapsed, 2),
+                            "filter_us_per_row": round(1e6 * sw.elapsed / len(rows), 2), "rows_to_llm": len(kept),
+                            "booked_dropped": f"{len(dropped) - sum(wrongly_dropped.values())}/{booked_rows}",
+                            "new_dropped": dict(wrongly_dropped) or 0})
+
+    print(f"\n📊 Re-importing {len(rows):,} rows against a {args.transactions:,}-transaction ledger "
+          f"(ledger load {load.elapsed:.1f}s; without the filter all {len(rows):,} go to the LLM)")
+    print_table(results, ["tolerance_days", "index_build_s", "filter_us_per_row", "rows_to_llm", "booked_dropped",
+                          "new_dropped"])
+
+    if args.out:
+        save_report({"config": vars(args), "results": results}, args.out)
+
+
+if __name__ == "__main__":
+    main()
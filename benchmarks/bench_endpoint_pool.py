@@ -0,0 +1,122 @@
+"""
+Endpoint pool benchmark: several local mock LLM servers behind endpoint_pool.EndpointPool.
+
+Sends --requests junior-sized chat requests from --clients threads and compares
+one server, a pool of --servers, a pool where one box is --slow-factor times
+slower (least-outstanding should route around it), and a pool where one box is
+killed a third of the way through (its work has to land on the others).
+
+    python -m benchmarks.bench_endpoint_pool --requests 300 --clients 12 --servers 3 --latency 0.05
+"""
+import argparse
+import threading
+import time
+
+from endpoint_pool import EndpointPool, PoolExhausted
+from benchmarks.bench_utils import Stopwatch, latency_summary, print_table, save_report
+from benchmarks.mock_llm_server import MockLLMServer
+
+# ================= CONFIGURATION =================
+PROMPT = """<transaction>
+Date: 2024-03-01
+Payee: Tesco
+Description: Groceries
+Amount: -23.40 GBP
+Source Account: Assets:Lloyds:Checking
+</transaction>"""
+
+
+def run(name, servers, requests_total, clients, kill_after=None):
+    pool = EndpointPool([s.url for s in servers], failure_threshold=2, cooldown_s=1.0, health_interval_s=1.0)
+    payload = {"model": "local-model", "messages": [{"role": "user", "content": PROMPT}],
+               "temperature": 0.1, "max_tokens": 2000}
+    lock = threading.Lock()
+    state = {"next": 0, "killed": False}
+    latencies, failures = [], []
+
+    def client():
+        while True:
+            with lock:
+                if state["next"] >= requests_total:
+                    return
+                state["next"] += 1
+                if kill_after is not None and state["next"] >= kill_after and not state["killed"]:
+                    state["killed"] = True
+                    threading.Thread(target=servers[0].stop, daemon=True).start()
+            started = time.perf_counter()
+            try:
+                pool.post(payload)
+                ok = True
+            except PoolExhausted:
+                ok = False
+            with lock:
+                (latencies if ok else failures).append(time.perf_counter() - started)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    with Stopwatch() as sw:
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    endpoints = pool.snapshot()
+    pool.close()
+
+    latency = latency_summary(latencies)
+    return {"scenario": name, "ok": len(latencies), "failed": len(failures), "wall_s": round(sw.elapsed, 3),
+            "req_per_s": round(len(latencies) / sw.elapsed, 2), "p50_ms": latency["p50_ms"], "p95_ms": latency["p95_ms"],
+            "retried": sum(e["errors"] for e in endpoints),
+            "per_endpoint": "/".join(str(e["requests"] - e["errors"]) for e in endpoints)}
+
+
+def start_servers(count, latency, slots, slow_factor=1.0, seed=0):
+    servers = []
+    for i in range(count):
+        factor = slow_factor if i == 0 else 1.0
+        servers.append(MockLLMServer(latency=latency * factor, slots=slots, seed=seed + i).start())
+    return servers
+
+
+def stop_all(servers):
+    for server in servers:
+        try:
+            server.stop()
+        except Exception:
+            pass  # already stopped by the kill scenario
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark client-side balancing over several LLM endpoints')
+    parser.add_argument('--requests', type=int, default=300)
+    parser.add_argument('--clients', type=int, default=12)
+    parser.add_argument('--servers', type=int, default=3)
+    parser.add_argument('--latency', type=float, default=0.05, help='Seconds per request on a normal box')
+    parser.add_argument('--slots', type=int, default=1, help='Concurrent requests each box can serve')
+    parser.add_argument('--slow-factor', type=float, default=4.0)
+    parser.add_argument('--out', default=None, help='Optional JSON report path')
+    args = parser.parse_args()
+
+    scenarios = [
+        ("single", dict(count=1), None),
+        (f"pool x{args.servers}", dict(count=args.servers), None),
+        (f"pool x{args.servers}, 1 slow", dict(count=args.servers, slow_factor=args.slow_factor), None),
+        (f"pool x{args.servers}, 1 killed", dict(count=args.servers), args.requests // 3),
+    ]
+    results = []
+    for name, server_args, kill_after in scenarios:
+        print(f"⏱️ {name}...")
+        servers = start_servers(latency=args.latency, slots=args.slots, **server_args)
+        try:
+            results.append(run(name, servers, args.requests, args.clients, kill_after))
+        finally:
+            stop_all(servers)
+
+    print(f"\n📊 Endpoint pool: {args.requests} requests from {args.clients} clients")
+    print_table(results, ["scenario", "ok", "failed", "wall_s", "req_per_s", "p50_ms", "p95_ms",
+                          "retried", "per_endpoint"])
+
+    if args.out:
+        save_report({"config": vars(args), "results": results}, args.out)
+
+
+if __name__ == "__main__":
+    main()
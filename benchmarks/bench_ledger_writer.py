@@ -0,0 +1,124 @@
+"""
+Ledger writer benchmark: appending approved entries in batches, validated by a full
+loader.load_file after each append (the old way) vs LedgerWriter's incremental checks.
+
+Ledgers of each --sizes are generated with bc_scripts/synth/scale_ledger.py, then
+--batches batches of --batch-size new bank transactions (dated after the ledger) are
+appended. Per-batch latency should stay flat for the writer as the ledger grows; the
+writer's one-off start-up load is reported separately. Both paths must accept the same
+entries, and a final full load of the writer's ledger must show no errors.
+
+    python -m benchmarks.bench_ledger_writer --sizes 10000 100000 --batches 5 --batch-size 100
+"""
+import argparse
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+from datetime import date, timedelta
+
+from beancount import loader
+
+from ledger_writer import LedgerWriter, entry_source
+from benchmarks.bench_utils import Stopwatch, latency_summary, print_table, save_report
+
+# ================= CONFIGURATION =================
+SOURCE_ACCOUNT = "Assets:US:BofA:Checking"
+COUNTER_ACCOUNTS = ["Expenses:Home:Electricity", "Expenses:Home:Internet", "Expenses:Home:Phone"]  # Opened by scale_ledger
+FIRST_NEW_DATE = date(2026, 1, 1)
+
+
+def build_ledger(path, size):
+    subprocess.run([sys.executable, os.path.join("bc_scripts", "synth", "scale_ledger.py"), "--transactions", str(size),
+                    "--account", SOURCE_ACCOUNT, "--out", path, "--csv", path + ".csv", "--end", "2025-12-31"],
+                   check=True, capture_output=True)
+
+
+def new_entries(count, seed=0):
+    """Approved-output style <entry> blocks for bank payments after the ledger's last date."""
+    rng = random.Random(seed)
+    blocks = []
+    for i in range(count):
+        day = FIRST_NEW_DATE + timedelta(days=i // 20)
+        amount = f"{rng.randint(100, 20000) / 100:.2f}"
+        blocks.append(f"""<entry>
+        {day} * "Shop {i % 50}" "Card payment"
+        {rng.choice(COUNTER_ACCOUNTS)}     {amount} USD
+        {SOURCE_ACCOUNT}     -{amount} USD
+    </entry>""")
+    return blocks
+
+
+def full_reload_batches(ledger, batches):
+    """Append each batch, then load_file the whole ledger to validate it."""
+    _, errors, _ = loader.load_file(ledger)
+    known = len(errors)
+    latencies, accepted = [], 0
+    for batch in batches:
+        with Stopwatch() as sw:
+            with open(ledger, 'a') as f:
+                f.write("\n" + "\n".join(entry_source(text) for text in batch))
+            _, errors, _ = loader.load_file(ledger)
+        accepted += len(batch) if len(errors) == known else 0
+        latencies.append(sw.elapsed)
+    return latencies, accepted
+
+
+def incremental_batches(ledger, batches):
+    with Stopwatch() as startup:
+        writer = LedgerWriter(ledger, batch_size=len(batches[0]))
+    latencies, accepted = [], 0
+    for batch in batches:
+        with Stopwatch() as sw:
+            reports = [report for text in batch for report in writer.add(text)]
+        accepted += sum(r['ok'] for r in reports)
+        latencies.append(sw.elapsed)
+    return startup.elapsed, latencies, accepted
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark full-reload vs incremental ledger validation')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 50_000], help='Ledger transactions')
+    parser.add_argument('--batches', type=int, default=3)
+    parser.add_argument('--batch-size', type=int, default=100)
+    parser.add_argument('--out', default=None, help='Optional JSON report path')
+    args = parser.parse_args()
+
+    blocks = new_entries(args.batches * args.batch_size)
+    batches = [blocks[i:i + args.batch_size] for i in range(0, len(blocks), args.batch_size)]
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            print(f"🧱 Generating a {size:,}-transaction ledger...")
+            seed_ledger = os.path.join(tmp, f"ledger_{size}.beancount")
+            build_ledger(seed_ledger, size)
+
+            incremental_ledger, reload_ledger = seed_ledger + ".incremental", seed_ledger + ".reload"
+            shutil.copy(seed_ledger, incremental_ledger)
+            shutil.copy(seed_ledger, reload_ledger)
+
+            print("⏱️ incremental...")
+            startup, inc_latencies, inc_accepted = incremental_batches(incremental_ledger, batches)
+            print("⏱️ full reload per batch...")
+            reload_latencies, reload_accepted = full_reload_batches(reload_ledger, batches)
+            _, final_errors, _ = loader.load_file(incremental_ledger)
+
+            inc, full = latency_summary(inc_latencies), latency_summary(reload_latencies)
+            results.append({"ledger_txns": size, "batch": args.batch_size, "writer_startup_s": round(startup, 2),
+                            "incremental_p50_ms": inc["p50_ms"], "full_reload_p50_ms": full["p50_ms"],
+                            "speedup": round(full["p50_ms"] / inc["p50_ms"], 1),
+                            "accepted": f"{inc_accepted}/{reload_accepted}", "final_errors": len(final_errors)})
+
+    print(f"\n📊 Appending {args.batches} x {args.batch_size} entries")
+    print_table(results, ["ledger_txns", "batch", "writer_startup_s", "incremental_p50_ms", "full_reload_p50_ms",
+                          "speedup", "accepted", "final_errors"])
+
+    if args.out:
+        save_report({"config": vars(args), "results": results}, args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+CPU (llama.cpp) junior benchmark: tokens/second for a GGUF model across thread
+counts, prompt batch sizes and with/without the prefix KV cache.
+
+Prompts are the real junior prompts (brain retrieval over --ledger, token budget
+applied) for the first --rows statement rows, so rows for recurring payees share
+long prefixes the way they do in a real run. Needs llama-cpp-python and a GGUF
+file (see merge_and_push.py for the conversion).
+
+    python -m benchmarks.bench_llama_cpp --gguf outputs/model.gguf --threads 4 8 --rows 20
+"""
+import argparse
+import pandas as pd
+
+import junior_accountant
+from benchmarks.bench_utils import Stopwatch, latency_summary, print_table, save_report
+
+# ================= CONFIGURATION =================
+DEFAULT_STATEMENT = "data/bank_statement.csv"
+DEFAULT_LEDGER = "my_accounts.beancount"
+
+
+def build_prompts(statement, ledger, rows):
+    agent = junior_accountant.JuniorAccountant(ledger)
+    df = pd.read_csv(statement, nrows=rows)
+    df.columns = df.columns.str.strip()
+    return [agent.prompt_for(*row[1:]) for row in junior_accountant.prepare_rows(df).itertuples(index=False, name=None)]
+
+
+def run(prompts, threads, batch, cache_mb):
+    # Fresh model per configuration so one run's cache can't help the next
+    junior_accountant._llama = None
+    junior_accountant._llama_stats.update(calls=0, prompt_tokens=0, completion_tokens=0, seconds=0.0)
+    junior_accountant.LLAMA_CPP_THREADS = threads
+    junior_accountant.LLAMA_CPP_BATCH_THREADS = threads
+    junior_accountant.LLAMA_CPP_BATCH = batch
+    junior_accountant.LLAMA_CPP_CACHE_MB = cache_mb
+    with Stopwatch() as load:
+        junior_accountant.init_llama_cpp()
+
+    latencies = []
+    for prompt in prompts:
+        with Stopwatch() as sw:
+            junior_accountant.call_llama_cpp(prompt)
+        latencies.append(sw.elapsed)
+
+    stats = junior_accountant._llama_stats
+    speed = junior_accountant.llama_cpp_throughput()
+    latency = latency_summary(latencies)
+    return {"threads": threads or "auto", "batch": batch, "prefix_cache": bool(cache_mb),
+            "load_s": round(load.elapsed, 2), "rows": len(prompts),
+            "prompt_tokens": stats["prompt_tokens"], "completion_tokens": stats["completion_tokens"],
+            "s_per_row": round(sum(latencies) / len(latencies), 3), "p95_ms": latency["p95_ms"],
+            "gen_tok_per_s": round(speed["completion_tokens_per_s"], 2),
+            "total_tok_per_s": round(speed["total_tokens_per_s"], 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the llama.cpp (CPU) junior provider')
+    parser.add_argument('--gguf', default=junior_accountant.GGUF_MODEL_PATH)
+    parser.add_argument('--statement', default=DEFAULT_STATEMENT)
+    parser.add_argument('--ledger', default=DEFAULT_LEDGER)
+    parser.add_argument('--rows', type=int, default=20)
+    parser.add_argument('--threads', type=int, nargs='+', default=[0], help='0 = let llama.cpp decide')
+    parser.add_argument('--batch', type=int, nargs='+', default=[junior_accountant.LLAMA_CPP_BATCH])
+    parser.add_argument('--cache-mb', type=int, default=junior_accountant.LLAMA_CPP_CACHE_MB or 2048)
+    parser.add_argument('--out', default=None, help='Optional JSON report path')
+    args = parser.parse_args()
+
+    junior_accountant.GGUF_MODEL_PATH = args.gguf
+    prompts = build_prompts(args.statement, args.ledger, args.rows)
+
+    results = []
+    for threads in args.threads:
+        for batch in args.batch:
+            for cache_mb in (0, args.cache_mb):
+                print(f"⏱️ threads={threads or 'auto'} batch={batch} prefix_cache={bool(cache_mb)}...")
+                results.append(run(prompts, threads or None, batch, cache_mb))
+
+    print(f"\n📊 llama.cpp junior on {args.gguf} ({len(prompts)} rows)")
+    print_table(results, ["threads", "batch", "prefix_cache", "load_s", "rows", "prompt_tokens", "completion_tokens",
+                          "s_per_row", "p95_ms", "gen_tok_per_s", "total_tok_per_s"])
+
+    if args.out:
+        save_report({"config": vars(args), "results": results}, args.out)
+
+
+if __name__ == "__main__":
+    main()
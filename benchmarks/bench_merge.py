@@ -0,0 +1,112 @@
+"""
+LoRA merge benchmark: merge_and_push.py --mode full vs --mode streaming, offline.
+
+Builds a small randomly initialised Llama checkpoint (sharded safetensors, float16)
+and a random LoRA adapter for it with PEFT, runs both merge modes in separate
+processes (peak RSS and wall time each), and checks the streaming result
+against PEFT's own merge_and_unload().
+
+    python -m benchmarks.bench_merge --tokenizer HuggingFaceTB/SmolLM2-135M-Instruct --hidden 1024 --layers 8
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import torch
+from transformers import AutoModelForCausalLM, AutoTokenizer, LlamaConfig, LlamaForCausalLM
+
+from junior_accountant import PROMPT_TOKENIZER
+from benchmarks.bench_utils import Stopwatch, print_table, save_report
+
+# ================= CONFIGURATION =================
+TARGET_MODULES = ["q_proj", "k_proj", "v_proj", "o_proj", "gate_proj", "up_proj", "down_proj"]
+
+
+def build_base(path, tokenizer, hidden, layers, shard_size):
+    torch.manual_seed(0)
+    config = LlamaConfig(vocab_size=len(tokenizer), hidden_size=hidden, intermediate_size=hidden * 3,
+                         num_hidden_layers=layers, num_attention_heads=max(1, hidden // 64),
+                         num_key_value_heads=max(1, hidden // 64), max_position_embeddings=2048)
+    model = LlamaForCausalLM(config).to(torch.float16)
+    model.save_pretrained(path, max_shard_size=shard_size)
+    tokenizer.save_pretrained(path)
+    return sum(p.numel() for p in model.parameters())
+
+
+def build_adapter(base_path, path, rank):
+    from peft import LoraConfig, get_peft_model
+    torch.manual_seed(1)
+    model = AutoModelForCausalLM.from_pretrained(base_path, dtype=torch.float32)
+    # init_lora_weights=False: random A and B, so the merge actually changes the weights
+    config = LoraConfig(r=rank, lora_alpha=2 * rank, target_modules=TARGET_MODULES, init_lora_weights=False)
+    get_peft_model(model, config).save_pretrained(path)
+
+
+def run_mode(mode, adapter, output):
+    """Runs merge_and_push.py in a fresh process; returns wall time and its reported peak memory."""
+    with Stopwatch() as sw:
+        proc = subprocess.run([sys.executable, "merge_and_push.py", "--checkpoint", adapter, "--output", output,
+                               "--mode", mode], capture_output=True, text=True)
+    if proc.returncode != 0:
+        print(proc.stdout[-2000:], proc.stderr[-2000:])
+        raise RuntimeError(f"--mode {mode} failed")
+    peak = re.search(r"Peak memory: ([\d,]+) MB", proc.stdout)
+    return {"mode": mode, "wall_s": round(sw.elapsed, 2), "peak_rss_mb": int(peak.group(1).replace(",", ""))}
+
+
+def check_against_peft(base_path, adapter, merged_path):
+    """Max |difference| between the streamed weights/logits and PEFT merge_and_unload (both float16)."""
+    from peft import PeftModel
+    reference = PeftModel.from_pretrained(AutoModelForCausalLM.from_pretrained(base_path, dtype=torch.float16),
+                                          adapter).merge_and_unload().eval()
+    merged = AutoModelForCausalLM.from_pretrained(merged_path, dtype=torch.float16).eval()
+    base = AutoModelForCausalLM.from_pretrained(base_path, dtype=torch.float16).eval()
+
+    ref_state, merged_state, base_state = reference.state_dict(), merged.state_dict(), base.state_dict()
+    weight_diff = max((ref_state[k].float() - merged_state[k].float()).abs().max().item() for k in ref_state)
+    changed = sum(not torch.equal(merged_state[k], base_state[k]) for k in merged_state)
+
+    ids = torch.randint(0, merged.config.vocab_size, (1, 32))
+    with torch.no_grad():
+        logits_diff = (reference(ids).logits.float() - merged(ids).logits.float()).abs().max().item()
+    return {"max_weight_diff": weight_diff, "max_logit_diff": logits_diff, "tensors_changed": changed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark full vs streaming LoRA merge')
+    parser.add_argument('--tokenizer', default=PROMPT_TOKENIZER)
+    parser.add_argument('--hidden', type=int, default=512)
+    parser.add_argument('--layers', type=int, default=8)
+    parser.add_argument('--rank', type=int, default=16)
+    parser.add_argument('--shard-size', default="50MB")
+    parser.add_argument('--out', default=None, help='Optional JSON report path')
+    args = parser.parse_args()
+
+    tokenizer = AutoTokenizer.from_pretrained(args.tokenizer)
+    with tempfile.TemporaryDirectory() as tmp:
+        base, adapter = os.path.join(tmp, "base"), os.path.join(tmp, "adapter")
+        params = build_base(base, tokenizer, args.hidden, args.layers, args.shard_size)
+        build_adapter(base, adapter, args.rank)
+        shards = [f for f in os.listdir(base) if f.endswith(".safetensors")]
+        size_mb = sum(os.path.getsize(os.path.join(base, f)) for f in shards) / 2**20
+        print(f"🧱 Base: {params / 1e6:.1f}M params, {size_mb:.0f} MB in {len(shards)} shards")
+
+        results = []
+        for mode in ("streaming", "full"):
+            print(f"⏱️ --mode {mode}...")
+            results.append(run_mode(mode, adapter, os.path.join(tmp, f"merged_{mode}")))
+        check = check_against_peft(base, adapter, os.path.join(tmp, "merged_streaming"))
+
+    print("\n📊 LoRA merge")
+    print_table(results, ["mode", "wall_s", "peak_rss_mb"])
+    print(f"\n🔍 Streaming vs PEFT merge_and_unload: max weight diff {check['max_weight_diff']:.2e}, "
+          f"max logit diff {check['max_logit_diff']:.2e}, {check['tensors_changed']} tensors changed")
+
+    if args.out:
+        save_report({"config": vars(args), "base_mb": round(size_mb, 1), "results": results, "check": check}, args.out)
+
+
+if __name__ == "__main__":
+    main()
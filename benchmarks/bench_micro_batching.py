@@ -0,0 +1,109 @@
+"""
+Micro-batching benchmark for junior_server.py (CPU friendly).
+
+Starts the server in-process on a tiny randomly initialised Llama (or --model),
+fires --requests junior prompts at it from --clients concurrent clients, and
+compares batch-size limits: requests/second, client latency, the batch sizes
+the server actually formed and how long requests queued. Each limit is run with and
+without "logprobs" in the request (junior_accountant asks for them whenever
+JUNIOR_CONFIDENCE_LOGPROB_WEIGHT > 0, so that's the path the junior really takes).
+
+    python -m benchmarks.bench_micro_batching --tokenizer HuggingFaceTB/SmolLM2-135M-Instruct --clients 8
+"""
+import argparse
+import threading
+import pandas as pd
+import requests
+from transformers import AutoModelForCausalLM, AutoTokenizer
+
+from junior_accountant import PROMPT_TOKENIZER, prepare_rows, render_prompt
+from junior_server import JuniorServer, MicroBatcher, batch_generator
+from benchmarks.bench_constrained import FIXED_CONTEXT, tiny_model
+from benchmarks.bench_utils import Stopwatch, latency_summary, print_table, save_report
+
+# ================= CONFIGURATION =================
+DEFAULT_STATEMENT = "data/bank_statement.csv"
+BATCH_SIZES = [1, 4, 8]
+
+
+def run(model, tokenizer, prompts, clients, max_batch_size, max_wait_ms, max_tokens, logprobs=False):
+    batcher = MicroBatcher(batch_generator(model, tokenizer), max_batch_size, max_wait_ms)
+    server = JuniorServer(batcher, port=0).start()
+    work = list(prompts)
+    lock = threading.Lock()
+    latencies, failures = [], []
+
+    def client():
+        session = requests.Session()
+        while True:
+            with lock:
+                if not work:
+                    return
+                prompt = work.pop()
+            payload = {"messages": [{"role": "user", "content": prompt}], "temperature": 0, "max_tokens": max_tokens,
+                       "logprobs": logprobs}
+            with Stopwatch() as sw:
+                response = session.post(server.url, json=payload)
+            ok = response.ok and (not logprobs or "logprobs" in response.json()["choices"][0])
+            with lock:
+                (latencies if ok else failures).append(sw.elapsed)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    try:
+        with Stopwatch() as sw:
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        stats = batcher.snapshot()
+    finally:
+        server.stop()
+
+    latency = latency_summary(latencies)
+    return {"max_batch_size": max_batch_size, "logprobs": logprobs, "requests": len(latencies), "failed": len(failures),
+            "wall_s": round(sw.elapsed, 3), "req_per_s": round(len(latencies) / sw.elapsed, 2),
+            "p50_ms": latency["p50_ms"], "p95_ms": latency["p95_ms"],
+            "mean_batch": stats["mean_batch_size"], "max_queue": stats["max_queue_depth"],
+            "queue_p95_ms": round(1000 * stats["queue_wait_p95_s"], 1) if stats["queue_wait_p95_s"] is not None else None,
+            "tokens_per_busy_s": stats["tokens_per_busy_s"]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark micro-batching in the junior server')
+    parser.add_argument('--model', default=None, help='Causal LM to load (default: tiny random Llama)')
+    parser.add_argument('--tokenizer', default=None, help=f'Tokenizer (default: --model, else {PROMPT_TOKENIZER})')
+    parser.add_argument('--statement', default=DEFAULT_STATEMENT)
+    parser.add_argument('--requests', type=int, default=32)
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=BATCH_SIZES)
+    parser.add_argument('--max-wait-ms', type=float, default=20.0)
+    parser.add_argument('--max-tokens', type=int, default=32)
+    parser.add_argument('--logprobs', choices=['off', 'on', 'both'], default='both', help='Ask for token logprobs')
+    parser.add_argument('--out', default=None, help='Optional JSON report path')
+    args = parser.parse_args()
+
+    tokenizer = AutoTokenizer.from_pretrained(args.tokenizer or args.model or PROMPT_TOKENIZER)
+    model = AutoModelForCausalLM.from_pretrained(args.model).eval() if args.model else tiny_model(len(tokenizer))
+
+    df = pd.read_csv(args.statement, nrows=args.requests)
+    df.columns = df.columns.str.strip()
+    rows = list(prepare_rows(df).itertuples(index=False, name=None))
+    prompts = [render_prompt(FIXED_CONTEXT, *rows[i % len(rows)][1:]) for i in range(args.requests)]
+
+    modes = {'off': [False], 'on': [True], 'both': [False, True]}[args.logprobs]
+    results = []
+    for logprobs in modes:
+        for size in args.batch_sizes:
+            print(f"⏱️ max_batch_size={size}, logprobs={logprobs}...")
+            results.append(run(model, tokenizer, prompts, args.clients, size, args.max_wait_ms, args.max_tokens, logprobs))
+
+    print(f"\n📊 Micro-batching: {args.requests} requests from {args.clients} clients, {args.max_tokens} new tokens each")
+    print_table(results, ["max_batch_size", "logprobs", "requests", "failed", "wall_s", "req_per_s", "p50_ms", "p95_ms",
+                          "mean_batch", "max_queue", "queue_p95_ms", "tokens_per_busy_s"])
+
+    if args.out:
+        save_report({"config": vars(args), "results": results}, args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+End-to-end throughput benchmark: JuniorAccountant.process_batch -> senior_accountant.run_audit -> janitor,
+with both LLM stages pointed at the local mock server (no real models needed).
+
+The bank statement is tiled up to --rows, and for every stage we report wall
+time, rows/second, how long rows sat in the work queue before their LLM call
+started, and how long requests waited for a free slot on the server.
+
+    python -m benchmarks.bench_pipeline --rows 2000 --latency 0.02 --tokens-per-sec 400 --error-rate 0.01
+"""
+import argparse
+import os
+import tempfile
+import time
+import pandas as pd
+
+import junior_accountant
+import senior_accountant
+from bc_scripts.clean import janitor
+from benchmarks.bench_utils import Stopwatch, latency_summary, print_table, save_report
+from benchmarks.mock_llm_server import MockLLMServer
+
+# ================= CONFIGURATION =================
+DEFAULT_STATEMENT = "data/bank_statement.csv"
+DEFAULT_LEDGER = "my_accounts.beancount"
+
+
+def scale_statement(csv_file, rows, out_file):
+    """Tiles the statement up to `rows` rows, keeping Beancount_Id unique."""
+    df = pd.read_csv(csv_file)
+    df.columns = df.columns.str.strip()
+    copies = -(-rows // len(df))  # ceil
+    big = pd.concat([df] * copies, ignore_index=True).head(rows)
+    if 'Beancount_Id' in big.columns:
+        copy_no = (big.index // len(df)).astype(str)
+        big['Beancount_Id'] = big['Beancount_Id'].astype(str) + "-" + copy_no
+    big.to_csv(out_file, index=False)
+    return len(big)
+
+
+class CallRecorder:
+    """Wraps an LLM call to record when each row's call started and how long it took."""
+
+    def __init__(self, fn):
+        self.fn = fn
+        self.stage_start = None
+        self.queued = []
+        self.service = []
+
+    def __call__(self, *args, **kwargs):
+        started = time.perf_counter()
+        self.queued.append(started - self.stage_start)
+        try:
+            return self.fn(*args, **kwargs)
+        finally:
+            self.service.append(time.perf_counter() - started)
+
+
+def stage_row(name, rows, wall_s, recorder=None, server_stats=None):
+    row = {"stage": name, "rows": rows, "wall_s": round(wall_s, 3),
+           "rows_per_s": round(rows / wall_s, 2) if wall_s and rows else None}
+    if recorder is not None:
+        queued = latency_summary(recorder.queued)
+        service = latency_summary(recorder.service)
+        row.update({"queue_mean_ms": queued["mean_ms"], "queue_p95_ms": queued["p95_ms"],
+                    "llm_p50_ms": service["p50_ms"], "llm_p95_ms": service["p95_ms"]})
+    if server_stats is not None:
+        row.update({"slot_wait_p95_ms": latency_summary(server_stats["queue_wait_s"])["p95_ms"],
+                    "server_errors": server_stats["errors"],
+                    "completion_tokens": server_stats["completion_tokens"]})
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pipeline throughput benchmark against a mock LLM server')
+    parser.add_argument('--statement', default=DEFAULT_STATEMENT)
+    parser.add_argument('--ledger', default=DEFAULT_LEDGER)
+    parser.add_argument('--rows', type=int, default=2000, help='Rows to push through the pipeline')
+    parser.add_argument('--latency', type=float, default=0.02)
+    parser.add_argument('--tokens-per-sec', type=float, default=0.0)
+    parser.add_argument('--prefill-tokens-per-sec', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--slots', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', default=None, help='Optional JSON report path')
+    args = parser.parse_args()
+
+    server = MockLLMServer(latency=args.latency, tokens_per_sec=args.tokens_per_sec,
+                           prefill_tokens_per_sec=args.prefill_tokens_per_sec,
+                           error_rate=args.error_rate, slots=args.slots, seed=args.seed).start()
+    print(f"🎭 Mock LLM running at {server.url}")
+
+    # Point both agents at the mock and remove the politeness delay
+    junior_accountant.LLM_API_URL = server.url
+    junior_accountant.PROVIDER = "lm-studio"
+    junior_accountant.REQUEST_DELAY = 0
+    senior_accountant.LLM_API_URL = server.url
+    senior_accountant.PROVIDER = "lm-studio"
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        statement = os.path.join(tmp, "statement.csv")
+        junior_out = os.path.join(tmp, "junior.json")
+        senior_out = os.path.join(tmp, "senior.json")
+        janitor_out = os.path.join(tmp, "train.json")
+        rows = scale_statement(args.statement, args.rows, statement)
+
+        with Stopwatch() as sw:
+            agent = junior_accountant.JuniorAccountant(args.ledger)
+            if junior_accountant.PROMPT_TOKEN_BUDGET:
+                junior_accountant.get_token_counter()  # Load the tokenizer outside the timed junior stage
+        results.append(stage_row("brain_init", 0, sw.elapsed))
+
+        # --- Junior ---
+        recorder = CallRecorder(agent.call_llm)
+        agent.call_llm = recorder
+        server.reset_stats()
+        with Stopwatch() as sw:
+            recorder.stage_start = sw.start
+            agent.process_batch(statement, limit=rows)
+            agent.save_for_label_studio(junior_out)
+        results.append(stage_row("junior", rows, sw.elapsed, recorder, server.snapshot()))
+
+        # --- Senior ---
+        recorder = CallRecorder(senior_accountant.critique_and_fix)
+        senior_accountant.critique_and_fix = recorder
+        server.reset_stats()
+        try:
+            with Stopwatch() as sw:
+                recorder.stage_start = sw.start
+                senior_accountant.run_audit(junior_out, senior_out)
+        finally:
+            senior_accountant.critique_and_fix = recorder.fn
+        results.append(stage_row("senior", rows, sw.elapsed, recorder, server.snapshot()))
+
+        # --- Janitor ---
+        with Stopwatch() as sw:
+            janitor.main(senior_out, janitor_out)
+        results.append(stage_row("janitor", rows, sw.elapsed))
+
+    server.stop()
+
+    end_to_end = sum(r["wall_s"] for r in results if r["stage"] != "brain_init")
+    print("\n📊 Pipeline benchmark")
+    print_table(results, ["stage", "rows", "wall_s", "rows_per_s", "queue_mean_ms", "queue_p95_ms",
+                          "llm_p50_ms", "llm_p95_ms", "slot_wait_p95_ms", "server_errors", "completion_tokens"])
+    print(f"\n🚀 End-to-end: {rows} rows in {end_to_end:.1f}s ({rows / end_to_end:.2f} rows/s, excluding brain init)")
+
+    if args.out:
+        save_report({"config": vars(args), "stages": results,
+                     "end_to_end_s": round(end_to_end, 3)}, args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""
+Retrieval benchmark for brain.ContextCompiler.
+
+For every transaction in the ledger we ask the index for its neighbours while
+hiding the transaction itself (leave-one-out) and check whether the true account
+is in the top-k. With the aggregated history the transaction's own description
+stays in the index only if other transactions share it, with their accounts.
+distinct_top3 is the mean number of different descriptions among the top 3.
+
+The same queries (a --queries sample of the transactions) are then replayed against
+synthetically scaled indexes (noisy copies of the real embeddings, up to 1M rows)
+for every index backend, reporting build time, index memory and p50/p95/p99 query
+latency. The hidden transaction is taken out of every copy of its item too, so the
+copies can't leak its label and accuracy stays comparable across sizes. Both
+histories are run: aggregated (one row per unique description) and per-row (one
+per transaction).
+
+    python -m benchmarks.bench_retrieval --ledger my_accounts.beancount \
+        --backends sklearn numpy faiss --sizes 10000 100000 1000000
+"""
+import argparse
+import random
+import tracemalloc
+import numpy as np
+
+from brain import ContextCompiler, INDEX_BACKENDS, build_index, normalise_description
+from benchmarks.bench_utils import Stopwatch, latency_summary, print_table, save_report
+
+# ================= CONFIGURATION =================
+DEFAULT_LEDGER = "my_accounts.beancount"
+DEFAULT_BACKENDS = ["sklearn", "numpy"]
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+HISTORIES = ["aggregated", "per-row"]
+TOP_K = [1, 3, 5]
+NOISE = 0.05  # Std-dev of the jitter added to the synthetic copies
+
+
+def scale_embeddings(embeddings, size, seed=0, chunk=100_000):
+    """
+    Grows the history to `size` rows. The first rows are the real embeddings
+    (so leave-one-out indices stay valid), the rest are jittered copies.
+    Returns (vectors, source_row) where source_row maps each row back to the real one.
+    """
+    base = np.asarray(embeddings, dtype=np.float32)
+    n_base = len(base)
+    if size <= n_base:
+        return base[:size], np.arange(size)
+
+    rng = np.random.default_rng(seed)
+    vectors = np.empty((size, base.shape[1]), dtype=np.float32)
+    source_row = np.empty(size, dtype=np.int64)
+    vectors[:n_base] = base
+    source_row[:n_base] = np.arange(n_base)
+
+    # Fill in chunks so the temporary noise matrix stays small
+    for start in range(n_base, size, chunk):
+        stop = min(start + chunk, size)
+        picks = rng.integers(0, n_base, stop - start)
+        noise = rng.normal(0.0, NOISE, (stop - start, base.shape[1])).astype(np.float32)
+        vectors[start:stop] = base[picks] + noise
+        source_row[start:stop] = picks
+    return vectors, source_row
+
+
+def neighbours_without(brain, index, vectors, source_row, row, k_max):
+    """
+    The k_max nearest items for history row `row` with that transaction taken out of the
+    ledger: its own item and every jittered copy of it become the item without the row (or
+    disappear if it was the only one). Widens the search until k_max neighbours are left.
+    Returns (neighbours, latency of the first k_max + 1 search).
+    """
+    own_item = brain.item_of[row]
+    without_row = brain.leave_out(own_item, row)
+    k = k_max + 1
+    with Stopwatch() as sw:
+        indices, _ = index.search(vectors[own_item], k)
+    while True:
+        neighbours = [without_row if source_row[i] == own_item else brain.items[source_row[i]] for i in indices]
+        neighbours = [item for item in neighbours if item is not None][:k_max]
+        if len(neighbours) == k_max or k >= len(vectors):
+            return neighbours, sw.elapsed
+        k = min(4 * k, len(vectors))
+        indices, _ = index.search(vectors[own_item], k)
+
+
+def leave_one_transaction_out(brain, index, vectors, source_row, query_rows, k_max):
+    """
+    Queries each history row with itself taken out of the ledger (see neighbours_without).
+    Returns hits per k, latencies and distinct_top3.
+    """
+    hits = {k: 0 for k in TOP_K}
+    latencies, distinct = [], []
+
+    for row in query_rows:
+        neighbours, latency = neighbours_without(brain, index, vectors, source_row, row, k_max)
+        latencies.append(latency)
+        predicted = [item['account'] for item in neighbours]
+        for k in TOP_K:
+            if brain.history[row]['account'] in predicted[:k]:
+                hits[k] += 1
+        distinct.append(len({normalise_description(item['description']) for item in neighbours[:3]}))
+
+    total = max(len(query_rows), 1)
+    accuracy = {f"top{k}_acc": round(hits[k] / total, 4) for k in TOP_K}
+    return accuracy, latencies, round(sum(distinct) / total, 2)
+
+
+def build_with_stats(vectors, backend):
+    """Builds an index, returning it with build time and Python-visible peak memory."""
+    tracemalloc.start()
+    with Stopwatch() as sw:
+        index = build_index(vectors, backend)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return index, sw.elapsed, peak
+
+
+def end_to_end_latency(brain, sample_size, seed=0):
+    """Full retrieve_context calls (encode + search + format) on real descriptions."""
+    rng = random.Random(seed)
+    rows = rng.sample(brain.history, min(sample_size, len(brain.history)))
+    latencies = []
+    for row in rows:
+        with Stopwatch() as sw:
+            brain.retrieve_context("", row['description'])
+        latencies.append(sw.elapsed)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Leave-one-out accuracy and latency benchmark for the retrieval brain')
+    parser.add_argument('--ledger', default=DEFAULT_LEDGER, help='Beancount file to learn history from')
+    parser.add_argument('--backends', nargs='+', default=DEFAULT_BACKENDS, choices=list(INDEX_BACKENDS))
+    parser.add_argument('--sizes', nargs='*', type=int, default=DEFAULT_SIZES, help='Synthetic history sizes (the real ledger is always included)')
+    parser.add_argument('--history', nargs='+', default=HISTORIES, choices=HISTORIES,
+                        help='aggregated = one index row per unique description, per-row = one per transaction')
+    parser.add_argument('--queries', type=int, default=500, help='Transactions queried on scaled histories (the real history queries every one)')
+    parser.add_argument('--e2e-queries', type=int, default=200, help='Full retrieve_context calls for the encode+search latency')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', default=None, help='Optional JSON report path')
+    args = parser.parse_args()
+
+    k_max = max(TOP_K)
+    rows, loads, e2e = [], {}, {}
+
+    for history in args.history:
+        with Stopwatch() as load_sw:
+            brain = ContextCompiler(args.ledger, aggregate=history == "aggregated")
+        if brain.embeddings is None:
+            print("❌ Error: The brain is empty! Nothing to benchmark.")
+            return
+
+        n_base = len(brain.items)
+        loads[history] = round(load_sw.elapsed, 3)
+        print(f"📚 {history}: {len(brain.history)} transactions -> {n_base} index rows in {load_sw.elapsed:.1f}s")
+        rng = np.random.default_rng(args.seed)
+
+        for size in [n_base] + sorted(s for s in args.sizes if s > n_base):
+            vectors, source_row = scale_embeddings(brain.embeddings, size, seed=args.seed)
+            if size == n_base:
+                query_rows = range(len(brain.history))
+            else:
+                query_rows = rng.choice(len(brain.history), min(args.queries, len(brain.history)), replace=False)
+
+            for backend in args.backends:
+                try:
+                    index, build_s, peak = build_with_stats(vectors, backend)
+                except ImportError as e:
+                    print(f"⚠️ Skipping backend '{backend}': {e}")
+                    continue
+
+                accuracy, latencies, distinct = leave_one_transaction_out(brain, index, vectors, source_row,
+                                                                          query_rows, k_max)
+                rows.append({
+                    "history": history,
+                    "backend": backend,
+                    "index_rows": size,
+                    "queries": len(query_rows),
+                    **accuracy,
+                    "distinct_top3": distinct,
+                    **latency_summary(latencies),
+                    "build_s": round(build_s, 3),
+                    "index_mb": round(index.nbytes / 1e6, 1),
+                    "build_peak_mb": round(peak / 1e6, 1),
+                })
+                print(f"   ✅ {history} / {backend} @ {size:,} rows done")
+                del index
+
+        e2e[history] = latency_summary(end_to_end_latency(brain, args.e2e_queries, seed=args.seed))
+
+    print("\n📊 Leave-one-out retrieval benchmark (the first rows of each history are the real ledger)")
+    print_table(rows, ["history", "backend", "index_rows", "queries", "top1_acc", "top3_acc", "top5_acc", "distinct_top3",
+                       "p50_ms", "p95_ms", "p99_ms", "build_s", "index_mb", "build_peak_mb"])
+
+    for history, summary in e2e.items():
+        print(f"\n⏱️ retrieve_context end-to-end ({history}, encode+search+format): "
+              f"p50 {summary['p50_ms']}ms | p95 {summary['p95_ms']}ms | p99 {summary['p99_ms']}ms")
+
+    if args.out:
+        save_report({"ledger": args.ledger, "history_load_s": loads, "results": rows, "retrieve_context": e2e},
+                    args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Row preparation benchmark for JuniorAccountant.process_batch.
+
+Compares the old path (iterrows + per-row pd.notna/str/source-account fix-up)
+with the vectorised prepare_rows() + plain tuples, both rendering the full
+prompt with a fixed context block so retrieval and the LLM are left out.
+
+    python -m benchmarks.bench_row_prep --rows 1000000
+"""
+import argparse
+import pandas as pd
+
+from junior_accountant import normalise_row, prepare_rows, render_prompt
+from benchmarks.bench_utils import Stopwatch, print_table, save_report
+
+# ================= CONFIGURATION =================
+DEFAULT_STATEMENT = "data/bank_statement.csv"
+FIXED_CONTEXT = "<history>No relevant past transactions found.</history>"
+
+
+def tile_statement(csv_file, rows):
+    df = pd.read_csv(csv_file)
+    df.columns = df.columns.str.strip()
+    copies = -(-rows // len(df))  # ceil
+    return pd.concat([df] * copies, ignore_index=True).head(rows)
+
+
+def legacy_prompts(df):
+    """What process_batch used to do: a pandas Series per row."""
+    prompts = []
+    for index, row in df.iterrows():
+        _, date, payee, desc, amount, currency, source_account = normalise_row(row, index)
+        prompts.append(render_prompt(FIXED_CONTEXT, date, payee, desc, amount, currency, source_account))
+    return prompts
+
+
+def vectorised_prompts(df):
+    prompts = []
+    for _, date, payee, desc, amount, currency, source_account in prepare_rows(df).itertuples(index=False, name=None):
+        prompts.append(render_prompt(FIXED_CONTEXT, date, payee, desc, amount, currency, source_account))
+    return prompts
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark per-row vs vectorised row preparation')
+    parser.add_argument('--statement', default=DEFAULT_STATEMENT)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--legacy-rows', type=int, default=200_000, help='Cap for the slow iterrows path (reported as rows/s)')
+    parser.add_argument('--out', default=None, help='Optional JSON report path')
+    args = parser.parse_args()
+
+    df = tile_statement(args.statement, args.rows)
+    print(f"📄 Statement tiled to {len(df):,} rows")
+
+    # Sanity check: both paths must produce byte-identical prompts
+    sample = df.head(2000)
+    assert legacy_prompts(sample) == vectorised_prompts(sample), "Vectorised prompts differ from the per-row path!"
+    print("✅ Prompts identical on a 2,000-row sample")
+
+    results = []
+    legacy_df = df.head(min(args.legacy_rows, len(df)))
+    with Stopwatch() as sw:
+        legacy_prompts(legacy_df)
+    results.append({"path": "iterrows (old)", "rows": len(legacy_df), "seconds": round(sw.elapsed, 3),
+                    "rows_per_s": round(len(legacy_df) / sw.elapsed)})
+
+    with Stopwatch() as prep_sw:
+        prepared = prepare_rows(df)
+    with Stopwatch() as render_sw:
+        for _, date, payee, desc, amount, currency, source_account in prepared.itertuples(index=False, name=None):
+            render_prompt(FIXED_CONTEXT, date, payee, desc, amount, currency, source_account)
+    total = prep_sw.elapsed + render_sw.elapsed
+    results.append({"path": "vectorised (new)", "rows": len(df), "seconds": round(total, 3),
+                    "rows_per_s": round(len(df) / total), "prepare_s": round(prep_sw.elapsed, 3),
+                    "render_s": round(render_sw.elapsed, 3)})
+
+    print("\n📊 Row preparation benchmark")
+    print_table(results, ["path", "rows", "seconds", "rows_per_s", "prepare_s", "render_s"])
+    print(f"\n🚀 Speed-up: {results[1]['rows_per_s'] / results[0]['rows_per_s']:.1f}x rows/s")
+
+    if args.out:
+        save_report({"statement": args.statement, "results": results}, args.out)
+
+
+if __name__ == "__main__":
+    main()
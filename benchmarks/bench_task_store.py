@@ -0,0 +1,89 @@
+"""
+Task storage benchmark: plain indent=2 JSON vs the template-deduplicated task_store format.
+
+For each artefact (tiled up to --tasks) it writes both formats and reports file size,
+save time, load time with every prompt materialised, and load time for the compact
+file without materialising (what a consumer pays when it only needs ids/predictions).
+Both loads are checked against the input.
+
+    python -m benchmarks.bench_task_store --tasks 20000
+"""
+import argparse
+import json
+import os
+import tempfile
+
+import task_store
+from benchmarks.bench_utils import Stopwatch, print_table, save_report
+
+# ================= CONFIGURATION =================
+DEFAULT_INPUTS = ["data/json/pre_senior_accountant.json", "data/json/training_data.json",
+                  "data/json/refined_data.json", "data/json/final_train.json"]
+
+
+def tile(input_file, tasks):
+    with open(input_file, 'r') as f:
+        data = json.load(f)
+    copies = -(-tasks // len(data))  # ceil
+    return (data * copies)[:tasks]
+
+
+def best_of(repeat, fn):
+    """Fastest of `repeat` runs (seconds) and the last result."""
+    best, result = None, None
+    for _ in range(repeat):
+        with Stopwatch() as sw:
+            result = fn()
+        best = sw.elapsed if best is None else min(best, sw.elapsed)
+    return best, result
+
+
+def run(input_file, tasks, tmp, repeat):
+    data = tile(input_file, tasks)
+    plain_file = os.path.join(tmp, "plain.json")
+    compact_file = os.path.join(tmp, "compact.json")
+
+    plain_save, _ = best_of(repeat, lambda: task_store.save_tasks(data, plain_file, compact=False))
+    compact_save, _ = best_of(repeat, lambda: task_store.save_tasks(data, compact_file, compact=True))
+    plain_load, plain = best_of(repeat, lambda: task_store.load_tasks(plain_file))
+    compact_load, compact = best_of(repeat, lambda: task_store.load_tasks(compact_file))
+
+    def load_raw():
+        with open(compact_file, 'r') as f:
+            return json.load(f)
+    raw_load, store = best_of(repeat, load_raw)
+
+    plain_mb, compact_mb = os.path.getsize(plain_file) / 1e6, os.path.getsize(compact_file) / 1e6
+    return {"file": os.path.basename(input_file), "tasks": tasks, "templates": len(store["templates"]),
+            "plain_mb": round(plain_mb, 1), "compact_mb": round(compact_mb, 1),
+            "size_ratio": round(compact_mb / plain_mb, 3),
+            "plain_save_s": round(plain_save, 3), "compact_save_s": round(compact_save, 3),
+            "plain_load_s": round(plain_load, 3), "compact_load_s": round(compact_load, 3),
+            "compact_lazy_load_s": round(raw_load, 3),
+            "round_trip_ok": plain == data and compact == data}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark template-deduplicated task storage')
+    parser.add_argument('--inputs', nargs='+', default=DEFAULT_INPUTS)
+    parser.add_argument('--tasks', type=int, default=20_000, help='Each input is tiled up to this many tasks')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--out', default=None, help='Optional JSON report path')
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for input_file in args.inputs:
+            print(f"⏱️ {input_file}...")
+            results.append(run(input_file, args.tasks, tmp, args.repeat))
+
+    print("\n📊 Task storage: plain vs template-deduplicated")
+    print_table(results, ["file", "tasks", "templates", "plain_mb", "compact_mb", "size_ratio", "plain_save_s",
+                          "compact_save_s", "plain_load_s", "compact_load_s", "compact_lazy_load_s", "round_trip_ok"])
+
+    if args.out:
+        save_report({"config": vars(args), "results": results}, args.out)
+
+
+if __name__ == "__main__":
+    main()
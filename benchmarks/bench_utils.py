@@ -0,0 +1,58 @@
+"""
+Small helpers shared by the benchmark scripts (timing, percentiles, reporting).
+Run benchmarks from the repo root as modules, e.g. `python -m benchmarks.bench_retrieval`.
+"""
+import json
+import time
+import numpy as np
+
+
+class Stopwatch:
+    """Context manager that records the elapsed wall time in seconds."""
+    def __enter__(self):
+        self.start = time.perf_counter()
+        self.elapsed = 0.0
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.start
+        return False
+
+
+def latency_summary(samples_s):
+    """p50/p95/p99/mean of a list of durations (seconds in, milliseconds out)."""
+    if not len(samples_s):
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None, "mean_ms": None}
+    ms = np.asarray(samples_s) * 1000.0
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3),
+        "mean_ms": round(float(ms.mean()), 3),
+    }
+
+
+def print_table(rows, columns):
+    """Prints a list of dicts as a fixed-width table."""
+    widths = {c: max(len(c), *(len(_fmt(r.get(c))) for r in rows)) for c in columns}
+    print("  ".join(c.ljust(widths[c]) for c in columns))
+    print("  ".join("-" * widths[c] for c in columns))
+    for r in rows:
+        print("  ".join(_fmt(r.get(c)).ljust(widths[c]) for c in columns))
+
+
+def _fmt(value):
+    if value is None:
+        return "-"
+    if isinstance(value, float):
+        return f"{value:,.3f}"
+    if isinstance(value, int):
+        return f"{value:,}"
+    return str(value)
+
+
+def save_report(report, filename):
+    with open(filename, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"💾 Saved report to {filename}")
@@ -0,0 +1,137 @@
+"""
+YAML review-export round-trip benchmark.
+
+Compares the old to_human_readable_* / to_training_json path (json.load the
+whole file, clean_text, one YAML document via the pure-Python SafeDumper, then
+yaml.safe_load + json.dump) with the streaming yaml_stream converter using the
+libyaml dumper/loader. The export is tiled up to --tasks so the difference
+shows at realistic sizes, and both round trips are checked against the input.
+
+    python -m benchmarks.bench_yaml_roundtrip --tasks 20000
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import tracemalloc
+import yaml
+
+from benchmarks.bench_utils import Stopwatch, print_table, save_report
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "bc_scripts", "Transform"))
+import yaml_stream  # noqa: E402
+
+# ================= CONFIGURATION =================
+DEFAULT_INPUT = "data/json/refined_data.json"
+
+
+class LegacyDumper(yaml.SafeDumper):
+    def increase_indent(self, flow=False, indentless=False):
+        return super(LegacyDumper, self).increase_indent(flow, False)
+
+
+yaml.add_representer(str, yaml_stream.str_presenter, Dumper=LegacyDumper)
+
+
+def tile_export(input_file, tasks, out_file):
+    with open(input_file, 'r') as f:
+        data = json.load(f)
+    copies = -(-tasks // len(data))  # ceil
+    data = (data * copies)[:tasks]
+    with open(out_file, 'w') as f:
+        json.dump(data, f, indent=2)
+    return data
+
+
+def legacy_roundtrip(json_file, yaml_file, back_file, clean):
+    with open(json_file, 'r') as f:
+        data = json.load(f)
+    if clean:
+        data = yaml_stream.clean_text(data)
+    with open(yaml_file, 'w') as f:
+        yaml.dump(data, f, Dumper=LegacyDumper, allow_unicode=True, sort_keys=False, default_flow_style=False, width=120)
+    yield "to_yaml"
+
+    with open(yaml_file, 'r') as f:
+        data = yaml.safe_load(f)
+    with open(back_file, 'w') as f:
+        json.dump(data, f, indent=2)
+    yield "to_json"
+
+
+def streaming_roundtrip(json_file, yaml_file, back_file, clean):
+    yaml_stream.json_to_yaml(json_file, yaml_file, clean=clean)
+    yield "to_yaml"
+    yaml_stream.yaml_to_json(yaml_file, back_file)
+    yield "to_json"
+
+
+def timed_steps(roundtrip, json_file, yaml_file, back_file, clean):
+    timings = {}
+    steps = roundtrip(json_file, yaml_file, back_file, clean)
+    while True:
+        with Stopwatch() as sw:
+            step = next(steps, None)
+        if step is None:
+            return timings
+        timings[step] = sw.elapsed
+
+
+def run(name, roundtrip, json_file, tmp, tasks, clean, expected, memory):
+    yaml_file = os.path.join(tmp, "roundtrip.yaml")
+    back_file = os.path.join(tmp, "roundtrip.json")
+    size_mb = os.path.getsize(json_file) / 1e6
+
+    timings = timed_steps(roundtrip, json_file, yaml_file, back_file, clean)
+    with open(back_file, 'r') as f:
+        identical = json.load(f) == expected
+
+    peak_mb = None
+    if memory:
+        # Separate pass: tracemalloc slows the allocation-heavy pure-Python dumper several times over
+        tracemalloc.start()
+        timed_steps(roundtrip, json_file, yaml_file, back_file, clean)
+        peak_mb = round(tracemalloc.get_traced_memory()[1] / 1e6, 1)
+        tracemalloc.stop()
+
+    total = sum(timings.values())
+    print(f"   {name}: {total:.1f}s")
+    return {"path": name, "tasks": tasks, "to_yaml_s": round(timings["to_yaml"], 2),
+            "to_json_s": round(timings["to_json"], 2), "mb_per_s": round(2 * size_mb / total, 2),
+            "tasks_per_s": round(tasks / total), "peak_mb": peak_mb, "round_trip_ok": identical}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the YAML review export round trip')
+    parser.add_argument('--input', default=DEFAULT_INPUT, help='JSON export to tile (list of tasks)')
+    parser.add_argument('--tasks', type=int, default=20_000)
+    parser.add_argument('--clean', action='store_true', help='Apply clean_text (junior/post-SFT exports)')
+    parser.add_argument('--memory', action='store_true', help='Also measure peak Python memory (extra, slower pass)')
+    parser.add_argument('--out', default=None, help='Optional JSON report path')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        json_file = os.path.join(tmp, "export.json")
+        expected = tile_export(args.input, args.tasks, json_file)
+        if args.clean:
+            expected = yaml_stream.clean_text(expected)
+        print(f"📄 {args.tasks:,} tasks, {os.path.getsize(json_file) / 1e6:,.1f} MB of JSON")
+        print(f"   Streaming path uses {yaml_stream.BaseDumper.__name__} / {yaml_stream.BaseLoader.__name__}")
+
+        results = [
+            run("legacy (single doc, pure Python)", legacy_roundtrip, json_file, tmp, args.tasks, args.clean, expected, args.memory),
+            run("streaming (multi-doc, libyaml)", streaming_roundtrip, json_file, tmp, args.tasks, args.clean, expected, args.memory),
+        ]
+        del expected
+
+    print("\n📊 YAML round-trip benchmark")
+    print_table(results, ["path", "tasks", "to_yaml_s", "to_json_s", "mb_per_s", "tasks_per_s", "peak_mb", "round_trip_ok"])
+    print(f"\n🚀 Speed-up: {results[1]['tasks_per_s'] / results[0]['tasks_per_s']:.1f}x tasks/s")
+
+    if args.out:
+        save_report({"config": vars(args), "results": results}, args.out)
+
+
+if __name__ == "__main__":
+    main()
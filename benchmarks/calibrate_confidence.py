@@ -0,0 +1,191 @@
+"""
+Calibration report for the junior -> senior cascade.
+
+Joins junior predictions (Label Studio JSON with a prediction "score") with a
+labelled set (senior/human annotations, or flat prompt/response pairs), checks
+whether the junior booked the same account as the label, and shows for each
+confidence threshold how many senior calls would be saved and what accuracy
+the accepted rows (and the whole pipeline) would have.
+
+Scores with logprobs (score_mode "blended") and without ("retrieval") are on
+different scales, so each mode gets its own tables and threshold:
+SENIOR_CONFIDENCE_THRESHOLD and SENIOR_RETRIEVAL_CONFIDENCE_THRESHOLD. Predictions
+without a score (older junior runs) are re-scored from retrieval support alone, using
+the brain over --ledger; a score without a recorded mode is reported as "unrecorded"
+and gets no threshold (the senior reviews those rows).
+
+    python -m benchmarks.calibrate_confidence --predictions data/json/training_data.json \
+        --labels data/json/refined_data.json --target-accuracy 0.95
+"""
+import argparse
+import json
+
+from accounting_entry import parse_entry, parse_transaction, target_posting
+from benchmarks.bench_utils import print_table, save_report
+
+# ================= CONFIGURATION =================
+DEFAULT_PREDICTIONS = "data/json/training_data.json"
+DEFAULT_LABELS = "data/json/refined_data.json"
+DEFAULT_LEDGER = "my_accounts.beancount"
+THRESHOLDS = [round(0.05 * i, 2) for i in range(21)]
+THRESHOLD_VARS = {"blended": "SENIOR_CONFIDENCE_THRESHOLD", "retrieval": "SENIOR_RETRIEVAL_CONFIDENCE_THRESHOLD"}
+
+
+def task_text(task):
+    """Response text from a junior task, a senior/human annotation, or a flat pair."""
+    if 'response' in task:
+        return task['response']
+    for key in ('annotations', 'predictions'):
+        if task.get(key):
+            return task[key][0]['result'][0]['value']['text'][0]
+    return None
+
+
+def load_labels(filename):
+    """Label text by prompt, plus by transaction_id for ids that are unique in the labelled set."""
+    with open(filename, 'r') as f:
+        labelled = json.load(f)
+    by_prompt, by_id, id_counts = {}, {}, {}
+    for task in labelled:
+        text = task_text(task)
+        if text is None:
+            continue
+        data = task.get('data', task)
+        by_prompt[data['prompt']] = text
+        if data.get('transaction_id'):
+            by_id[data['transaction_id']] = text
+            id_counts[data['transaction_id']] = id_counts.get(data['transaction_id'], 0) + 1
+    by_id = {k: v for k, v in by_id.items() if id_counts[k] == 1}
+    return by_prompt, by_id
+
+
+def rescorer(ledger):
+    """Retrieval-only confidence for predictions made before scores were recorded."""
+    from brain import ContextCompiler
+    from junior_accountant import CONTEXT_K, score_prediction
+
+    brain = ContextCompiler(ledger)
+
+    def score(prompt, text, source):
+        txn = parse_transaction(prompt)
+        matches = brain.retrieve_matches(txn['payee'], txn['description'], k=CONTEXT_K)
+        confidence, _, mode = score_prediction(text, None, matches, source)
+        return confidence, mode
+    return score
+
+
+def collect(predictions, labels, ledger):
+    by_prompt, by_id = labels
+    rows, unlabelled, rescored = [], 0, 0
+    score_fn = None
+    for task in predictions:
+        prompt = task['data']['prompt']
+        label_text = by_prompt.get(prompt) or by_id.get(task['data'].get('transaction_id'))
+        if label_text is None:
+            unlabelled += 1
+            continue
+
+        source = parse_transaction(prompt)['source']
+        junior_text = task_text(task)
+        junior = target_posting(parse_entry(junior_text), source)
+        gold = target_posting(parse_entry(label_text), source)
+        if gold is None:
+            unlabelled += 1
+            continue
+
+        score, mode = task['predictions'][0].get('score'), task['predictions'][0].get('score_mode', "unrecorded")
+        if score is None:
+            if score_fn is None:
+                score_fn = rescorer(ledger)
+            score, mode = score_fn(prompt, junior_text, source)
+            rescored += 1
+        rows.append({"score": float(score), "mode": mode,
+                     "correct": junior is not None and junior['account'] == gold['account']})
+    return rows, unlabelled, rescored
+
+
+def threshold_table(rows, thresholds):
+    total = len(rows)
+    table = []
+    for threshold in thresholds:
+        accepted = [r for r in rows if r['score'] >= threshold]
+        accepted_correct = sum(r['correct'] for r in accepted)
+        reviewed = total - len(accepted)
+        table.append({
+            "threshold": threshold,
+            "senior_calls": reviewed,
+            "calls_saved_pct": round(100 * len(accepted) / total, 1),
+            "accepted_accuracy": round(accepted_correct / len(accepted), 4) if accepted else None,
+            # Reviewed rows are assumed fixed by the senior (that's where the labels came from)
+            "pipeline_accuracy": round((accepted_correct + reviewed) / total, 4),
+            "errors_let_through": len(accepted) - accepted_correct,
+        })
+    return table
+
+
+def reliability_table(rows, bins=10):
+    table = []
+    for b in range(bins):
+        lo, hi = b / bins, (b + 1) / bins
+        members = [r for r in rows if lo <= r['score'] < hi or (b == bins - 1 and r['score'] >= hi)]
+        if members:
+            table.append({"bin": f"{lo:.1f}-{hi:.1f}", "rows": len(members),
+                          "mean_confidence": round(sum(r['score'] for r in members) / len(members), 3),
+                          "accuracy": round(sum(r['correct'] for r in members) / len(members), 3)})
+    return table
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Calibrate the junior confidence threshold against labelled data')
+    parser.add_argument('--predictions', default=DEFAULT_PREDICTIONS, help='Junior output (Label Studio JSON)')
+    parser.add_argument('--labels', default=DEFAULT_LABELS, help='Senior/human annotations or flat prompt/response pairs')
+    parser.add_argument('--ledger', default=DEFAULT_LEDGER, help='Ledger for re-scoring predictions without a score')
+    parser.add_argument('--target-accuracy', type=float, default=0.95, help='Required accuracy on auto-accepted rows')
+    parser.add_argument('--out', default=None, help='Optional JSON report path')
+    args = parser.parse_args()
+
+    with open(args.predictions, 'r') as f:
+        predictions = json.load(f)
+    rows, unlabelled, rescored = collect(predictions, load_labels(args.labels), args.ledger)
+    if not rows:
+        print("❌ No predictions could be matched to a label")
+        return
+
+    baseline = sum(r['correct'] for r in rows) / len(rows)
+    print(f"📄 {len(rows)} labelled predictions ({unlabelled} without a usable label, {rescored} re-scored from retrieval)")
+    print(f"🎯 Junior account accuracy on its own: {100 * baseline:.1f}%")
+
+    report = {"config": vars(args), "baseline_accuracy": round(baseline, 4), "modes": {}}
+    for mode in sorted({r['mode'] for r in rows}):
+        members = [r for r in rows if r['mode'] == mode]
+        print(f"\n🔎 score_mode {mode}: {len(members)} predictions, "
+              f"{100 * sum(r['correct'] for r in members) / len(members):.1f}% correct")
+
+        reliability = reliability_table(members)
+        print("📐 Reliability (is confidence X right X of the time?)")
+        print_table(reliability, ["bin", "rows", "mean_confidence", "accuracy"])
+
+        table = threshold_table(members, THRESHOLDS)
+        print("📊 Senior calls saved vs accuracy")
+        print_table(table, ["threshold", "senior_calls", "calls_saved_pct", "accepted_accuracy",
+                            "pipeline_accuracy", "errors_let_through"])
+        report["modes"][mode] = {"rows": len(members), "reliability": reliability, "thresholds": table}
+
+        if mode not in THRESHOLD_VARS:
+            print("⚠️ No score_mode recorded: these rows can't be auto-accepted, re-run the junior to calibrate them")
+            continue
+        good = [t for t in table if t['accepted_accuracy'] is not None and t['accepted_accuracy'] >= args.target_accuracy]
+        if good:
+            best = max(good, key=lambda t: t['calls_saved_pct'])
+            print(f"✅ {THRESHOLD_VARS[mode]}={best['threshold']} saves {best['calls_saved_pct']}% of senior calls "
+                  f"at {100 * best['accepted_accuracy']:.1f}% accuracy on accepted rows")
+        else:
+            print(f"⚠️ No threshold reaches {100 * args.target_accuracy:.0f}% accuracy on accepted {mode} rows: "
+                  f"leave {THRESHOLD_VARS[mode]} unset")
+
+    if args.out:
+        save_report(report, args.out)
+
+
+if __name__ == "__main__":
+    main()
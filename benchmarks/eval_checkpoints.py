@@ -0,0 +1,296 @@
+"""
+Checkpoint evaluation: runs each fine-tuned checkpoint (outputs/checkpoint-*) on a
+held-out set and scores what the pipeline cares about:
+
+  account   the non-source posting uses the labelled account
+  balanced  every posting has an amount and the entry sums to zero
+  source    the source (bank) account is posted with the statement amount
+  leakage   artefacts around the XML: "### Analysis" / "**Analysis:**" footers,
+            markdown fences, text before <accounting_entry> or after its end
+
+plus latency per example and generated tokens/second. Checkpoints run in
+parallel worker processes (--workers, one model each). Prompts are rendered once
+per run and generations are cached per checkpoint (data/cache/eval), so re-runs
+and newly added checkpoints only generate what's missing.
+
+--eval-file is required and should hold examples the checkpoints never saw (not
+final_train.json or anything else the SFT run read). --holdout-pct evaluates a
+stable slice of it by prompt hash, e.g. to keep a quick run small.
+
+    python -m benchmarks.eval_checkpoints --eval-file data/json/eval_holdout.json \
+        --checkpoints outputs/checkpoint-60 outputs/checkpoint-180 outputs/checkpoint-270 \
+        --workers 3 --out eval_report.json
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import telemetry
+from accounting_entry import is_balanced, parse_entry, parse_transaction, target_posting
+from benchmarks.bench_utils import latency_summary, print_table, save_report
+from benchmarks.calibrate_confidence import task_text
+
+# ================= CONFIGURATION =================
+CACHE_DIR = "data/cache/eval"
+HOLDOUT_PCT = 100                # Share of --eval-file evaluated (100 = all of it)
+MAX_NEW_TOKENS = 1024
+ARTEFACT_PATTERNS = {
+    "analysis_footer": re.compile(r"###\s*Analysis|\*\*Analysis:?\*\*"),
+    "markdown_fence": re.compile(r"```"),
+}
+
+
+def prompt_hash(prompt):
+    return hashlib.sha1(prompt.encode("utf-8")).hexdigest()
+
+
+def load_eval_set(filename, holdout_pct=None, limit=None):
+    """[(prompt, label text)] from flat pairs or Label Studio tasks, optionally a stable hash slice."""
+    with open(filename, 'r') as f:
+        records = json.load(f)
+    examples = []
+    for record in records:
+        text = task_text(record)
+        prompt = record.get('data', record).get('prompt')
+        if text is None or prompt is None:
+            continue
+        if holdout_pct is not None and int(prompt_hash(prompt)[:8], 16) % 100 >= holdout_pct:
+            continue
+        examples.append((prompt, text))
+    return examples[:limit] if limit else examples
+
+
+def checkpoint_key(checkpoint, settings):
+    """Cache file name: checkpoint name + hash of its weights/config + generation settings."""
+    digest = hashlib.sha256(json.dumps(settings, sort_keys=True).encode("utf-8"))
+    for name in ("adapter_model.safetensors", "adapter_config.json", "config.json", "model.safetensors.index.json"):
+        path = os.path.join(checkpoint, name)
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1 << 20), b''):
+                    digest.update(chunk)
+    name = re.sub(r"[^A-Za-z0-9_.-]+", "_", os.path.basename(os.path.normpath(checkpoint)))
+    return f"{name}-{digest.hexdigest()[:12]}"
+
+
+def load_cache(path):
+    cached = {}
+    if os.path.exists(path):
+        with open(path, 'r') as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    cached[record["prompt_hash"]] = record
+    return cached
+
+
+def load_checkpoint(checkpoint, backend, device):
+    """Model + tokenizer for a LoRA checkpoint (or a merged model directory)."""
+    if backend == "unsloth":
+        from unsloth import FastLanguageModel
+        from junior_accountant import MAX_SEQ_LENGTH
+        model, tokenizer = FastLanguageModel.from_pretrained(model_name=checkpoint, max_seq_length=MAX_SEQ_LENGTH,
+                                                             dtype=None, load_in_4bit=True)
+        FastLanguageModel.for_inference(model)
+        return model, tokenizer
+
+    from transformers import AutoModelForCausalLM, AutoTokenizer
+    if os.path.exists(os.path.join(checkpoint, "adapter_config.json")):
+        from peft import AutoPeftModelForCausalLM
+        model = AutoPeftModelForCausalLM.from_pretrained(checkpoint).merge_and_unload()
+    else:
+        model = AutoModelForCausalLM.from_pretrained(checkpoint)
+    try:
+        tokenizer = AutoTokenizer.from_pretrained(checkpoint)
+    except (OSError, ValueError):
+        tokenizer = AutoTokenizer.from_pretrained(model.config.name_or_path)
+    return model.to(device).eval(), tokenizer
+
+
+def chat_formatter(tokenizer):
+    """The training format (train.ipynb / pack_dataset): system prompt + user turn via the chat template."""
+    from bc_scripts.Transform.pack_dataset import SYSTEM_PROMPT
+    text_tokenizer = getattr(tokenizer, "tokenizer", tokenizer)
+
+    def render(prompt):
+        messages = [{"role": "system", "content": SYSTEM_PROMPT}, {"role": "user", "content": prompt}]
+        return text_tokenizer.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
+    return render
+
+
+def generate_for_checkpoint(checkpoint, prompts_file, settings, cache_dir):
+    """
+    Worker process: loads one checkpoint and generates every prompt missing from its cache,
+    appending each batch to the cache as it finishes.
+    Returns (checkpoint, cache path, load seconds, prompts found in the cache).
+    """
+    if settings["backend"] == "unsloth":
+        import unsloth  # noqa: F401  (must be imported before transformers)
+    from junior_accountant import format_for_unsloth
+    from junior_server import Job, batch_generator
+
+    with open(prompts_file, 'r') as f:
+        prompts = json.load(f)
+    cache_path = os.path.join(cache_dir, checkpoint_key(checkpoint, settings) + ".jsonl")
+    cached = load_cache(cache_path)
+    missing = [p for p in prompts if prompt_hash(p) not in cached]
+    hits = len(prompts) - len(missing)
+    if not missing:
+        return checkpoint, cache_path, 0.0, hits
+
+    started = time.perf_counter()
+    model, tokenizer = load_checkpoint(checkpoint, settings["backend"], settings["device"])
+    load_s = time.perf_counter() - started
+    formatter = chat_formatter(tokenizer) if settings["format"] == "chat" else format_for_unsloth
+    run_batch = batch_generator(model, tokenizer, formatter)
+
+    batch_size = settings["batch_size"]
+    with open(cache_path, 'a') as cache:
+        for i in range(0, len(missing), batch_size):
+            jobs = [Job(p, settings["max_new_tokens"], settings["temperature"], False) for p in missing[i:i + batch_size]]
+            batch_started = time.perf_counter()
+            results = run_batch(jobs)
+            seconds = time.perf_counter() - batch_started
+            for job, result in zip(jobs, results):
+                cache.write(json.dumps({"prompt_hash": prompt_hash(job.prompt), "text": result["text"],
+                                        "seconds": seconds, "batch_size": len(jobs),
+                                        "completion_tokens": result["completion_tokens"]}) + "\n")
+            cache.flush()
+            print(f"   {os.path.basename(checkpoint)}: {min(i + batch_size, len(missing))}/{len(missing)} generated")
+    return checkpoint, cache_path, load_s, hits
+
+
+def artefacts(text):
+    """Names of the leakage artefacts found in a model output."""
+    found = [name for name, pattern in ARTEFACT_PATTERNS.items() if pattern.search(text)]
+    start, end = text.find("<accounting_entry>"), text.rfind("</accounting_entry>")
+    if start > 0 and text[:start].strip():
+        found.append("leading_text")
+    if end >= 0 and text[end + len("</accounting_entry>"):].strip():
+        found.append("trailing_text")
+    if start < 0 or end < 0:
+        found.append("missing_wrapper")
+    return found
+
+
+def score_example(prompt, label_text, output):
+    txn = parse_transaction(prompt)
+    source = txn['source']
+    entry = parse_entry(output)
+    predicted = target_posting(entry, source)
+    gold = target_posting(parse_entry(label_text), source)
+    source_ok = bool(entry) and any(
+        p['account'] == source and (txn['amount'] is None or p['amount'] == txn['amount'])
+        for p in entry['postings'])
+    found = artefacts(output)
+    return {"parsed": entry is not None,
+            "account": gold is not None and predicted is not None and predicted['account'] == gold['account'],
+            "labelled": gold is not None,
+            "balanced": is_balanced(entry),
+            "source": source_ok,
+            "leakage": bool(found),
+            "artefacts": found}
+
+
+def summarise(checkpoint, examples, generations, load_s):
+    scores = [score_example(prompt, label, generations[prompt_hash(prompt)]["text"]) for prompt, label in examples]
+    records = [generations[prompt_hash(prompt)] for prompt, _ in examples]
+    n = len(scores)
+    labelled = sum(s['labelled'] for s in scores)
+    pct = lambda key: round(100 * sum(s[key] for s in scores) / n, 1)
+    # Each example waited for its whole batch; tokens/s counts every batch once
+    batches = {}
+    for r in records:
+        batches.setdefault((r["seconds"], r["batch_size"]), []).append(r["completion_tokens"])
+    gen_seconds = sum(seconds for seconds, _ in batches)
+    tokens = sum(r["completion_tokens"] for r in records)
+    latency = latency_summary([r["seconds"] for r in records])
+    artefact_counts = {}
+    for s in scores:
+        for name in s['artefacts']:
+            artefact_counts[name] = artefact_counts.get(name, 0) + 1
+    return {"checkpoint": checkpoint, "examples": n,
+            "parsed_pct": pct('parsed'),
+            "account_acc": round(100 * sum(s['account'] for s in scores) / labelled, 1) if labelled else None,
+            "balanced_pct": pct('balanced'), "source_pct": pct('source'), "leakage_pct": pct('leakage'),
+            "p50_ms": latency["p50_ms"], "p95_ms": latency["p95_ms"],
+            "tokens_per_s": round(tokens / gen_seconds, 1) if gen_seconds else None,
+            "load_s": round(load_s, 1), "artefacts": artefact_counts}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Evaluate fine-tuned checkpoints on a held-out set')
+    parser.add_argument('--checkpoints', nargs='+', default=None, help='Default: outputs/checkpoint-*')
+    parser.add_argument('--eval-file', required=True,
+                        help='Held-out flat prompt/response pairs or Label Studio JSON (not the training file)')
+    parser.add_argument('--holdout-pct', type=int, default=HOLDOUT_PCT, help='Stable slice of --eval-file (100 = all of it)')
+    parser.add_argument('--limit', type=int, default=None, help='Cap the number of examples')
+    parser.add_argument('--format', choices=['chat', 'unsloth'], default='chat',
+                        help="chat = training chat template + system prompt; unsloth = junior's ### format")
+    parser.add_argument('--backend', choices=['unsloth', 'transformers'], default='unsloth')
+    parser.add_argument('--device', default='cuda', help='transformers backend only')
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--max-new-tokens', type=int, default=MAX_NEW_TOKENS)
+    parser.add_argument('--temperature', type=float, default=0.0)
+    parser.add_argument('--workers', type=int, default=1, help='Checkpoints evaluated at once (one model per process)')
+    parser.add_argument('--cache-dir', default=CACHE_DIR)
+    parser.add_argument('--out', default=None, help='Optional JSON report path (with per-example scores)')
+    args = parser.parse_args()
+
+    checkpoints = args.checkpoints or sorted(glob.glob("outputs/checkpoint-*"),
+                                             key=lambda p: int(re.sub(r"\D", "", p) or 0))
+    examples = load_eval_set(args.eval_file, None if args.holdout_pct >= 100 else args.holdout_pct, args.limit)
+    if not checkpoints or not examples:
+        print("❌ Nothing to evaluate (no checkpoints or no examples)")
+        return
+    print(f"📄 {len(examples)} eval examples from {args.eval_file}, {len(checkpoints)} checkpoints")
+
+    # Prompts are rendered/selected once and shared with every worker through a file
+    os.makedirs(args.cache_dir, exist_ok=True)
+    prompts = [prompt for prompt, _ in examples]
+    prompts_file = os.path.join(args.cache_dir, f"prompts-{prompt_hash(''.join(prompts))[:12]}.json")
+    if not os.path.exists(prompts_file):
+        with open(prompts_file, 'w') as f:
+            json.dump(prompts, f)
+
+    settings = {"backend": args.backend, "device": args.device, "format": args.format, "batch_size": args.batch_size,
+                "max_new_tokens": args.max_new_tokens, "temperature": args.temperature}
+    # spawn: CUDA can't be re-initialised in forked children
+    with ProcessPoolExecutor(max_workers=args.workers, mp_context=get_context("spawn")) as pool:
+        done = list(pool.map(generate_for_checkpoint, checkpoints, [prompts_file] * len(checkpoints),
+                             [settings] * len(checkpoints), [args.cache_dir] * len(checkpoints)))
+
+    results = []
+    for checkpoint, cache_path, load_s, hits in done:
+        # Counted here: telemetry in the spawned workers isn't this process's
+        telemetry.incr("cache_hits", hits, cache="eval_generations")
+        telemetry.incr("cache_misses", len(prompts) - hits, cache="eval_generations")
+        print(f"♻️ {os.path.basename(checkpoint)}: {hits}/{len(prompts)} generations from the cache")
+        results.append(summarise(checkpoint, examples, load_cache(cache_path), load_s))
+
+    print("\n📊 Checkpoint evaluation")
+    print_table(results, ["checkpoint", "examples", "parsed_pct", "account_acc", "balanced_pct", "source_pct",
+                          "leakage_pct", "p50_ms", "p95_ms", "tokens_per_s"])
+    ranked = [r for r in results if r["account_acc"] is not None]
+    if ranked:
+        best = max(ranked, key=lambda r: (r["account_acc"], r["balanced_pct"], -r["leakage_pct"]))
+        print(f"\n🏆 Best: {best['checkpoint']} ({best['account_acc']}% account accuracy, "
+              f"{best['leakage_pct']}% leakage)")
+
+    if args.out:
+        details = {}
+        for checkpoint, cache_path, _, _ in done:
+            generations = load_cache(cache_path)
+            details[checkpoint] = [{"prompt_hash": prompt_hash(p), **score_example(p, label, generations[prompt_hash(p)]["text"])}
+                                   for p, label in examples]
+        save_report({"config": vars(args), "results": results, "examples": details}, args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+"""
+A local stand-in for LM Studio: an OpenAI-compatible /v1/chat/completions
+endpoint that answers with a well-formed <accounting_entry> for whatever
+transaction is in the prompt (with per-token logprobs when asked).
+
+Latency, generation speed, error rate and the number of concurrent "GPU slots"
+are configurable, so pipeline throughput can be measured without real models.
+
+    python -m benchmarks.mock_llm_server --port 1234 --latency 0.2 --tokens-per-sec 60 --error-rate 0.01
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+TXN_FIELDS = {
+    "date": r"Date:\s*(\S+)",
+    "payee": r"Payee:\s*(.*)",
+    "description": r"Description:\s*(.*)",
+    "amount": r"Amount:\s*(\S+)\s+(\S+)",
+    "source": r"Source Account:\s*(.*)",
+}
+
+
+def fake_accounting_entry(prompt):
+    """Builds a balanced <accounting_entry> from the transaction block in the prompt."""
+    found = {key: re.search(pattern, prompt) for key, pattern in TXN_FIELDS.items()}
+    date = found["date"].group(1) if found["date"] else "2023-01-01"
+    payee = found["payee"].group(1).strip() if found["payee"] else "Unknown"
+    desc = found["description"].group(1).strip() if found["description"] else ""
+    source = found["source"].group(1).strip() if found["source"] else "Assets:Unknown"
+    try:
+        amount = float(found["amount"].group(1))
+        currency = found["amount"].group(2)
+    except (AttributeError, ValueError):
+        amount, currency = -1.0, "GBP"
+
+    return f"""<accounting_entry>
+    <thought_process>
+        <plan>
+            1. Nature: Payment to {payee}.
+            2. Double Entry: Credit {source}, Debit Expenses:Mock:General.
+        </plan>
+        <reasoning>
+            <step1>Payee is {payee}. Mock server always picks 'Expenses:Mock:General'.</step1>
+            <step2>Math: {amount:.2f} from Bank, {-amount:.2f} to Expense.</step2>
+        </reasoning>
+    </thought_process>
+    <entry>
+        {date} * "{payee}" "{desc}"
+        Expenses:Mock:General     {-amount:.2f} {currency}
+        {source}          {amount:.2f} {currency}
+    </entry>
+</accounting_entry>"""
+
+
+TOKEN_RE = re.compile(r"\s+|\w+|[^\w\s]")
+
+
+def fake_logprobs(content, rng):
+    """OpenAI-style logprobs.content for the reply: word-ish tokens, mostly near-certain."""
+    return [{"token": token, "logprob": round(-rng.expovariate(20.0), 5),
+             "bytes": list(token.encode("utf-8")), "top_logprobs": []}
+            for token in TOKEN_RE.findall(content)]
+
+
+def estimate_tokens(text):
+    """~4 characters per token, good enough for a load generator."""
+    return max(1, len(text) // 4)
+
+
+class MockLLMServer:
+    """Threaded mock server. Use start()/stop() in-process, or run this module directly."""
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.05, tokens_per_sec=0.0,
+                 prefill_tokens_per_sec=0.0, error_rate=0.0, slots=1, seed=None):
+        self.latency = latency
+        self.tokens_per_sec = tokens_per_sec
+        self.prefill_tokens_per_sec = prefill_tokens_per_sec
+        self.error_rate = error_rate
+        self._slots = threading.Semaphore(slots)
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass  # keep the benchmark output clean
+
+            def do_GET(self):
+                if self.path.rstrip("/") == "/v1/models":
+                    self._send(200, {"object": "list", "data": [{"id": "mock-model", "object": "model"}]})
+                elif self.path.rstrip("/") == "/stats":
+                    self._send(200, server.snapshot())
+                else:
+                    self._send(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+            def do_POST(self):
+                if self.path.rstrip("/") != "/v1/chat/completions":
+                    self._send(404, {"error": {"message": f"Unknown path {self.path}"}})
+                    return
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                status, body = server.complete(payload)
+                self._send(status, body)
+
+            def _send(self, status, body):
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1/chat/completions"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def reset_stats(self):
+        with self._lock:
+            self.stats = {"requests": 0, "errors": 0, "prompt_tokens": 0, "completion_tokens": 0,
+                          "queue_wait_s": [], "service_s": []}
+
+    def snapshot(self):
+        """Copy of the counters; queue_wait_s is time spent waiting for a free slot."""
+        with self._lock:
+            return {k: (list(v) if isinstance(v, list) else v) for k, v in self.stats.items()}
+
+    def complete(self, payload):
+        messages = payload.get("messages", [])
+        prompt = "\n".join(m.get("content", "") for m in messages)
+
+        arrived = time.perf_counter()
+        with self._slots:
+            started = time.perf_counter()
+            failed = self._rng.random() < self.error_rate
+            content = fake_accounting_entry(prompt)
+            prompt_tokens = estimate_tokens(prompt)
+            completion_tokens = estimate_tokens(content)
+
+            delay = self.latency
+            if self.prefill_tokens_per_sec:
+                delay += prompt_tokens / self.prefill_tokens_per_sec
+            if self.tokens_per_sec and not failed:
+                delay += completion_tokens / self.tokens_per_sec
+            time.sleep(delay)
+            finished = time.perf_counter()
+
+        with self._lock:
+            self.stats["requests"] += 1
+            self.stats["queue_wait_s"].append(started - arrived)
+            self.stats["service_s"].append(finished - started)
+            if failed:
+                self.stats["errors"] += 1
+            else:
+                self.stats["prompt_tokens"] += prompt_tokens
+                self.stats["completion_tokens"] += completion_tokens
+
+        if failed:
+            return 500, {"error": {"message": "Mock server injected failure", "type": "server_error"}}
+
+        choice = {
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop",
+        }
+        if payload.get("logprobs"):
+            with self._lock:
+                choice["logprobs"] = {"content": fake_logprobs(content, self._rng)}
+
+        return 200, {
+            "id": f"chatcmpl-mock-{int(arrived * 1e6)}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": payload.get("model", "mock-model"),
+            "choices": [choice],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Mock OpenAI-compatible LLM server for benchmarks')
+    parser.add_argument('--host', default="127.0.0.1")
+    parser.add_argument('--port', type=int, default=1234)
+    parser.add_argument('--latency', type=float, default=0.05, help='Fixed seconds per request')
+    parser.add_argument('--tokens-per-sec', type=float, default=0.0, help='Generation speed (0 = instant)')
+    parser.add_argument('--prefill-tokens-per-sec', type=float, default=0.0, help='Prompt processing speed (0 = instant)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests answered with HTTP 500')
+    parser.add_argument('--slots', type=int, default=1, help='Requests served concurrently (like GPU slots)')
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    server = MockLLMServer(args.host, args.port, args.latency, args.tokens_per_sec,
+                           args.prefill_tokens_per_sec, args.error_rate, args.slots, args.seed)
+    print(f"🎭 Mock LLM listening on {server.url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
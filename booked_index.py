@@ -0,0 +1,139 @@
+"""
+Already-booked transactions: a hash index over the ledger's bank/card postings so a
+re-imported (overlapping) statement only sends new rows to retrieval and the LLM.
+
+Rows are matched on the fields bean_to_csv.py exports for a posting: date, amount,
+currency, payee and source account. The payee is normalised (case, punctuation, spacing,
+"Unknown" = no payee) and the date may be off by up to DATE_TOLERANCE_DAYS, because banks
+often post a card payment a day or two after the ledger date. Each ledger posting matches
+at most one statement row, so two identical coffees on the same day with only one booked
+still leave the second row to be labelled.
+
+Rows without a source account (CSV has no Source_Account column) match any account.
+
+    python booked_index.py --ledger my_accounts.beancount --csv data/bank_statement.csv
+"""
+import argparse
+import re
+import time
+from collections import defaultdict
+from datetime import date as Date, timedelta
+from decimal import Decimal, InvalidOperation
+
+import pandas as pd
+from beancount import loader
+from beancount.core.data import Transaction
+
+# ================= CONFIGURATION =================
+DATE_TOLERANCE_DAYS = 3                      # Largest |statement date - ledger date| still treated as the same row
+SOURCE_PREFIXES = ("Assets:", "Liabilities:")  # Accounts a statement can come from
+PAYEE_JUNK_RE = re.compile(r"[^0-9a-z]+")
+
+
+def normalise_payee(payee):
+    """'  STARBUCKS #123 ' -> 'starbucks 123'; missing/'Unknown' -> ''."""
+    if payee is None or (isinstance(payee, float) and payee != payee):
+        return ""
+    payee = PAYEE_JUNK_RE.sub(" ", str(payee).lower()).strip()
+    return "" if payee in ("unknown", "nan") else payee
+
+
+def to_amount(value):
+    try:
+        amount = Decimal(str(value).strip())
+    except InvalidOperation:
+        return None
+    return amount if amount.is_finite() else None
+
+
+def to_date(value):
+    try:
+        return Date.fromisoformat(str(value).strip()[:10])
+    except ValueError:
+        return None
+
+
+class BookedIndex:
+    def __init__(self, tolerance_days=DATE_TOLERANCE_DAYS):
+        self.tolerance_days = tolerance_days
+        self.postings = defaultdict(list)  # (date, amount, currency, payee) -> [account, ...]
+        self.size = 0
+
+    @classmethod
+    def from_ledger(cls, ledger_file, tolerance_days=DATE_TOLERANCE_DAYS):
+        entries, _, _ = loader.load_file(ledger_file)
+        return cls.from_entries(entries, tolerance_days)
+
+    @classmethod
+    def from_entries(cls, entries, tolerance_days=DATE_TOLERANCE_DAYS):
+        index = cls(tolerance_days)
+        for entry in entries:
+            if not isinstance(entry, Transaction):
+                continue
+            payee = normalise_payee(entry.payee)
+            for posting in entry.postings:
+                if posting.account.startswith(SOURCE_PREFIXES) and posting.units is not None:
+                    index.add(entry.date, posting.units.number, posting.units.currency, payee, posting.account)
+        return index
+
+    def add(self, date, amount, currency, payee, account):
+        self.postings[(date, amount, currency, payee)].append(account)
+        self.size += 1
+
+    def match(self, date, payee, amount, currency, source_account, used):
+        """
+        True if a statement row is already booked. The matching ledger posting is added to
+        `used` (a set kept for one statement) so it can't match another row.
+        """
+        amount, date = to_amount(amount), to_date(date)
+        if amount is None or date is None:
+            return False
+        currency, payee = str(currency).strip(), normalise_payee(payee)
+        any_account = source_account in (None, "", "Unknown")
+
+        # Probe the same day first, then one day either side, and so on out to the tolerance
+        for gap in range(self.tolerance_days + 1):
+            for day in ((date,) if gap == 0 else (date - timedelta(days=gap), date + timedelta(days=gap))):
+                key = (day, amount, currency, payee)
+                for position, account in enumerate(self.postings.get(key, ())):
+                    if (any_account or account == source_account) and (key, position) not in used:
+                        used.add((key, position))
+                        return True
+        return False
+
+    def filter_rows(self, rows, dropped=None):
+        """Yields the ROW_FIELDS tuples (see junior_accountant.prepare_rows) that aren't booked yet."""
+        used = set()
+        for row in rows:
+            transaction_id, date, payee, _, amount, currency, source_account = row
+            if self.match(date, payee, amount, currency, source_account, used):
+                if dropped is not None:
+                    dropped.append(transaction_id)
+                continue
+            yield row
+
+
+def main():
+    from junior_accountant import prepare_rows
+
+    parser = argparse.ArgumentParser(description='Count statement rows that are already booked in the ledger')
+    parser.add_argument('--ledger', default="my_accounts.beancount")
+    parser.add_argument('--csv', required=True, help='Bank statement CSV')
+    parser.add_argument('--tolerance-days', type=int, default=DATE_TOLERANCE_DAYS)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    index = BookedIndex.from_ledger(args.ledger, args.tolerance_days)
+    print(f"📒 Indexed {index.size} bank/card postings in {time.perf_counter() - started:.1f}s")
+
+    df = pd.read_csv(args.csv)
+    df.columns = df.columns.str.strip()
+    dropped = []
+    started = time.perf_counter()
+    remaining = sum(1 for _ in index.filter_rows(prepare_rows(df).itertuples(index=False, name=None), dropped))
+    print(f"✅ {len(dropped)} of {len(df)} rows already booked, {remaining} new "
+          f"({1000 * (time.perf_counter() - started):.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
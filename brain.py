@@ -1,24 +1,158 @@
+import os
+import re
+from collections import Counter, defaultdict
 from beancount import loader
 from beancount.core.data import Transaction
 from sentence_transformers import SentenceTransformer
 from sklearn.metrics.pairwise import cosine_similarity
 import numpy as np
+import telemetry
+
+# Which vector search backend the brain uses ("sklearn", "numpy", "faiss", "faiss-hnsw")
+INDEX_BACKEND = os.getenv("BRAIN_INDEX_BACKEND", "sklearn")
+
+# One index entry per normalised description (with how often each account was booked)
+# instead of one per transaction. "0" = the original one-row-per-transaction history.
+AGGREGATE_HISTORY = os.getenv("BRAIN_AGGREGATE_HISTORY", "1") == "1"
+DESCRIPTION_JUNK_RE = re.compile(r"[^0-9a-z]+")
+
+# ================= INDEX BACKENDS =================
+class SklearnIndex:
+    """The original behaviour: full cosine_similarity + argsort on every query."""
+    name = "sklearn"
+
+    def __init__(self, embeddings):
+        self.embeddings = np.asarray(embeddings)
+
+    def search(self, query_embedding, k):
+        similarities = cosine_similarity(query_embedding.reshape(1, -1), self.embeddings)[0]
+        top_k_indices = similarities.argsort()[-k:][::-1]
+        return top_k_indices, similarities[top_k_indices]
+
+    @property
+    def nbytes(self):
+        return self.embeddings.nbytes
+
+
+class NumpyIndex:
+    """Exact search over pre-normalised vectors: one dot product + argpartition."""
+    name = "numpy"
+
+    def __init__(self, embeddings):
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        self.vectors = vectors / norms
+
+    def search(self, query_embedding, k):
+        query = np.asarray(query_embedding, dtype=np.float32).ravel()
+        query = query / (np.linalg.norm(query) or 1.0)
+        scores = self.vectors @ query
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return top, scores[top]
+
+    @property
+    def nbytes(self):
+        return self.vectors.nbytes
+
+
+class FaissIndex:
+    """Inner-product search with FAISS (optional dependency). hnsw=True trades exactness for speed."""
+    name = "faiss"
+
+    def __init__(self, embeddings, hnsw=False):
+        import faiss  # only needed when this backend is selected
+
+        vectors = np.ascontiguousarray(embeddings, dtype=np.float32)
+        faiss.normalize_L2(vectors)
+        dim = vectors.shape[1]
+        if hnsw:
+            self.name = "faiss-hnsw"
+            self.index = faiss.IndexHNSWFlat(dim, 32, faiss.METRIC_INNER_PRODUCT)
+        else:
+            self.index = faiss.IndexFlatIP(dim)
+        self.index.add(vectors)
+        self._faiss = faiss
+
+    def search(self, query_embedding, k):
+        query = np.ascontiguousarray(query_embedding, dtype=np.float32).reshape(1, -1)
+        self._faiss.normalize_L2(query)
+        scores, indices = self.index.search(query, k)
+        keep = indices[0] >= 0
+        return indices[0][keep], scores[0][keep]
+
+    @property
+    def nbytes(self):
+        return len(self._faiss.serialize_index(self.index))
+
+
+INDEX_BACKENDS = {
+    "sklearn": SklearnIndex,
+    "numpy": NumpyIndex,
+    "faiss": FaissIndex,
+    "faiss-hnsw": lambda embeddings: FaissIndex(embeddings, hnsw=True),
+}
+
+def build_index(embeddings, backend=INDEX_BACKEND):
+    """Builds a search index over the history embeddings with the chosen backend."""
+    if backend not in INDEX_BACKENDS:
+        raise ValueError(f"Unknown index backend '{backend}'. Choose from: {', '.join(INDEX_BACKENDS)}")
+    return INDEX_BACKENDS[backend](embeddings)
+
+
+def normalise_description(text):
+    """'NETFLIX.COM  Monthly' -> 'netflix com monthly'"""
+    return DESCRIPTION_JUNK_RE.sub(" ", text.lower()).strip()
+
+
+def summarise_rows(history, rows):
+    """
+    One index item for history rows that share a description: the most booked account
+    (ties go to the most recent), every account with its count, and when it was last seen.
+    None if there are no rows.
+    """
+    if not rows:
+        return None
+    counts = Counter(history[i]['account'] for i in rows)
+    last_used = {}
+    for i in rows:
+        account, day = history[i]['account'], history[i]['full_entry'].date
+        last_used[account] = max(day, last_used.get(account, day))
+    accounts = sorted(counts, key=lambda a: (-counts[a], -last_used[a].toordinal()))
+    latest = max(rows, key=lambda i: history[i]['full_entry'].date)
+    return {
+        'description': history[latest]['description'],
+        'account': accounts[0],
+        'accounts': {a: counts[a] for a in accounts},
+        'count': len(rows),
+        'last_seen': history[latest]['full_entry'].date,
+        'rows': rows,
+    }
+
 
 class ContextCompiler:
-    def __init__(self, beancount_file):
+    def __init__(self, beancount_file, index_backend=INDEX_BACKEND, aggregate=AGGREGATE_HISTORY):
         print("🧠 Accountant Brain: Loading history...")
-        self.history = []
-        self.descriptions = []
+        self.history = []       # One row per transaction
+        self.items = []         # What the index holds: unique descriptions (aggregate) or the history rows
+        self.item_of = []       # History row -> its item
+        self.descriptions = []  # Embedded text of each item
         self.embeddings = None
+        self.index = None
         
         # 1. Load the "Gold Standard" history
         self.model = SentenceTransformer('all-MiniLM-L6-v2') # Small, fast model
         self._load_beancount_history(beancount_file)
+        self._build_items(aggregate)
         
         # 2. Vectorize the history (The "Learning" Phase)
         if self.descriptions:
-            print(f"🧠 Accountant Brain: Memorizing {len(self.descriptions)} past transactions...")
+            print(f"🧠 Accountant Brain: Memorizing {len(self.history)} past transactions "
+                  f"({len(self.descriptions)} to embed)...")
             self.embeddings = self.model.encode(self.descriptions)
+            self.index = build_index(self.embeddings, index_backend)
         else:
             print("⚠️ Warning: No history found in file!")
 
@@ -47,7 +181,22 @@ class ContextCompiler:
                         'account': target_account,
                         'full_entry': entry # We might want the full object later
                     })
-                    self.descriptions.append(desc)
+
+    def _build_items(self, aggregate):
+        """Groups the history by normalised description (or keeps one item per row) and embeds each item once."""
+        groups = defaultdict(list)
+        for i, row in enumerate(self.history):
+            groups[normalise_description(row['description']) if aggregate else i].append(i)
+        self.item_of = [None] * len(self.history)
+        for rows in groups.values():
+            for i in rows:
+                self.item_of[i] = len(self.items)
+            self.items.append(summarise_rows(self.history, rows))
+        self.descriptions = [item['description'] for item in self.items]
+
+    def leave_out(self, item_index, history_index):
+        """The item as if one of its history rows weren't in the ledger (None if it was the only one)."""
+        return summarise_rows(self.history, [i for i in self.items[item_index]['rows'] if i != history_index])
 
     def retrieve_context(self, current_payee, current_desc, k=3):
         """
@@ -56,27 +205,32 @@ class ContextCompiler:
         """
         if self.embeddings is None:
             return "No history available."
+        return self.format_context(self.retrieve_matches(current_payee, current_desc, k))
 
-        # 1. Embed the CURRENT query
-        query_text = f"{current_payee} {current_desc}".strip()
-        query_embedding = self.model.encode([query_text])
-        
-        # 2. Calculate Similarity (Vector Search)
-        similarities = cosine_similarity(query_embedding, self.embeddings)[0]
-        
-        # 3. Get Top K matches
-        # argsort gives lowest-to-highest, so we take the last k and reverse
-        top_k_indices = similarities.argsort()[-k:][::-1]
-        
-        matches = []
-        for idx in top_k_indices:
-            score = similarities[idx]
-            if score > 0.3: # Filter out total garbage matches
-                matches.append(self.history[idx])
-        
-        return self._format_prompt(matches)
+    def retrieve_matches(self, current_payee, current_desc, k=3):
+        """The k most similar history items (best first, with their similarity 'score'), without the XML formatting."""
+        if self.embeddings is None:
+            return []
 
-    def _format_prompt(self, matches):
+        with telemetry.span("retrieve_context", k=k) as span:
+            # 1. Embed the CURRENT query
+            query_text = f"{current_payee} {current_desc}".strip()
+            with telemetry.span("embed_query"):
+                query_embedding = self.model.encode([query_text])
+            
+            # 2. Vector Search -> Top K matches (best first)
+            with telemetry.span("vector_search", backend=self.index.name):
+                top_k_indices, scores = self.index.search(query_embedding[0], k)
+            
+            matches = []
+            for idx, score in zip(top_k_indices, scores):
+                if score > 0.3: # Filter out total garbage matches
+                    matches.append({**self.items[idx], 'score': float(score)})
+            span.set(matches=len(matches), top_score=round(float(scores[0]), 4) if len(scores) else None)
+            
+            return matches
+
+    def format_context(self, matches):
         """Formats the retrieved data into an XML block for the LLM."""
         if not matches:
             return "<history>No relevant past transactions found.</history>"
@@ -87,6 +241,12 @@ class ContextCompiler:
             xml_output += f"  <example>\n"
             xml_output += f"    <description>{m['description']}</description>\n"
             xml_output += f"    <account>{m['account']}</account>\n"
+            if m.get('count', 1) > 1:
+                # A description booked many times: say how often, when last, and where else it went
+                xml_output += f"    <seen>{m['count']} times, last on {m['last_seen']}</seen>\n"
+                others = [f"{account} ({n})" for account, n in m['accounts'].items() if account != m['account']]
+                if others:
+                    xml_output += f"    <also_booked_to>{', '.join(others)}</also_booked_to>\n"
             xml_output += f"  </example>\n"
         xml_output += "</history>"
         return xml_output
@@ -127,4 +287,5 @@ if __name__ == "__main__":
     print("\n📝 Brain Output:")
     print("---------------------------------------------------")
     print(context)
-    print("---------------------------------------------------")
\ No newline at end of file
+    print("---------------------------------------------------")
+    print("\n📏 For accuracy/latency numbers across the whole ledger run: python -m benchmarks.bench_retrieval")
\ No newline at end of file
@@ -0,0 +1,182 @@
+"""
+Grammar-constrained decoding for the local (Unsloth/transformers) junior.
+
+Generation is restricted to the <accounting_entry> schema: plan and reasoning
+steps as free text, then an <entry> whose header carries the transaction date
+and whose two postings are the source account with the statement amount and a
+ledger account (from its `open` directives) with the opposite amount. Nothing
+else can be produced: no markdown fences, no "Assets: Lloyds" spacing, no
+invented accounts, no unbalanced entries, and generation stops at the closing tag.
+
+The grammar is a `regex` pattern checked with partial=True (is this text a
+prefix of some valid output?). At each step only the highest-scoring candidate
+tokens are checked, falling back to the rest of the vocabulary only when none
+of them fit.
+
+    grammar = EntryGrammar(load_open_accounts("my_accounts.beancount"), "Assets:Lloyds:Checking",
+                           amount=Decimal("-4.50"), currency="GBP", date="2024-01-01")
+    model.generate(**inputs, logits_processor=LogitsProcessorList([EntryGrammarProcessor(grammar, tokenizer, n)]))
+"""
+import regex
+import torch
+from beancount import loader
+from beancount.core.data import Open
+from transformers import LogitsProcessor
+
+# ================= CONFIGURATION =================
+MAX_FREE_CHARS = 600  # Longest plan / reasoning step
+MAX_STEPS = 6         # Reasoning steps
+TOP_N = 64            # Candidates checked before scanning the whole vocabulary
+KEEP_VALID = 8        # Valid candidates kept per step (enough for temperature 0.1 sampling)
+
+_token_text_cache = {}
+
+
+def load_open_accounts(beancount_file):
+    """Every account with an `open` directive in the ledger."""
+    entries, _, _ = loader.load_file(beancount_file)
+    return sorted({entry.account for entry in entries if isinstance(entry, Open)})
+
+
+def account_trie_pattern(accounts):
+    """
+    Builds a regex alternation shaped like a trie of the account components, e.g.
+    Expenses:(?:Food(?::(?:Coffee|Groceries))?|Home:Internet), so a partial name is
+    only accepted while it can still become a real account.
+    """
+    trie = {}
+    for account in accounts:
+        node = trie
+        for part in account.split(":"):
+            node = node.setdefault(part, {})
+        node[""] = {}  # an account ends here
+
+    def build(node):
+        alternatives = []
+        for part in sorted(k for k in node if k):
+            child = node[part]
+            if any(child_key for child_key in child):
+                inner = f":(?:{build(child)})"
+                alternatives.append(regex.escape(part) + (f"(?:{inner})?" if "" in child else inner))
+            else:
+                alternatives.append(regex.escape(part))
+        return "|".join(alternatives)
+
+    return f"(?:{build(trie)})"
+
+
+class EntryGrammar:
+    """Prefix checker for one transaction's <accounting_entry>."""
+
+    def __init__(self, accounts, source_account, amount=None, currency=None, date=None,
+                 max_free_chars=MAX_FREE_CHARS, max_steps=MAX_STEPS):
+        others = [a for a in accounts if a != source_account]
+        free = rf"[^<]{{1,{max_free_chars}}}"
+        date_re = regex.escape(date) if date else r"\d{4}-\d{2}-\d{2}"
+        currency_re = regex.escape(currency) if currency else r"[A-Z]{3}"
+        if amount is not None:
+            source_amount = regex.escape(f"{amount:.2f}")
+            other_amount = regex.escape(f"{-amount:.2f}")
+            source_amount = source_amount if amount < 0 else rf"\+?{source_amount}"
+            other_amount = other_amount if amount > 0 else rf"\+?{other_amount}"
+        else:
+            source_amount = other_amount = r"[-+]?\d{1,9}\.\d{2}"
+
+        def posting(account, amount_re):
+            return rf"[ \t]{{1,16}}{account}[ \t]{{1,24}}{amount_re} {currency_re}[ \t]{{0,4}}\n"
+
+        source_posting = posting(regex.escape(source_account), source_amount)
+        other_posting = posting(account_trie_pattern(others), other_amount)
+        quoted = r'"[^"\n]{0,80}"'
+
+        pattern = (
+            r"\s{0,8}<accounting_entry>\s{1,12}<thought_process>\s{1,16}"
+            rf"<plan>{free}</plan>\s{{1,16}}"
+            rf"<reasoning>\s{{1,20}}(?:<step\d{{1,2}}>{free}</step\d{{1,2}}>\s{{1,20}}){{1,{max_steps}}}</reasoning>\s{{1,12}}"
+            r"</thought_process>\s{1,8}"
+            rf"<entry>\s{{1,24}}{date_re} [*!] {quoted} {quoted}[ \t]{{0,4}}\n"
+            rf"(?:{other_posting}{source_posting}|{source_posting}{other_posting})"
+            r"[ \t]{0,16}</entry>\s{1,4}</accounting_entry>\s{0,2}"
+        )
+        self.pattern = regex.compile(pattern)
+
+    def accepts_prefix(self, text):
+        return self.pattern.fullmatch(text, partial=True) is not None
+
+    def is_complete(self, text):
+        return self.pattern.fullmatch(text) is not None
+
+
+def token_texts(tokenizer):
+    """
+    Text each token id adds when appended to a sequence (leading spaces included),
+    computed once per tokenizer by decoding it after an anchor token.
+    """
+    key = id(tokenizer)
+    if key not in _token_text_cache:
+        anchor = tokenizer.encode("a", add_special_tokens=False)[:1]
+        base = tokenizer.decode(anchor, skip_special_tokens=True)
+        texts = []
+        for token_id in range(len(tokenizer)):
+            text = tokenizer.decode(anchor + [token_id], skip_special_tokens=True)
+            texts.append(text[len(base):] if text.startswith(base) else tokenizer.decode([token_id], skip_special_tokens=True))
+        _token_text_cache[key] = texts
+    return _token_text_cache[key]
+
+
+class EntryGrammarProcessor(LogitsProcessor):
+    """
+    Masks every token that would make the generated text leave the grammar.
+    EOS is only allowed once the entry is complete. For a batch, grammar can be a
+    list with one grammar per row (None leaves that row unconstrained).
+    """
+
+    def __init__(self, grammar, tokenizer, prompt_length, top_n=TOP_N, keep_valid=KEEP_VALID):
+        self.grammar = grammar
+        self.grammars = list(grammar) if isinstance(grammar, (list, tuple)) else None
+        self.texts = token_texts(tokenizer)
+        self.eos_token_id = tokenizer.eos_token_id
+        self.prompt_length = prompt_length
+        self.top_n = top_n
+        self.keep_valid = keep_valid
+        self.generated = {}  # row -> text generated so far
+        self.full_scans = 0
+
+    def _generated_text(self, row, ids):
+        text, seen = self.generated.get(row, ("", 0))
+        new_ids = ids[self.prompt_length + seen:].tolist()
+        text += "".join(self.texts[i] if i < len(self.texts) else "" for i in new_ids)
+        self.generated[row] = (text, seen + len(new_ids))
+        return text
+
+    def _allowed(self, grammar, text, row_scores):
+        allowed = []
+        if grammar.is_complete(text):
+            allowed.append(self.eos_token_id)
+
+        def scan(candidates):
+            for token_id in candidates:
+                piece = self.texts[token_id] if token_id < len(self.texts) else ""
+                if piece and grammar.accepts_prefix(text + piece):
+                    allowed.append(token_id)
+                    if len(allowed) >= self.keep_valid:
+                        return
+
+        order = torch.argsort(row_scores, descending=True).tolist()
+        scan(order[:self.top_n])
+        if not allowed:
+            # Nothing plausible fits: walk the rest of the vocabulary, best first
+            self.full_scans += 1
+            scan(order[self.top_n:])
+        return allowed or [self.eos_token_id]
+
+    def __call__(self, input_ids, scores):
+        mask = torch.full_like(scores, float("-inf"))
+        for row in range(input_ids.shape[0]):
+            grammar = self.grammars[row] if self.grammars is not None else self.grammar
+            if grammar is None:
+                mask[row] = 0
+                continue
+            text = self._generated_text(row, input_ids[row])
+            mask[row, self._allowed(grammar, text, scores[row])] = 0
+        return scores + mask
@@ -0,0 +1,212 @@
+"""
+Client-side pool of OpenAI-compatible endpoints (LM Studio boxes, junior_server.py, ...).
+
+Each request goes to the healthy endpoint with the fewest requests in flight.
+An endpoint that fails FAILURE_THRESHOLD times in a row is taken out of
+rotation (circuit open) and a background thread probes /v1/models until it
+answers again; the request that hit the failure is retried on another endpoint,
+so work in flight on a dead box is picked up by the others.
+
+    LLM_API_URLS=http://box1:1234/v1/chat/completions,http://box2:1234/v1/chat/completions
+
+    pool = EndpointPool(["http://box1:1234/v1/chat/completions", "http://box2:1234/v1/chat/completions"])
+    body = pool.post({"model": "local-model", "messages": [...]})
+
+The agents share pools through get_llm_pool(urls), so one process keeps one pool (and
+one set of health checks) per list of URLs.
+"""
+import os
+import time
+import random
+import threading
+import requests
+
+import telemetry
+
+# ================= CONFIGURATION =================
+FAILURE_THRESHOLD = int(os.getenv("LLM_POOL_FAILURE_THRESHOLD", "3"))  # Consecutive failures before the circuit opens
+COOLDOWN_S = float(os.getenv("LLM_POOL_COOLDOWN_S", "10"))             # Open circuits are probed this often
+HEALTH_INTERVAL_S = float(os.getenv("LLM_POOL_HEALTH_INTERVAL_S", "15"))  # Endpoints in rotation are probed this often
+MAX_ATTEMPTS = int(os.getenv("LLM_POOL_MAX_ATTEMPTS", "3"))            # Endpoints tried per request
+REQUEST_TIMEOUT_S = float(os.getenv("LLM_POOL_TIMEOUT_S", "300"))      # Generation can be slow on a busy box
+HEALTH_TIMEOUT_S = 2.0
+
+
+_pools = {}  # tuple(urls) -> EndpointPool, see get_llm_pool
+_pools_lock = threading.Lock()
+
+
+class PoolExhausted(Exception):
+    """Every attempt failed (or no endpoint is in rotation)."""
+
+
+class Endpoint:
+    def __init__(self, url):
+        self.url = url
+        self.outstanding = 0
+        self.failures = 0        # Consecutive, reset by any success
+        self.open_since = None   # Set while the circuit is open
+        self.probing = False     # Half-open: one trial request allowed
+        self.requests = 0
+        self.errors = 0
+        self.busy_s = 0.0
+
+    @property
+    def health_url(self):
+        base = self.url.split("/v1/")[0] if "/v1/" in self.url else self.url.rstrip("/")
+        return f"{base}/v1/models"
+
+    @property
+    def available(self):
+        return self.open_since is None
+
+
+class EndpointPool:
+    def __init__(self, urls, failure_threshold=FAILURE_THRESHOLD, cooldown_s=COOLDOWN_S,
+                 health_interval_s=HEALTH_INTERVAL_S, max_attempts=MAX_ATTEMPTS, timeout_s=REQUEST_TIMEOUT_S,
+                 health_checks=True):
+        if not urls:
+            raise ValueError("EndpointPool needs at least one URL")
+        self.endpoints = [Endpoint(url) for url in urls]
+        self.failure_threshold = failure_threshold
+        self.cooldown_s = cooldown_s
+        self.health_interval_s = health_interval_s
+        self.max_attempts = max_attempts
+        self.timeout_s = timeout_s
+        self._lock = threading.Lock()
+        self._local = threading.local()  # one requests.Session per thread (keep-alive, not shared)
+        self._stop = threading.Event()
+        self._checker = None
+        if health_checks:
+            self._checker = threading.Thread(target=self._health_loop, name="llm-pool-health", daemon=True)
+            self._checker.start()
+
+    def close(self):
+        self._stop.set()
+
+    def _session(self):
+        if not hasattr(self._local, "session"):
+            self._local.session = requests.Session()
+        return self._local.session
+
+    def _acquire(self, tried):
+        """
+        Least outstanding requests among endpoints in rotation (random among ties), preferring
+        ones this request hasn't tried yet. Returns (endpoint, is_trial), or (None, False).
+        """
+        with self._lock:
+            candidates = ([e for e in self.endpoints if e.available and e not in tried]
+                          or [e for e in self.endpoints if e.available])
+            if not candidates:
+                # Everything is open: let one request through as a trial instead of failing outright
+                candidates = [e for e in self.endpoints if not e.available and not e.probing and e not in tried]
+                if not candidates:
+                    return None, False
+                chosen = min(candidates, key=lambda e: e.open_since)
+                chosen.probing = True
+            else:
+                fewest = min(e.outstanding for e in candidates)
+                chosen = random.choice([e for e in candidates if e.outstanding == fewest])
+            chosen.outstanding += 1
+            return chosen, chosen.probing
+
+    def _release(self, endpoint, ok, elapsed, trial=False):
+        with self._lock:
+            endpoint.outstanding -= 1
+            endpoint.requests += 1
+            endpoint.busy_s += elapsed
+            if trial:
+                endpoint.probing = False
+            if ok:
+                if endpoint.open_since is not None and not trial:
+                    return  # sent before the circuit opened; only a trial or health check closes it
+                if endpoint.open_since is not None:
+                    print(f"✅ LLM endpoint back in rotation: {endpoint.url}")
+                endpoint.failures = 0
+                endpoint.open_since = None
+                return
+            endpoint.errors += 1
+            endpoint.failures += 1
+            if endpoint.failures >= self.failure_threshold and endpoint.open_since is None:
+                self._open_circuit(endpoint)
+
+    def post(self, payload):
+        """POSTs the chat payload, retrying on other endpoints. Returns the decoded JSON body."""
+        tried, last_error = [], None
+        for attempt in range(self.max_attempts):
+            endpoint, trial = self._acquire(tried)
+            if endpoint is None:
+                break
+            if attempt:
+                telemetry.incr("llm_retries")  # Counted when the retry actually starts
+            tried.append(endpoint)
+            started = time.perf_counter()
+            try:
+                response = self._session().post(endpoint.url, json=payload, timeout=self.timeout_s)
+                if response.status_code >= 500 or response.status_code == 429:
+                    raise requests.HTTPError(f"{response.status_code} from {endpoint.url}", response=response)
+                response.raise_for_status()  # Other 4xx: the request itself is bad, don't retry it
+                body = response.json()
+            except (requests.ConnectionError, requests.Timeout, requests.HTTPError, ValueError) as e:
+                retryable = not (isinstance(e, requests.HTTPError) and e.response is not None
+                                 and 400 <= e.response.status_code < 500 and e.response.status_code != 429)
+                self._release(endpoint, not retryable, time.perf_counter() - started, trial)
+                if not retryable:
+                    raise
+                last_error = e
+                continue
+            self._release(endpoint, True, time.perf_counter() - started, trial)
+            return body
+        raise PoolExhausted(f"No endpoint answered after {len(tried)} attempts: {last_error}")
+
+    def _open_circuit(self, endpoint):
+        endpoint.open_since = time.monotonic()
+        print(f"⚠️ LLM endpoint out of rotation after {endpoint.failures} failures: {endpoint.url}")
+        telemetry.incr("llm_circuit_open")
+
+    def _health_loop(self):
+        """Probes open circuits after their cooldown, and every endpoint in rotation each HEALTH_INTERVAL_S."""
+        last_sweep = time.monotonic()
+        while not self._stop.wait(min(self.cooldown_s, 1.0)):
+            now = time.monotonic()
+            sweep = now - last_sweep >= self.health_interval_s
+            with self._lock:
+                due = [e for e in self.endpoints
+                       if (e.available and sweep)
+                       or (not e.available and not e.probing and now - e.open_since >= self.cooldown_s)]
+            if sweep:
+                last_sweep = now
+            for endpoint in due:
+                try:
+                    healthy = requests.get(endpoint.health_url, timeout=HEALTH_TIMEOUT_S).ok
+                except requests.RequestException:
+                    healthy = False
+                with self._lock:
+                    if endpoint.available:
+                        # A dead box is found before a request has to time out on it
+                        if not healthy:
+                            endpoint.failures += 1
+                            if endpoint.failures >= self.failure_threshold:
+                                self._open_circuit(endpoint)
+                    elif healthy:
+                        # Half-open: back in rotation, but one more failure opens it again
+                        endpoint.open_since = None
+                        endpoint.failures = self.failure_threshold - 1
+                        print(f"🩺 LLM endpoint healthy again: {endpoint.url}")
+                    else:
+                        endpoint.open_since = time.monotonic()
+
+    def snapshot(self):
+        with self._lock:
+            return [{"url": e.url, "in_rotation": e.available, "outstanding": e.outstanding,
+                     "requests": e.requests, "errors": e.errors, "busy_s": round(e.busy_s, 3)}
+                    for e in self.endpoints]
+
+
+def get_llm_pool(urls):
+    """The process-wide EndpointPool for these URLs, created on first use."""
+    key = tuple(urls)
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = EndpointPool(list(urls))
+        return _pools[key]
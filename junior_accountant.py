@@ -1,7 +1,11 @@
 import os
+import math
 import pandas as pd
-import json
 import time
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from tqdm import tqdm
 from dotenv import load_dotenv
 
@@ -18,18 +22,89 @@ if PROVIDER == "unsloth":
         pass
 
 from brain import ContextCompiler
-import requests  # For calling Ollama or an API
+import telemetry
+from endpoint_pool import get_llm_pool
+import artefact_io
+from task_store import save_tasks
+from artefact_store import maybe_ingest
+from booked_index import BookedIndex
+from accounting_entry import parse_entry, parse_transaction, target_posting
 
-# LM Studio settings
-LLM_API_URL = "http://localhost:1234/v1/chat/completions"
+# LM Studio settings (junior_server.py serves the fine-tuned model on the same API, e.g. http://localhost:8000/v1/chat/completions)
+LLM_API_URL = os.getenv("LLM_API_URL", "http://localhost:1234/v1/chat/completions")
 MODEL_NAME = "local-model"
+# Several inference boxes (comma-separated URLs): requests are balanced across them and fail over
+LLM_API_URLS = [u.strip() for u in os.getenv("LLM_API_URLS", "").split(",") if u.strip()]
+# Rows in flight at once (worth raising with several boxes, or one server that batches)
+CONCURRENCY = int(os.getenv("JUNIOR_CONCURRENCY", "1"))
+
+# Pause between rows so we don't cook the spare PC (set to 0 for benchmarks/fast hosts)
+REQUEST_DELAY = float(os.getenv("JUNIOR_REQUEST_DELAY", "0.5"))
+
+# Save tasks template-deduplicated (task_store.py); `python task_store.py unpack` before a Label Studio import
+COMPACT_TASKS = os.getenv("JUNIOR_COMPACT_TASKS", "0") == "1"
+
+# Streaming ingestion: read huge statements in chunks instead of loading the whole file
+STREAM_INGEST = os.getenv("JUNIOR_STREAM_INGEST", "0") == "1"
+STREAM_CHUNK_ROWS = int(os.getenv("JUNIOR_STREAM_CHUNK_ROWS", "5000"))
+STREAM_QUEUE_CHUNKS = 4  # Prepared chunks allowed to wait ahead of the LLM (bounds memory)
+# Streamed runs write each task here as it finishes instead of keeping them (JSONL, optionally .gz/.zst)
+STREAM_OUTPUT = os.getenv("JUNIOR_STREAM_OUTPUT", "pre_senior_accountant.jsonl")
+
+# Drop statement rows the ledger already has (booked_index.py) before retrieval and the LLM.
+# Off by default: the SFT statements are exported from the ledger itself.
+SKIP_BOOKED = os.getenv("JUNIOR_SKIP_BOOKED", "0") == "1"
+
+# Explicit dtypes so every chunk parses the same way (and pandas skips type sniffing)
+STATEMENT_DTYPES = {
+    'Date': str,
+    'Payee': str,
+    'Description': str,
+    'Amount': 'float64',
+    'Currency': str,
+    'Beancount_Id': str,
+    'Source_Account': str,
+}
+
+# Prompt token budget: history examples are trimmed/dropped until the model input (prompt in its
+# ### wrapper or chat template) fits next to MAX_NEW_TOKENS in the window (0 = no limit)
+MAX_SEQ_LENGTH = 2048
+MAX_NEW_TOKENS = int(os.getenv("JUNIOR_MAX_NEW_TOKENS", "768"))  # Longest training responses are ~700 tokens
+PROMPT_TOKEN_BUDGET = int(os.getenv("JUNIOR_PROMPT_TOKEN_BUDGET", str(MAX_SEQ_LENGTH - MAX_NEW_TOKENS)))
+if PROMPT_TOKEN_BUDGET + MAX_NEW_TOKENS > MAX_SEQ_LENGTH:
+    raise ValueError(f"JUNIOR_PROMPT_TOKEN_BUDGET ({PROMPT_TOKEN_BUDGET}) + JUNIOR_MAX_NEW_TOKENS ({MAX_NEW_TOKENS}) "
+                     f"is over the {MAX_SEQ_LENGTH}-token window: generations would be cut off")
+# What the budget counts: the ### wrapper the local models read, or LM Studio's chat messages
+PROMPT_FORMAT = "unsloth" if PROVIDER in ("unsloth", "llama-cpp") else "chat"
+PROMPT_TOKENIZER = os.getenv("JUNIOR_PROMPT_TOKENIZER", "unsloth/Ministral-3-3B-Instruct-2512")  # Used when unsloth isn't loaded
+CONTEXT_K = 3             # History examples asked for before budgeting
+CONTEXT_DESC_CHARS = 120  # Long history descriptions are cut to this before examples are dropped
+
+# Confidence = blend of the model's probability for the account name and retrieval support.
+# 0 = retrieval support only, and the LLM is never asked for logprobs (no per-step scores kept)
+CONFIDENCE_LOGPROB_WEIGHT = float(os.getenv("JUNIOR_CONFIDENCE_LOGPROB_WEIGHT", "0.7"))
+REQUEST_LOGPROBS = CONFIDENCE_LOGPROB_WEIGHT > 0
+
+# Constrain unsloth generation to the <accounting_entry> grammar with ledger account names
+CONSTRAINED_DECODING = os.getenv("JUNIOR_CONSTRAINED_DECODING", "0") == "1"
 
 # Unsloth/HuggingFace settings
 UNSLOTH_MODEL_PATH = os.getenv("UNSLOTH_MODEL_PATH", "./outputs/checkpoint-246")  # Your trained model
 
+# llama.cpp (CPU) settings: the merged model converted to GGUF (see merge_and_push.py)
+GGUF_MODEL_PATH = os.getenv("GGUF_MODEL_PATH", "model.gguf")
+LLAMA_CPP_THREADS = int(os.getenv("LLAMA_CPP_THREADS", "0")) or None      # Generation threads (None = llama.cpp picks)
+LLAMA_CPP_BATCH_THREADS = int(os.getenv("LLAMA_CPP_BATCH_THREADS", "0")) or None  # Prompt evaluation threads
+LLAMA_CPP_BATCH = int(os.getenv("LLAMA_CPP_BATCH", "512"))  # Prompt tokens evaluated per forward pass
+LLAMA_CPP_CTX = int(os.getenv("LLAMA_CPP_CTX", "4096"))     # At least the prompt budget + MAX_NEW_TOKENS
+LLAMA_CPP_CACHE_MB = int(os.getenv("LLAMA_CPP_CACHE_MB", "2048"))  # KV states kept for prefix reuse (0 = off)
+LLAMA_CPP_LOGPROBS = os.getenv("LLAMA_CPP_LOGPROBS", "0") == "1"   # Needs logits for every token: slower
+
 # Global model/tokenizer (loaded once for unsloth)
 _model = None
 _tokenizer = None
+_llama = None  # llama.cpp model (loaded once for llama-cpp)
+_llama_stats = {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "seconds": 0.0}
 
 def init_unsloth():
     """Load the fine-tuned model once using Unsloth."""
@@ -45,7 +120,7 @@ def init_unsloth():
     # This automatically handles the base model + adapter logic
     _model, _tokenizer = FastLanguageModel.from_pretrained(
         model_name = UNSLOTH_MODEL_PATH,
-        max_seq_length = 2048,
+        max_seq_length = MAX_SEQ_LENGTH,
         dtype = None,
         load_in_4bit = True,
     )
@@ -55,97 +130,255 @@ def init_unsloth():
     
     print("✅ Model loaded!")
 
-def call_unsloth(prompt):
-    """Call the fine-tuned Unsloth model."""
-    global _model, _tokenizer
-    import torch
-    
+SYSTEM_MESSAGE = "You are a precise accounting agent that outputs XML."
+
+def chat_messages(prompt):
+    """The chat request sent to LM Studio (or another OpenAI-style server)."""
+    return [{"role": "system", "content": SYSTEM_MESSAGE}, {"role": "user", "content": prompt}]
+
+def format_for_unsloth(prompt):
     # Format as simple instruction/response (matches training format)
-    formatted_prompt = f"""### System:
-You are a precise accounting agent that outputs XML.
+    return f"""### System:
+{SYSTEM_MESSAGE}
 
 ### User:
 {prompt}
 
 ### Assistant:
 """
+
+def call_unsloth(prompt, with_logprobs=False, grammar=None):
+    """
+    Call the fine-tuned Unsloth model.
+    with_logprobs=True returns (response, [(token_text, logprob), ...]) for the generated tokens.
+    grammar (a constrained_decoding.EntryGrammar) restricts generation to valid entries.
+    """
+    global _model, _tokenizer
+    import torch
+    
+    formatted_prompt = format_for_unsloth(prompt)
     
     
     # Handle case where Unsloth/Transformers returns a Processor (for multimodal models)
     # This prevents "Incorrect image source" error when passing text as first arg
-    if hasattr(_tokenizer, "image_processor") or "Processor" in type(_tokenizer).__name__:
-        inputs = _tokenizer(
-            text=formatted_prompt,
-            return_tensors="pt",
-            add_special_tokens=True
-        ).to("cuda")
-    else:
-        inputs = _tokenizer(
-            formatted_prompt,
-            return_tensors="pt",
-            add_special_tokens=True
-        ).to("cuda")
-    
-    outputs = _model.generate(
-        **inputs,
-        max_new_tokens=2000,
-        temperature=0.1,
-        do_sample=True,
-        pad_token_id=_tokenizer.eos_token_id,
-    )
+    with telemetry.span("tokenize"):
+        if hasattr(_tokenizer, "image_processor") or "Processor" in type(_tokenizer).__name__:
+            inputs = _tokenizer(
+                text=formatted_prompt,
+                return_tensors="pt",
+                add_special_tokens=True
+            ).to(_model.device)
+        else:
+            inputs = _tokenizer(
+                formatted_prompt,
+                return_tensors="pt",
+                add_special_tokens=True
+            ).to(_model.device)
     
-    # Decode response
     # If it's a processor, we might need to use _tokenizer.tokenizer.decode() or similar
     # But usually tokenizer methods are exposed or we can access the underlying tokenizer
     decoder = _tokenizer
     if hasattr(_tokenizer, "tokenizer"):
          decoder = _tokenizer.tokenizer
-         
+
+    prompt_tokens = inputs["input_ids"].shape[-1]
+    logits_processor = None
+    if grammar is not None:
+        from transformers import LogitsProcessorList
+        from constrained_decoding import EntryGrammarProcessor
+        logits_processor = LogitsProcessorList([EntryGrammarProcessor(grammar, decoder, prompt_tokens)])
+
+    with telemetry.span("generate", constrained=grammar is not None):
+        generated = _model.generate(
+            **inputs,
+            max_new_tokens=MAX_NEW_TOKENS,
+            temperature=0.1,
+            do_sample=True,
+            pad_token_id=_tokenizer.eos_token_id,
+            output_scores=with_logprobs,
+            return_dict_in_generate=with_logprobs,
+            logits_processor=logits_processor,
+        )
+    outputs = generated.sequences if with_logprobs else generated
+    telemetry.annotate(prompt_tokens=int(prompt_tokens), completion_tokens=int(outputs.shape[-1] - prompt_tokens))
+    
+    # Decode response
     response = decoder.decode(outputs[0], skip_special_tokens=True)
     
     # Extract just the assistant's response
     if "### Assistant:" in response:
         response = response.split("### Assistant:")[-1].strip()
     
-    return response
+    if not with_logprobs:
+        return response
 
-# ================= THE AGENT =================
-class JuniorAccountant:
-    def __init__(self, brain_file):
-        self.brain = ContextCompiler(brain_file)
-        self.results = []
+    # Log-probability of each sampled token (after temperature, like the sampler saw it)
+    scores = _model.compute_transition_scores(generated.sequences, generated.scores, normalize_logits=True)[0]
+    new_ids = outputs[0][prompt_tokens:].tolist()
+    return response, list(zip(token_texts(decoder, new_ids[:len(scores)]), scores.tolist()))
 
-    def construct_prompt(self, row):
-        # 1. Clean Data handling
-        payee = str(row['Payee']) if pd.notna(row['Payee']) else "Unknown"
-        desc = str(row['Description']) if pd.notna(row['Description']) else ""
-        
-        # 2. Get Context from Brain
-        context_xml = self.brain.retrieve_context(payee, desc)
-        
-        # 3. Dynamic Source Account (The Magic Fix)
-        # We ensure it looks like a valid account if the CSV just says "Lloyds"
-        raw_source = row.get('Source_Account', 'Unknown')
-        
-        # PRO TIP: If your CSV just says "Lloyds", let's help the agent by adding "Assets:"
-        # If your CSV already has "Assets:...", this line won't hurt.
-        if "Assets" not in raw_source and raw_source != "Unknown":
-             source_account = f"Assets:{raw_source}:Checking"
-        else:
-             source_account = raw_source
+def token_texts(decoder, ids):
+    """
+    The text each token adds, so the pieces join into decode(ids, skip_special_tokens=True).
+    Decodes a small sliding window per token (one pass) instead of the whole prefix every
+    step; a token ending mid-character gets "" and the character lands on a later token.
+    """
+    pieces, prefix, read = [], 0, 0
+    prefix_text = ""
+    for i in range(len(ids)):
+        new_text = decoder.decode(ids[prefix:i + 1], skip_special_tokens=True)
+        if new_text.endswith("\ufffd") and i < len(ids) - 1:
+            pieces.append("")
+            continue
+        pieces.append(new_text[len(prefix_text):])
+        prefix, read = read, i + 1
+        prefix_text = decoder.decode(ids[prefix:read], skip_special_tokens=True)
+    return pieces
+
+def init_llama_cpp():
+    """Load the GGUF model once with llama.cpp (CPU)."""
+    global _llama
+    if _llama is not None:
+        return
+
+    print(f"🔄 Loading GGUF model from {GGUF_MODEL_PATH}...")
+    from llama_cpp import Llama, LlamaRAMCache
+
+    if PROMPT_TOKEN_BUDGET and LLAMA_CPP_CTX < PROMPT_TOKEN_BUDGET + MAX_NEW_TOKENS:
+        raise ValueError(f"LLAMA_CPP_CTX ({LLAMA_CPP_CTX}) is smaller than the prompt budget ({PROMPT_TOKEN_BUDGET}) "
+                         f"+ JUNIOR_MAX_NEW_TOKENS ({MAX_NEW_TOKENS})")
+    _llama = Llama(
+        model_path=GGUF_MODEL_PATH,
+        n_ctx=LLAMA_CPP_CTX,
+        n_batch=LLAMA_CPP_BATCH,
+        n_threads=LLAMA_CPP_THREADS,
+        n_threads_batch=LLAMA_CPP_BATCH_THREADS,
+        n_gpu_layers=0,
+        logits_all=LLAMA_CPP_LOGPROBS,
+        verbose=False,
+    )
+    # Every prompt starts with the same system/instruction header, and rows for a recurring
+    # payee retrieve the same history: the cache restores the KV state of the longest
+    # previously seen prefix so only the rest of the prompt is evaluated
+    if LLAMA_CPP_CACHE_MB:
+        class CountingRAMCache(LlamaRAMCache):
+            """Counts prefix lookups: llama.cpp asks the cache once per completion."""
+            def __getitem__(self, key):
+                try:
+                    state = super().__getitem__(key)
+                except KeyError:
+                    telemetry.incr("cache_misses", cache="llama_cpp_prefix")
+                    raise
+                telemetry.incr("cache_hits", cache="llama_cpp_prefix")
+                return state
+
+        _llama.set_cache(CountingRAMCache(capacity_bytes=LLAMA_CPP_CACHE_MB << 20))
+
+    print(f"✅ Model loaded! ({_llama.n_ctx()} ctx, batch {LLAMA_CPP_BATCH}, threads {LLAMA_CPP_THREADS or 'auto'})")
+
+def call_llama_cpp(prompt, with_logprobs=False):
+    """
+    Call the GGUF model in-process with llama.cpp.
+    with_logprobs=True returns (response, [(token_text, logprob), ...]); the list is None
+    unless the model was loaded with LLAMA_CPP_LOGPROBS=1.
+    """
+    logprobs = 1 if with_logprobs and LLAMA_CPP_LOGPROBS else None
+    started = time.perf_counter()
+    with telemetry.span("generate"):
+        completion = _llama.create_completion(
+            format_for_unsloth(prompt),
+            max_tokens=MAX_NEW_TOKENS,
+            temperature=0.1,
+            logprobs=logprobs,
+        )
+    elapsed = time.perf_counter() - started
+
+    usage = completion.get("usage") or {}
+    telemetry.annotate(prompt_tokens=usage.get("prompt_tokens"), completion_tokens=usage.get("completion_tokens"))
+    _llama_stats["calls"] += 1
+    _llama_stats["prompt_tokens"] += usage.get("prompt_tokens") or 0
+    _llama_stats["completion_tokens"] += usage.get("completion_tokens") or 0
+    _llama_stats["seconds"] += elapsed
+
+    choice = completion["choices"][0]
+    response = choice["text"].strip()
+    if not with_logprobs:
+        return response
+
+    # Completion-style logprobs: parallel lists of token texts and log-probabilities
+    token_logprobs = None
+    if choice.get("logprobs"):
+        token_logprobs = list(zip(choice["logprobs"]["tokens"], choice["logprobs"]["token_logprobs"]))
+    return response, token_logprobs
 
-        # 4. The Prompt
-        prompt = f"""You are an expert accountant. Categorize this transaction into strict Beancount syntax.
+def llama_cpp_throughput():
+    """Tokens/second over all llama.cpp calls so far (prompt + generation, wall time)."""
+    seconds = _llama_stats["seconds"]
+    if not seconds:
+        return None
+    return {"calls": _llama_stats["calls"],
+            "completion_tokens_per_s": _llama_stats["completion_tokens"] / seconds,
+            "total_tokens_per_s": (_llama_stats["prompt_tokens"] + _llama_stats["completion_tokens"]) / seconds}
+
+# ================= ROW PREPARATION =================
+# Column order of the plain tuples produced by prepare_rows()
+ROW_FIELDS = ["transaction_id", "date", "payee", "desc", "amount", "currency", "source_account"]
+
+def expand_source_account(raw_source):
+    """
+    Dynamic Source Account (The Magic Fix)
+    We ensure it looks like a valid account if the CSV just says "Lloyds"
+    """
+    # PRO TIP: If your CSV just says "Lloyds", let's help the agent by adding "Assets:"
+    # If your CSV already has "Assets:..." (or a card's "Liabilities:..."), this line won't hurt.
+    if "Assets" not in raw_source and not raw_source.startswith("Liabilities:") and raw_source != "Unknown":
+        return f"Assets:{raw_source}:Checking"
+    return raw_source
+
+def normalise_row(row, index=None):
+    """Cleans a single CSV row (Series or dict) into a tuple ordered like ROW_FIELDS."""
+    payee = str(row['Payee']) if pd.notna(row['Payee']) else "Unknown"
+    desc = str(row['Description']) if pd.notna(row['Description']) else ""
+    source_account = expand_source_account(row.get('Source_Account', 'Unknown'))
+    transaction_id = row.get('Beancount_Id', str(index))
+    return (transaction_id, row['Date'], payee, desc, row['Amount'], row['Currency'], source_account)
+
+def prepare_rows(df):
+    """
+    Vectorised version of normalise_row() for a whole statement.
+    Returns a DataFrame with ROW_FIELDS columns, all plain strings except transaction_id,
+    ready for itertuples(index=False, name=None).
+    """
+    prepared = pd.DataFrame(index=df.index)
+    prepared['transaction_id'] = df['Beancount_Id'] if 'Beancount_Id' in df.columns else df.index.astype(str)
+    prepared['date'] = df['Date'].astype(str)
+    prepared['payee'] = df['Payee'].where(df['Payee'].notna(), "Unknown").astype(str)
+    prepared['desc'] = df['Description'].where(df['Description'].notna(), "").astype(str)
+    prepared['amount'] = df['Amount'].astype(str)
+    prepared['currency'] = df['Currency'].astype(str)
+
+    if 'Source_Account' in df.columns:
+        raw_source = df['Source_Account'].fillna("Unknown").astype(str)
+        needs_prefix = (~raw_source.str.contains("Assets", regex=False) & ~raw_source.str.startswith("Liabilities:")
+                        & (raw_source != "Unknown"))
+        prepared['source_account'] = raw_source.where(~needs_prefix, "Assets:" + raw_source + ":Checking")
+    else:
+        prepared['source_account'] = "Unknown"
+    return prepared[ROW_FIELDS]
+
+def render_prompt(context_xml, date, payee, desc, amount, currency, source_account):
+    """The Prompt. An f-string compiled once with the module, fed with plain values."""
+    return f"""You are an expert accountant. Categorize this transaction into strict Beancount syntax.
 
         <context>
         {context_xml}
         </context>
 
         <transaction>
-        Date: {row['Date']}
+        Date: {date}
         Payee: {payee}
         Description: {desc}
-        Amount: {row['Amount']} {row['Currency']}
+        Amount: {amount} {currency}
         Source Account: {source_account}
         </transaction>
 
@@ -173,8 +406,8 @@ class JuniorAccountant:
             </thought_process>
             <entry>
                 2023-01-20 * "Comcast" "Internet Bill"
-                Expenses:Home:Internet     50.00 {row['Currency']}
-                {source_account}          -50.00 {row['Currency']}
+                Expenses:Home:Internet     50.00 {currency}
+                {source_account}          -50.00 {currency}
             </entry>
         </accounting_entry>
         </example_output_structure>
@@ -184,46 +417,303 @@ class JuniorAccountant:
         - Output ONLY the raw XML starting with <accounting_entry>.
         - IMPORTANT: The context history uses generic examples, use it as a guide for syntax opposed to using the exact company names from it.
         """
-        return prompt
 
-    def call_llm(self, prompt):
+# ================= TOKEN BUDGET =================
+class PromptBudgetError(ValueError):
+    """The prompt is over PROMPT_TOKEN_BUDGET even with no history at all."""
+
+_count_tokens = None
+TOKENS_ESTIMATED = False  # True when no tokenizer could be loaded and counts are chars/3 estimates
+
+def model_input(prompt, tokenizer=None):
+    """
+    The text the model actually reads for a prompt: the ### wrapper (unsloth, llama.cpp),
+    or the chat template with the system message (LM Studio; plain joined messages when
+    the tokenizer has no template).
+    """
+    if PROMPT_FORMAT == "unsloth":
+        return format_for_unsloth(prompt)
+    if getattr(tokenizer, "chat_template", None):
+        return tokenizer.apply_chat_template(chat_messages(prompt), tokenize=False, add_generation_prompt=True)
+    return "\n\n".join(message["content"] for message in chat_messages(prompt))
+
+def get_token_counter():
+    """
+    Loads the target tokenizer once and returns a prompt -> token count function, counting
+    the formatted model input (see model_input). Reuses the unsloth or llama.cpp tokenizer
+    when that model is loaded. Without any tokenizer, counts are estimated (TOKENS_ESTIMATED).
+    """
+    global _count_tokens, TOKENS_ESTIMATED
+    if _count_tokens is not None:
+        return _count_tokens
+
+    if _llama is not None:
+        _count_tokens = lambda prompt: len(_llama.tokenize(model_input(prompt).encode("utf-8"), add_bos=True))
+        return _count_tokens
+
+    tokenizer = _tokenizer
+    if tokenizer is None:
+        try:
+            from transformers import AutoTokenizer
+            tokenizer = AutoTokenizer.from_pretrained(PROMPT_TOKENIZER)
+        except Exception as e:
+            print(f"⚠️ Could not load tokenizer '{PROMPT_TOKENIZER}' ({e}). Over-estimating at 1 token per 3 characters; "
+                  f"prompt token stats are estimates.")
+
+    if tokenizer is not None:
+        # Processors (multimodal models) wrap the text tokenizer
+        text_tokenizer = getattr(tokenizer, "tokenizer", tokenizer)
+        _count_tokens = lambda prompt: len(text_tokenizer(model_input(prompt, text_tokenizer),
+                                                          add_special_tokens=True)["input_ids"])
+    else:
+        TOKENS_ESTIMATED = True
+        _count_tokens = lambda prompt: -(-len(model_input(prompt)) // 3)
+    return _count_tokens
+
+def clip_example(match, max_chars=CONTEXT_DESC_CHARS):
+    if len(match['description']) <= max_chars:
+        return match
+    return {**match, 'description': match['description'][:max_chars].rstrip() + "..."}
+
+def fit_to_budget(matches, render, count_tokens, budget):
+    """
+    Renders with as much history as fits: all examples, then the same examples with long
+    descriptions clipped, then one example fewer at a time.
+    Returns (prompt, tokens, examples_used, clipped). Never truncates the prompt itself.
+    """
+    for k in range(len(matches), -1, -1):
+        examples = matches[:k]
+        clipped = [clip_example(m) for m in examples]
+        for attempt, was_clipped in ((examples, False), (clipped, True)):
+            if was_clipped and clipped == examples:
+                continue
+            prompt = render(attempt)
+            tokens = count_tokens(prompt)
+            if tokens <= budget:
+                return prompt, tokens, k, was_clipped
+    raise PromptBudgetError(f"Prompt is {tokens} tokens with no history, over the budget of {budget}")
+
+def assemble_prompt(format_context, matches, date, payee, desc, amount, currency, source_account):
+    """
+    render_prompt with as many of `matches` as PROMPT_TOKEN_BUDGET allows.
+    Returns (prompt, tokens, examples_used, clipped); tokens is None when there is no budget.
+    """
+    render = lambda examples: render_prompt(format_context(examples), date, payee, desc, amount, currency, source_account)
+    if not PROMPT_TOKEN_BUDGET:
+        return render(matches), None, len(matches), False
+    return fit_to_budget(matches, render, get_token_counter(), PROMPT_TOKEN_BUDGET)
+
+# ================= CONFIDENCE =================
+def logprob_of_span(token_logprobs, start, end):
+    """Sum of the log-probabilities of the tokens overlapping characters [start, end) of the joined tokens."""
+    position, total, hit = 0, 0.0, False
+    for token, logprob in token_logprobs:
+        token_end = position + len(token)
+        if token_end > start and position < end:
+            total += logprob
+            hit = True
+        position = token_end
+        if position >= end:
+            break
+    return total if hit else None
+
+def score_prediction(llm_output, token_logprobs, matches, source_account):
+    """
+    (confidence 0-1, account the model booked against, score mode).
+    Blends the model's joint probability for the account-name tokens with retrieval
+    support (best similarity among history examples booked to the same account): mode
+    "blended". Without logprobs only retrieval support counts, which is a different
+    scale: mode "retrieval". Unparseable output scores 0.
+    """
+    text = "".join(token for token, _ in token_logprobs) if token_logprobs else llm_output
+    posting = target_posting(parse_entry(text), source_account)
+    if posting is None:
+        return 0.0, None, "blended" if token_logprobs else "retrieval"
+
+    account = posting['account']
+    support = max((m.get('score', 0.0) for m in matches if m['account'] == account), default=0.0)
+    logprob = logprob_of_span(token_logprobs, posting['start'], posting['end']) if token_logprobs else None
+    if logprob is None:
+        return support, account, "retrieval"
+    blended = CONFIDENCE_LOGPROB_WEIGHT * math.exp(logprob) + (1 - CONFIDENCE_LOGPROB_WEIGHT) * support
+    return blended, account, "blended"
+
+# ================= STREAMING INGESTION =================
+_END_OF_STREAM = object()
+
+def iter_statement_chunks(csv_file, chunksize=STREAM_CHUNK_ROWS, limit=None):
+    """Yields the statement as DataFrames of `chunksize` rows, never reading past `limit`."""
+    # Map dtypes onto the raw (possibly sloppy, e.g. " Payee") header names
+    header = pd.read_csv(csv_file, nrows=0).columns
+    dtypes = {raw: STATEMENT_DTYPES[raw.strip()] for raw in header if raw.strip() in STATEMENT_DTYPES}
+
+    reader = pd.read_csv(csv_file, chunksize=chunksize, nrows=limit, dtype=dtypes)
+    with reader:
+        for chunk in reader:
+            chunk.columns = chunk.columns.str.strip()
+            yield chunk
+
+def stream_prepared_rows(csv_file, limit=None, chunksize=STREAM_CHUNK_ROWS, max_chunks=STREAM_QUEUE_CHUNKS):
+    """
+    Reads and prepares chunks on a background thread, handing them over through a
+    bounded queue. Yields the same plain tuples as prepare_rows(), so retrieval and
+    the LLM can start on the first chunk while the rest of the file is still on disk.
+    """
+    handoff = queue.Queue(maxsize=max_chunks)
+    stop = threading.Event()
+
+    def put(item):
+        # Block while the queue is full, but give up if the consumer went away
+        while not stop.is_set():
+            try:
+                handoff.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def producer():
+        try:
+            for chunk in iter_statement_chunks(csv_file, chunksize, limit):
+                with telemetry.span("ingest_chunk", rows=len(chunk)):
+                    prepared = prepare_rows(chunk)
+                if not put(prepared):
+                    return
+        except Exception as e:
+            put(e)
+        finally:
+            put(_END_OF_STREAM)
+
+    reader = threading.Thread(target=producer, name="statement-reader", daemon=True)
+    reader.start()
+    try:
+        while True:
+            item = handoff.get()
+            if item is _END_OF_STREAM:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield from item.itertuples(index=False, name=None)
+    finally:
+        stop.set()
+        reader.join(timeout=1)
+
+# ================= THE AGENT =================
+class JuniorAccountant:
+    def __init__(self, brain_file):
+        self.brain_file = brain_file
+        self.brain = ContextCompiler(brain_file)
+        self._accounts = None    # Ledger accounts for constrained decoding (loaded on first use)
+        self._booked = None      # BookedIndex over the ledger (built on first use)
+        self.results = []        # Finished tasks (not kept when streaming to output_file)
+        self.output_file = None  # Where a streamed run wrote its tasks
+        self._sink = None        # artefact_io.JsonlWriter while streaming
+        self.prompt_tokens = {"prompts": 0, "total": 0, "max": 0}  # Running token counts (when a budget is set)
+        self.skipped = []        # transaction_ids whose prompt could not fit the budget
+        self.already_booked = [] # transaction_ids dropped because the ledger already has them
+        self._brain_lock = threading.Lock()
+
+    def construct_prompt(self, row):
+        _, date, payee, desc, amount, currency, source_account = normalise_row(row)
+        return self.prompt_for(date, payee, desc, amount, currency, source_account)
+
+    def prompt_for(self, date, payee, desc, amount, currency, source_account):
+        """Gets Context from the Brain and renders the prompt for one cleaned row."""
+        return self.build_prompt(date, payee, desc, amount, currency, source_account)[0]
+
+    def build_prompt(self, date, payee, desc, amount, currency, source_account):
+        """Like prompt_for, but also returns the retrieved history matches (with similarity scores)."""
+        with telemetry.span("construct_prompt") as span:
+            matches = self.brain.retrieve_matches(payee, desc, k=CONTEXT_K)
+            prompt, tokens, used, clipped = assemble_prompt(self.brain.format_context, matches,
+                                                            date, payee, desc, amount, currency, source_account)
+            if tokens is None:
+                return prompt, matches
+
+            span.set(prompt_tokens=tokens, tokens_estimated=TOKENS_ESTIMATED, context_examples=used,
+                     context_clipped=clipped)
+            if used < len(matches) or clipped:
+                telemetry.incr("context_trimmed")
+            self.prompt_tokens["prompts"] += 1
+            self.prompt_tokens["total"] += tokens
+            self.prompt_tokens["max"] = max(self.prompt_tokens["max"], tokens)
+            return prompt, matches
+
+    def unbooked(self, rows):
+        """Filters prepared rows down to the ones not already booked in the ledger."""
+        if self._booked is None:
+            self._booked = BookedIndex.from_ledger(self.brain_file)
+            print(f"📒 Indexed {self._booked.size} booked bank/card postings")
+        return self._booked.filter_rows(rows, self.already_booked)
+
+    def grammar_for(self, prompt):
+        """The <accounting_entry> grammar for this prompt's transaction (source account, amount, date)."""
+        from constrained_decoding import EntryGrammar, load_open_accounts
+        if self._accounts is None:
+            self._accounts = load_open_accounts(self.brain_file)
+        txn = parse_transaction(prompt)
+        if not txn['source']:
+            return None
+        return EntryGrammar(self._accounts, txn['source'], txn['amount'], txn['currency'], txn['date'])
+
+    def call_llm(self, prompt, with_logprobs=False):
         """
         Swappable function to call your LLM. 
-        Supports: lm-studio, unsloth
+        Supports: lm-studio, unsloth, llama-cpp
+        with_logprobs=True returns (text, [(token, logprob), ...]); the list is None
+        when the provider didn't send logprobs (or the call failed).
         """
+        with telemetry.span("llm_call", provider=PROVIDER):
+            text, token_logprobs = self._call_llm(prompt, with_logprobs)
+        return (text, token_logprobs) if with_logprobs else text
+
+    def _call_llm(self, prompt, with_logprobs=False):
         if PROVIDER == "unsloth":
             try:
-                return call_unsloth(prompt)
+                grammar = self.grammar_for(prompt) if CONSTRAINED_DECODING else None
+                if with_logprobs:
+                    return call_unsloth(prompt, with_logprobs=True, grammar=grammar)
+                return call_unsloth(prompt, grammar=grammar), None
             except Exception as e:
                 print(f"⚠️ Unsloth Error: {e}")
-                return f"Error calling Unsloth: {e}"
+                telemetry.incr("llm_errors", provider=PROVIDER)
+                return f"Error calling Unsloth: {e}", None
+
+        if PROVIDER == "llama-cpp":
+            try:
+                if with_logprobs:
+                    return call_llama_cpp(prompt, with_logprobs=True)
+                return call_llama_cpp(prompt), None
+            except Exception as e:
+                print(f"⚠️ llama.cpp Error: {e}")
+                telemetry.incr("llm_errors", provider=PROVIDER)
+                return f"Error calling llama.cpp: {e}", None
         
         # Default: LM Studio
         try:
             payload = {
                 "model": MODEL_NAME,
-                "messages": [
-                    {
-                        "role": "system", 
-                        "content": "You are a precise accounting agent that outputs XML."
-                    },
-                    {
-                        "role": "user", 
-                        "content": prompt
-                    }
-                ],
+                "messages": chat_messages(prompt),
                 "temperature": 0.1,
-                "max_tokens": 2000
+                "max_tokens": MAX_NEW_TOKENS
             }
+            if with_logprobs:
+                payload["logprobs"] = True
             
-            headers = {"Content-Type": "application/json"}
-            response = requests.post(LLM_API_URL, json=payload, headers=headers)
-            response.raise_for_status()
-            return response.json()['choices'][0]['message']['content']
+            with telemetry.span("http_request"):
+                body = get_llm_pool(LLM_API_URLS or [LLM_API_URL]).post(payload)
+            usage = body.get('usage') or {}
+            telemetry.annotate(prompt_tokens=usage.get('prompt_tokens'), completion_tokens=usage.get('completion_tokens'))
+            choice = body['choices'][0]
+            # OpenAI format: logprobs.content = [{"token": ..., "logprob": ...}, ...]
+            content_logprobs = (choice.get('logprobs') or {}).get('content')
+            token_logprobs = [(t['token'], t['logprob']) for t in content_logprobs] if content_logprobs else None
+            return choice['message']['content'], token_logprobs
             
         except Exception as e:
             print(f"⚠️ LM Studio Error: {e}")
-            return f"Error calling LLM: {e}"
+            telemetry.incr("llm_errors", provider=PROVIDER)
+            return f"Error calling LLM: {e}", None
 
         # --- GEMINI / OPENAI EXAMPLE (Commented Out) ---
         # import openai
@@ -231,66 +721,172 @@ class JuniorAccountant:
         # response = client.chat.completions.create(...)
         # return response.choices[0].message.content
 
-    def process_batch(self, csv_file, limit=10):
-        """Runs the loop."""
-        df = pd.read_csv(csv_file)
+    def label_row(self, transaction_id, date, payee, desc, amount, currency, source_account):
+        """Prompt -> LLM -> confidence for one cleaned row. Returns the Label Studio task, or None if skipped."""
+        with telemetry.span("process_row") as span:
+            try:
+                # Retrieval and the token budget run one row at a time; only the LLM calls overlap
+                with self._brain_lock:
+                    prompt, matches = self.build_prompt(date, payee, desc, amount, currency, source_account)
+            except PromptBudgetError as e:
+                print(f"⚠️ Skipping {transaction_id}: {e}")
+                telemetry.incr("prompt_over_budget")
+                self.skipped.append(transaction_id)
+                return None
+            
+            # The "Thinking" Phase
+            # Logprobs only when they count towards the confidence (they cost memory and decode time)
+            if REQUEST_LOGPROBS:
+                llm_output, token_logprobs = self.call_llm(prompt, with_logprobs=True)
+            else:
+                llm_output, token_logprobs = self.call_llm(prompt), None
+
+            # How sure are we? The senior only reviews low-confidence rows (see senior_accountant.py)
+            confidence, _, score_mode = score_prediction(llm_output, token_logprobs, matches, source_account)
+            span.set(confidence=round(confidence, 4), score_mode=score_mode)
         
-        # --- FIX: Clean up sloppy CSV headers ---
-        df.columns = df.columns.str.strip() 
-        # ----------------------------------------
+        # Be nice to your spare PC
+        if REQUEST_DELAY:
+            time.sleep(REQUEST_DELAY)
 
-        # Just take the first N rows for the test run
-        work_queue = df.head(limit)
+        # Save for Label Studio
+        return {
+            "data": {
+                "prompt": prompt,  # The input for the annotator to see
+                "transaction_id": transaction_id
+            },
+            "predictions": [{
+                "model_version": MODEL_NAME,
+                "score": round(confidence, 4),  # Label Studio shows this as the prediction score
+                "score_mode": score_mode,       # blended / retrieval: separate thresholds in senior_accountant.py
+                "result": [
+                    {
+                        "from_name": "response",
+                        "to_name": "prompt",
+                        "type": "textarea",
+                        "value": {
+                            "text": [llm_output] # Pre-fill the editor!
+                        }
+                    }
+                ]
+            }]
+        }
 
-        print(work_queue)
-        
-        print(f"🤖 Agent starting work on {len(work_queue)} transactions...")
-        
-        for index, row in tqdm(work_queue.iterrows(), total=len(work_queue)):
-            prompt = self.construct_prompt(row)
+    def _collect(self, future, progress):
+        self._keep(future.result())
+        progress.update(1)
+
+    def _keep(self, task):
+        """Streams a finished task to the output file, or keeps it for save_for_label_studio."""
+        if task is None:
+            return
+        if self._sink is not None:
+            self._sink.write(task)
+        else:
+            self.results.append(task)
+
+    def process_batch(self, csv_file, limit=10, stream=STREAM_INGEST, concurrency=CONCURRENCY, skip_booked=SKIP_BOOKED,
+                      output_file=None):
+        """
+        Runs the loop.
+        stream=True reads the CSV in chunks on a background thread and writes each task to
+        output_file (default STREAM_OUTPUT, JSONL) as it finishes, so memory stays flat for
+        huge exports; limit=None then means "the whole file".
+        concurrency > 1 keeps that many rows' LLM calls in flight at once.
+        skip_booked=True drops rows already in the ledger before any retrieval or LLM call.
+        """
+        if stream:
+            print(f"🤖 Agent streaming transactions from {csv_file} ({STREAM_CHUNK_ROWS} rows per chunk)...")
+            rows = stream_prepared_rows(csv_file, limit=limit)
+            total = limit
+        else:
+            df = pd.read_csv(csv_file)
             
-            # The "Thinking" Phase
-            llm_output = self.call_llm(prompt)
+            # --- FIX: Clean up sloppy CSV headers ---
+            df.columns = df.columns.str.strip() 
+            # ----------------------------------------
+
+            # Just take the first N rows for the test run
+            work_queue = df.head(limit)
+
+            print(work_queue)
             
-            # Save for Label Studio
-            self.results.append({
-                "data": {
-                    "prompt": prompt,  # The input for the annotator to see
-                    "transaction_id": row.get('Beancount_Id', str(index))
-                },
-                "predictions": [{
-                    "model_version": MODEL_NAME,
-                    "result": [
-                        {
-                            "from_name": "response",
-                            "to_name": "prompt",
-                            "type": "textarea",
-                            "value": {
-                                "text": [llm_output] # Pre-fill the editor!
-                            }
-                        }
-                    ]
-                }]
-            })
+            print(f"🤖 Agent starting work on {len(work_queue)} transactions...")
             
-            # Be nice to your spare PC
-            time.sleep(0.5)
+            # Clean every column once, then walk plain tuples instead of a Series per row
+            rows = prepare_rows(work_queue).itertuples(index=False, name=None)
+            total = len(work_queue)
+
+        if skip_booked:
+            rows = self.unbooked(rows)
+            if not stream:
+                rows = list(rows)
+                total = len(rows)
+                print(f"📒 {len(self.already_booked)} rows already booked, {total} left to label")
+        
+        if PROVIDER in ("unsloth", "llama-cpp"):
+            concurrency = 1  # One local model: generate() calls can't overlap
+        if stream:
+            self.output_file = output_file or STREAM_OUTPUT
+            self._sink = artefact_io.JsonlWriter(self.output_file)
+        try:
+            if concurrency <= 1:
+                for row in tqdm(rows, total=total):
+                    self._keep(self.label_row(*row))
+            else:
+                # Rows go out `concurrency` at a time (the endpoint pool spreads them over the boxes);
+                # a bounded window keeps memory flat and results come back in statement order
+                with ThreadPoolExecutor(max_workers=concurrency) as executor, tqdm(total=total) as progress:
+                    in_flight = deque()
+                    for row in rows:
+                        in_flight.append(executor.submit(self.label_row, *row))
+                        if len(in_flight) >= 2 * concurrency:
+                            self._collect(in_flight.popleft(), progress)
+                    while in_flight:
+                        self._collect(in_flight.popleft(), progress)
+        finally:
+            if self._sink is not None:
+                self._sink.close()
+        if self._sink is not None:
+            print(f"💾 Streamed {self._sink.count} tasks to {self.output_file}")
+            maybe_ingest(artefact_io.iter_jsonl(self.output_file), self.output_file)  # Only when ARTEFACT_DB is set
+            self._sink = None
+
+        if self.prompt_tokens["prompts"]:
+            print(f"📏 Prompt tokens{' (ESTIMATED at 1 per 3 chars: no tokenizer)' if TOKENS_ESTIMATED else ''}: "
+                  f"mean {self.prompt_tokens['total'] / self.prompt_tokens['prompts']:.0f}, "
+                  f"max {self.prompt_tokens['max']} (budget {PROMPT_TOKEN_BUDGET} + {MAX_NEW_TOKENS} new tokens)")
+        if self.skipped:
+            print(f"⚠️ {len(self.skipped)} rows skipped: prompt over budget even without history")
+        if stream and skip_booked:
+            print(f"📒 {len(self.already_booked)} rows skipped: already booked in the ledger")
+        if PROVIDER == "llama-cpp" and llama_cpp_throughput():
+            speed = llama_cpp_throughput()
+            print(f"🦙 llama.cpp: {speed['completion_tokens_per_s']:.1f} generated tokens/s, "
+                  f"{speed['total_tokens_per_s']:.1f} tokens/s including prompts ({speed['calls']} calls)")
 
-    def save_for_label_studio(self, filename="label_studio_import.json"):
-        with open(filename, 'w') as f:
-            json.dump(self.results, f, indent=2)
-        print(f"💾 Saved {len(self.results)} tasks to {filename}")
+    def save_for_label_studio(self, filename="label_studio_import.json", compact=COMPACT_TASKS):
+        if self.output_file:
+            print(f"💾 Tasks were streamed to {self.output_file}; "
+                  f"`python task_store.py unpack {self.output_file} {filename}` for a plain Label Studio file")
+            return
+        save_tasks(self.results, filename, compact=compact)
+        print(f"💾 Saved {len(self.results)} tasks to {filename}" + (" (compact)" if compact else ""))
+        maybe_ingest(self.results, filename)  # Only when ARTEFACT_DB is set
 
 if __name__ == "__main__":
     # Initialize model if using unsloth
     if PROVIDER == "unsloth":
         init_unsloth()
         print("Using Unsloth/HuggingFace Provider")
+    elif PROVIDER == "llama-cpp":
+        init_llama_cpp()
+        print("Using llama.cpp (CPU) Provider")
     else:
         print("Using LM Studio Provider")
     
     # 1. Initialize
-    agent = JuniorAccountant(data/my_accounts.beancount")
+    agent = JuniorAccountant("data/my_accounts.beancount")
     
     # 2. Run on your CSV
     # Only doing 5 for the first test!
@@ -0,0 +1,466 @@
+"""
+Long-running junior accountant service: an OpenAI-compatible /v1/chat/completions
+endpoint hosting the fine-tuned model (loaded once) and the ContextCompiler.
+
+Concurrent requests are collected into micro-batches: the first waiting request
+opens a batch, which is generated as soon as MAX_BATCH_SIZE requests with the
+same sampling settings have arrived or MAX_WAIT_MS has passed since the first
+one, whichever comes first. Queue depth, batch sizes and waits are on /metrics.
+
+    python junior_server.py --model ./outputs/checkpoint-246 --port 8000
+    LLM_API_URL=http://localhost:8000/v1/chat/completions python junior_accountant.py
+
+Besides plain chat messages, a request can carry the raw statement row as
+"transaction" ({date, payee, description, amount, currency, source_account});
+the server then builds the prompt with its own brain and also returns the
+confidence score, its mode (blended with logprobs, or retrieval only) and account under
+"junior".
+"""
+import os
+import json
+import time
+import argparse
+import threading
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ================= CONFIGURATION =================
+BACKEND = os.getenv("JUNIOR_SERVER_BACKEND", "unsloth")  # or "transformers" (any device, no 4-bit)
+
+# Unsloth must be imported BEFORE transformers (which brain imports)
+if BACKEND == "unsloth":
+    try:
+        from unsloth import FastLanguageModel
+    except ImportError:
+        pass
+
+import telemetry
+import junior_accountant
+from junior_accountant import (CONSTRAINED_DECODING, MAX_NEW_TOKENS, MODEL_NAME, UNSLOTH_MODEL_PATH, JuniorAccountant,
+                               PromptBudgetError, format_for_unsloth, score_prediction, token_texts)
+
+SERVER_HOST = os.getenv("JUNIOR_SERVER_HOST", "127.0.0.1")
+SERVER_PORT = int(os.getenv("JUNIOR_SERVER_PORT", "8000"))
+MAX_BATCH_SIZE = int(os.getenv("JUNIOR_SERVER_MAX_BATCH", "8"))
+MAX_WAIT_MS = float(os.getenv("JUNIOR_SERVER_MAX_WAIT_MS", "20"))
+MAX_QUEUE = int(os.getenv("JUNIOR_SERVER_MAX_QUEUE", "256"))  # Requests beyond this get a 503
+METRIC_SAMPLES = 2000  # Recent waits/batch times kept for the percentiles
+
+
+class QueueFull(Exception):
+    pass
+
+
+class Job:
+    """One request waiting for its batch."""
+
+    def __init__(self, prompt, max_tokens, temperature, logprobs, grammar=None):
+        self.prompt = prompt
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self.logprobs = logprobs
+        self.grammar = grammar
+        self.arrived = time.perf_counter()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+    @property
+    def key(self):
+        # Only requests with the same sampling settings can share a generate() call; logprobs
+        # are kept apart so one request asking for them doesn't make a whole batch keep scores
+        return (self.temperature, self.max_tokens, self.logprobs)
+
+
+def percentile(samples, q):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class MicroBatcher:
+    """
+    Collects submitted jobs into batches for run_batch(jobs) -> [result, ...] on a single
+    worker thread (the GPU runs one batch at a time). submit() blocks until its result is in.
+    """
+
+    def __init__(self, run_batch, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS, max_queue=MAX_QUEUE):
+        self.run_batch = run_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_queue = max_queue
+        self._pending = deque()
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._worker = None
+        self.reset_stats()
+
+    def start(self):
+        self._worker = threading.Thread(target=self._loop, name="micro-batcher", daemon=True)
+        self._worker.start()
+        return self
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            abandoned, self._pending = list(self._pending), deque()
+            self._cond.notify_all()
+        for job in abandoned:
+            job.error = RuntimeError("Server shutting down")
+            job.done.set()
+        if self._worker:
+            self._worker.join(timeout=5)
+
+    def submit(self, job):
+        with self._cond:
+            if len(self._pending) >= self.max_queue:
+                self.stats["rejected"] += 1
+                raise QueueFull(f"{len(self._pending)} requests already queued")
+            self._pending.append(job)
+            self.stats["max_queue_depth"] = max(self.stats["max_queue_depth"], len(self._pending))
+            self._cond.notify_all()
+        job.done.wait()
+        if job.error is not None:
+            raise job.error
+        return job.result
+
+    def _take_batch(self):
+        """Waits for the oldest job, then for company until the batch is full or its deadline passes."""
+        with self._cond:
+            while not self._pending and not self._stopped:
+                self._cond.wait()
+            if self._stopped:
+                return []
+            first = self._pending[0]
+            deadline = first.arrived + self.max_wait
+            while True:
+                batch = [job for job in self._pending if job.key == first.key][:self.max_batch_size]
+                remaining = deadline - time.perf_counter()
+                if len(batch) >= self.max_batch_size or remaining <= 0 or self._stopped:
+                    break
+                self._cond.wait(remaining)
+            for job in batch:
+                self._pending.remove(job)
+            return batch
+
+    def _loop(self):
+        while True:
+            batch = self._take_batch()
+            if not batch:
+                return
+            started = time.perf_counter()
+            try:
+                with telemetry.span("server_batch", batch_size=len(batch)):
+                    results = self.run_batch(batch)
+                for job, result in zip(batch, results):
+                    job.result = result
+            except Exception as e:
+                print(f"⚠️ Batch of {len(batch)} failed: {e}")
+                telemetry.incr("server_batch_errors")
+                for job in batch:
+                    job.error = e
+            finished = time.perf_counter()
+
+            with self._cond:
+                self.stats["batches"] += 1
+                self.stats["requests"] += len(batch)
+                self.stats["errors"] += sum(job.error is not None for job in batch)
+                self.stats["batch_sizes"][len(batch)] += 1
+                self.stats["busy_s"] += finished - started
+                self.stats["completion_tokens"] += sum(job.result["completion_tokens"] for job in batch if job.result)
+                self.stats["batch_s"].append(finished - started)
+                self.stats["queue_wait_s"].extend(started - job.arrived for job in batch)
+            for job in batch:
+                job.done.set()
+
+    def reset_stats(self):
+        with self._cond:
+            self.stats = {"requests": 0, "batches": 0, "errors": 0, "rejected": 0, "max_queue_depth": 0,
+                          "batch_sizes": Counter(), "busy_s": 0.0, "completion_tokens": 0,
+                          "batch_s": deque(maxlen=METRIC_SAMPLES), "queue_wait_s": deque(maxlen=METRIC_SAMPLES)}
+
+    def snapshot(self):
+        with self._cond:
+            s = self.stats
+            waits, batch_s = list(s["queue_wait_s"]), list(s["batch_s"])
+            return {
+                "queue_depth": len(self._pending),
+                "max_queue_depth": s["max_queue_depth"],
+                "requests": s["requests"],
+                "batches": s["batches"],
+                "errors": s["errors"],
+                "rejected": s["rejected"],
+                "mean_batch_size": round(s["requests"] / s["batches"], 3) if s["batches"] else None,
+                "batch_sizes": {str(k): v for k, v in sorted(s["batch_sizes"].items())},
+                "queue_wait_p50_s": percentile(waits, 0.5),
+                "queue_wait_p95_s": percentile(waits, 0.95),
+                "batch_p50_s": percentile(batch_s, 0.5),
+                "completion_tokens": s["completion_tokens"],
+                "tokens_per_busy_s": round(s["completion_tokens"] / s["busy_s"], 1) if s["busy_s"] else None,
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000.0,
+            }
+
+
+def batch_generator(model, tokenizer, formatter=format_for_unsloth):
+    """
+    run_batch for the MicroBatcher: one left-padded generate() for the whole batch.
+    Each result has text, token counts and finish_reason; jobs that asked for logprobs also
+    get the generated token ids and their logprobs, turned into (token, logprob) pairs by
+    token_logprobs() on the requester's thread. formatter turns a job's prompt into the
+    model's input text.
+    """
+    import torch
+    from transformers import LogitsProcessorList
+    from constrained_decoding import EntryGrammarProcessor
+
+    # Processors (multimodal models) wrap the text tokenizer
+    text_tokenizer = getattr(tokenizer, "tokenizer", tokenizer)
+    text_tokenizer.padding_side = "left"  # new tokens must line up at the end of every row
+    if text_tokenizer.pad_token_id is None:
+        text_tokenizer.pad_token = text_tokenizer.eos_token
+    eos_id = text_tokenizer.eos_token_id
+
+    def run_batch(jobs):
+        with telemetry.span("tokenize"):
+            inputs = text_tokenizer([formatter(job.prompt) for job in jobs], return_tensors="pt",
+                                    padding=True, add_special_tokens=True).to(model.device)
+        prompt_length = inputs["input_ids"].shape[-1]
+        want_logprobs = any(job.logprobs for job in jobs)
+        grammars = [job.grammar for job in jobs]
+        logits_processor = None
+        if any(g is not None for g in grammars):
+            logits_processor = LogitsProcessorList([EntryGrammarProcessor(grammars, text_tokenizer, prompt_length)])
+
+        temperature = jobs[0].temperature
+        sampling = temperature > 0
+        with telemetry.span("generate", batch_size=len(jobs)), torch.no_grad():
+            generated = model.generate(
+                **inputs,
+                max_new_tokens=jobs[0].max_tokens,
+                do_sample=sampling,
+                temperature=temperature if sampling else None,
+                pad_token_id=text_tokenizer.pad_token_id,
+                output_scores=want_logprobs,
+                return_dict_in_generate=True,
+                logits_processor=logits_processor,
+            )
+        scores = None
+        if want_logprobs:
+            scores = model.compute_transition_scores(generated.sequences, generated.scores, normalize_logits=True)
+
+        results = []
+        for row, job in enumerate(jobs):
+            new_ids = generated.sequences[row, prompt_length:].tolist()
+            finish_reason = "length"
+            if eos_id in new_ids:
+                new_ids = new_ids[:new_ids.index(eos_id)]
+                finish_reason = "stop"
+            text = text_tokenizer.decode(new_ids, skip_special_tokens=True).strip()
+
+            result = {"text": text, "finish_reason": finish_reason,
+                      "prompt_tokens": int(inputs["attention_mask"][row].sum()), "completion_tokens": len(new_ids)}
+            if job.logprobs:
+                # Per-token text is left to the requester's thread (see token_logprobs)
+                result.update(token_ids=new_ids, logprobs=scores[row, :len(new_ids)].tolist(), tokenizer=text_tokenizer)
+            results.append(result)
+        return results
+
+    return run_batch
+
+
+def token_logprobs(result):
+    """[(token text, logprob), ...] for a batch_generator result that asked for logprobs, else None."""
+    if result.get("logprobs") is None:
+        return None
+    return list(zip(token_texts(result["tokenizer"], result["token_ids"]), result["logprobs"]))
+
+
+class JuniorServer:
+    """Threaded HTTP front end. Use start()/stop() in-process, or run this module directly."""
+
+    def __init__(self, batcher, agent=None, host=SERVER_HOST, port=SERVER_PORT, model_name=MODEL_NAME):
+        self.batcher = batcher
+        self.agent = agent
+        self.model_name = model_name
+        self._agent_lock = threading.Lock()  # retrieval and prompt budgeting aren't thread-safe
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                path = self.path.rstrip("/")
+                if path == "/v1/models":
+                    self._send(200, {"object": "list", "data": [{"id": server.model_name, "object": "model"}]})
+                elif path == "/metrics":
+                    self._send(200, server.batcher.snapshot())
+                elif path == "/health":
+                    self._send(200, {"status": "ok", "queue_depth": server.batcher.snapshot()["queue_depth"]})
+                else:
+                    self._send(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+            def do_POST(self):
+                if self.path.rstrip("/") != "/v1/chat/completions":
+                    self._send(404, {"error": {"message": f"Unknown path {self.path}"}})
+                    return
+                try:
+                    length = int(self.headers.get("Content-Length", 0))
+                    payload = json.loads(self.rfile.read(length) or b"{}")
+                except ValueError as e:
+                    self._send(400, {"error": {"message": f"Invalid JSON: {e}", "type": "invalid_request_error"}})
+                    return
+                status, body = server.complete(payload)
+                self._send(status, body)
+
+            def _send(self, status, body):
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1/chat/completions"
+
+    def start(self):
+        self.batcher.start()
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.batcher.stop()
+
+    def serve_forever(self):
+        self.batcher.start()
+        try:
+            self.httpd.serve_forever()
+        finally:
+            self.batcher.stop()
+
+    def prepare(self, payload):
+        """Prompt, retrieved matches and source account for a request (built here when it sends a transaction)."""
+        txn = payload.get("transaction")
+        if txn:
+            if self.agent is None:
+                raise ValueError("This server has no brain loaded; send chat messages instead of a transaction")
+            source = txn.get("source_account", "Unknown")
+            with self._agent_lock:
+                prompt, matches = self.agent.build_prompt(txn.get("date"), txn.get("payee", "Unknown"),
+                                                          txn.get("description", ""), txn.get("amount"),
+                                                          txn.get("currency"), source)
+            return prompt, matches, source
+
+        users = [m.get("content", "") for m in payload.get("messages", []) if m.get("role") == "user"]
+        if not users:
+            raise ValueError("No user message in request")
+        return users[-1], None, None
+
+    def complete(self, payload):
+        try:
+            prompt, matches, source = self.prepare(payload)
+        except PromptBudgetError as e:
+            return 400, {"error": {"message": str(e), "type": "context_length_exceeded"}}
+        except ValueError as e:
+            return 400, {"error": {"message": str(e), "type": "invalid_request_error"}}
+
+        grammar = None
+        if CONSTRAINED_DECODING and self.agent is not None:
+            with self._agent_lock:
+                grammar = self.agent.grammar_for(prompt)
+        job = Job(prompt, int(payload.get("max_tokens") or MAX_NEW_TOKENS), float(payload.get("temperature", 0.1)),
+                  bool(payload.get("logprobs")), grammar)
+        try:
+            result = self.batcher.submit(job)
+        except QueueFull as e:
+            return 503, {"error": {"message": f"Server busy: {e}", "type": "server_error"}}
+        except Exception as e:
+            return 500, {"error": {"message": str(e), "type": "server_error"}}
+
+        logprobs = token_logprobs(result) if job.logprobs else None
+        choice = {"index": 0, "message": {"role": "assistant", "content": result["text"]},
+                  "finish_reason": result["finish_reason"]}
+        if logprobs is not None:
+            choice["logprobs"] = {"content": [{"token": token, "logprob": logprob,
+                                               "bytes": list(token.encode("utf-8")), "top_logprobs": []}
+                                              for token, logprob in logprobs]}
+        body = {
+            "id": f"chatcmpl-junior-{int(job.arrived * 1e6)}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": self.model_name,
+            "choices": [choice],
+            "usage": {"prompt_tokens": result["prompt_tokens"], "completion_tokens": result["completion_tokens"],
+                      "total_tokens": result["prompt_tokens"] + result["completion_tokens"]},
+        }
+        if matches is not None:
+            confidence, account, score_mode = score_prediction(result["text"], logprobs, matches, source)
+            body["junior"] = {"prompt": prompt, "confidence": round(confidence, 4), "account": account,
+                              "score_mode": score_mode}
+        return 200, body
+
+
+def load_model(model_path, backend=BACKEND, device=None):
+    """The fine-tuned model once: through init_unsloth(), or plain transformers for CPU/other GPUs."""
+    if backend == "unsloth":
+        junior_accountant.UNSLOTH_MODEL_PATH = model_path
+        junior_accountant.init_unsloth()
+        return junior_accountant._model, junior_accountant._tokenizer
+
+    from transformers import AutoModelForCausalLM, AutoTokenizer
+    print(f"🔄 Loading model from {model_path}...")
+    tokenizer = AutoTokenizer.from_pretrained(model_path)
+    model = AutoModelForCausalLM.from_pretrained(model_path)
+    if device:
+        model = model.to(device)
+    model.eval()
+    # Let the token budget count with this tokenizer instead of downloading another one
+    junior_accountant._tokenizer = tokenizer
+    print("✅ Model loaded!")
+    return model, tokenizer
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve the fine-tuned junior model with micro-batching')
+    parser.add_argument('--model', default=UNSLOTH_MODEL_PATH)
+    parser.add_argument('--backend', choices=['unsloth', 'transformers'], default=BACKEND)
+    parser.add_argument('--device', default=None, help='transformers backend only, e.g. cpu or cuda')
+    parser.add_argument('--ledger', default="data/my_accounts.beancount",
+                        help='Ledger for the brain (requests with a "transaction")')
+    parser.add_argument('--no-brain', action='store_true', help='Only serve plain chat requests')
+    parser.add_argument('--host', default=SERVER_HOST)
+    parser.add_argument('--port', type=int, default=SERVER_PORT)
+    parser.add_argument('--max-batch-size', type=int, default=MAX_BATCH_SIZE)
+    parser.add_argument('--max-wait-ms', type=float, default=MAX_WAIT_MS)
+    parser.add_argument('--max-queue', type=int, default=MAX_QUEUE)
+    args = parser.parse_args()
+
+    model, tokenizer = load_model(args.model, args.backend, args.device)
+    junior_accountant.PROMPT_FORMAT = "unsloth"  # The budget counts what batch_generator feeds the model
+    agent = None if args.no_brain else JuniorAccountant(args.ledger)
+    batcher = MicroBatcher(batch_generator(model, tokenizer), args.max_batch_size, args.max_wait_ms, args.max_queue)
+    server = JuniorServer(batcher, agent, args.host, args.port)
+
+    print(f"🚀 Junior server on {server.url} (batches of up to {args.max_batch_size}, max wait {args.max_wait_ms:g} ms)")
+    print(f"📊 Metrics: http://{args.host}:{args.port}/metrics")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Shutting down")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+Ledger -> SFT pairs without any LLM calls.
+
+Every categorised bank transaction in the ledger is already a gold answer, so this
+turns them straight into {prompt, response} training pairs:
+
+  prompt    exactly what JuniorAccountant.construct_prompt builds for the row as
+            bean_to_csv would export it (same normalisation, same brain retrieval,
+            same token budget), except the transaction itself is left out of its
+            own <context> (leave-one-out), the way the model sees a new row
+  response  a templated <accounting_entry> with a short plan/reasoning and the
+            ledger's own postings
+
+Only two-posting transactions with a bank (Assets:) or card (Liabilities:) side are
+used, the shape the prompt asks for; splits like payslips are skipped. The brain embeds
+every row once in this process; retrieval, prompt rendering/budgeting and the
+response template run in --workers forked processes.
+
+    python ledger_to_sft.py --ledger my_accounts.beancount --out data/json/ledger_sft.json --workers 8
+"""
+import argparse
+import hashlib
+import os
+import time
+from functools import partial
+from multiprocessing import get_context
+
+import pandas as pd
+
+import artefact_io
+from brain import ContextCompiler
+from accounting_entry import is_balanced, parse_entry
+from junior_accountant import (CONTEXT_K, PROMPT_TOKEN_BUDGET, PromptBudgetError, assemble_prompt,
+                               get_token_counter, prepare_rows)
+
+# ================= CONFIGURATION =================
+DEFAULT_LEDGER = "my_accounts.beancount"
+DEFAULT_OUTPUT = "data/json/ledger_sft.json"
+MIN_SCORE = 0.3  # Same cut-off as ContextCompiler.retrieve_matches
+
+# Set in the parent before the pool forks, so workers share them copy-on-write
+_brain = None
+_queries = None
+_rows = None
+_prepared = None
+
+
+def source_posting(entry):
+    """The statement side of a transaction: its one bank (Assets:) posting, else its one card (Liabilities:) posting."""
+    for prefix in ("Assets:", "Liabilities:"):
+        postings = [p for p in entry.postings if p.account.startswith(prefix)]
+        if len(postings) == 1:
+            return postings[0]
+        if postings:
+            return None
+    return None
+
+
+def ledger_rows(brain):
+    """
+    (history index, transaction, source posting, target posting) for each usable history row.
+    History rows keep their ContextCompiler index so they can be left out of their own context.
+    """
+    rows, skipped = [], 0
+    for i, item in enumerate(brain.history):
+        entry = item['full_entry']
+        source = source_posting(entry) if len(entry.postings) == 2 else None
+        if source is None or source.units is None:
+            skipped += 1
+            continue
+        target = next(p for p in entry.postings if p is not source)
+        rows.append((i, entry, source, target))
+    return rows, skipped
+
+
+def statement_frame(rows):
+    """The rows as bean_to_csv would export them (plus Source_Account), read back like a statement CSV."""
+    records = []
+    for _, entry, source, _ in rows:
+        payee, narration = entry.payee or "", entry.narration or ""
+        amount = source.units.number
+        unique_string = f"{entry.date}{payee}{narration}{amount}{source.account}"
+        records.append({
+            'Date': str(entry.date),
+            'Payee': payee or None,
+            'Description': narration or None,
+            'Amount': float(amount),
+            'Currency': source.units.currency,
+            'Beancount_Id': hashlib.md5(unique_string.encode('utf-8')).hexdigest()[:10],
+            'Source_Account': source.account,
+        })
+    return prepare_rows(pd.DataFrame(records))
+
+
+def leave_one_out_matches(history_index, query_embedding, k):
+    """retrieve_matches for a history row, as if the row itself weren't in the ledger."""
+    own_item = _brain.item_of[history_index]
+    indices, scores = _brain.index.search(query_embedding, k + 1)
+    matches = []
+    for idx, score in zip(indices, scores):
+        if score <= MIN_SCORE:
+            continue
+        # The row's own description stays in only if other transactions share it (minus this one)
+        item = _brain.leave_out(idx, history_index) if idx == own_item else _brain.items[idx]
+        if item is not None:
+            matches.append({**item, 'score': float(score)})
+    return matches[:k]
+
+
+def render_response(entry, source, target, matches):
+    """Templated <accounting_entry> for a ledger transaction, in the junior's output structure."""
+    payee = entry.payee or "Unknown"
+    nature = entry.narration or payee
+    amount, currency = source.units.number, source.units.currency
+    if amount < 0:
+        double_entry = f"Credit {source.account}, Debit {target.account}"
+    else:
+        double_entry = f"Debit {source.account}, Credit {target.account}"
+    if any(m['account'] == target.account for m in matches):
+        evidence = f"History confirms '{target.account}'."
+    else:
+        evidence = f"No history for this payee; '{target.account}' fits the description."
+    header = " ".join(f'"{text}"' for text in (entry.payee, entry.narration or "") if text is not None)
+    return f"""<accounting_entry>
+    <thought_process>
+        <plan>
+            1. Nature: {nature}.
+            2. Double Entry: {double_entry}.
+        </plan>
+        <reasoning>
+            <step1>Payee is {payee}. {evidence}</step1>
+            <step2>Math: {amount} {currency} to {source.account}, {-amount} {currency} to {target.account}.</step2>
+        </reasoning>
+    </thought_process>
+    <entry>
+        {entry.date} {entry.flag} {header}
+        {target.account}     {target.units.number} {target.units.currency}
+        {source.account}     {amount} {currency}
+    </entry>
+</accounting_entry>"""
+
+
+def build_pair(position, k=CONTEXT_K):
+    """Worker: one ledger row -> {prompt, response}, or the reason it was dropped."""
+    history_index, entry, source, target = _rows[position]
+    _, date, payee, desc, amount, currency, source_account = _prepared[position]
+    matches = leave_one_out_matches(history_index, _queries[position], k)
+    try:
+        prompt = assemble_prompt(_brain.format_context, matches, date, payee, desc, amount, currency, source_account)[0]
+    except PromptBudgetError:
+        return "over_budget"
+    response = render_response(entry, source, target, matches)
+    if not is_balanced(parse_entry(response)):
+        return "unbalanced"
+    return {"prompt": prompt, "response": response}
+
+
+def main():
+    global _brain, _queries, _rows, _prepared
+    parser = argparse.ArgumentParser(description='Generate SFT pairs straight from the ledger (no LLM calls)')
+    parser.add_argument('--ledger', default=DEFAULT_LEDGER)
+    parser.add_argument('--out', default=DEFAULT_OUTPUT)
+    parser.add_argument('--k', type=int, default=CONTEXT_K, help='History examples per prompt (before budgeting)')
+    parser.add_argument('--limit', type=int, default=None, help='Only the first N usable transactions')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Processes rendering prompts')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    _brain = ContextCompiler(args.ledger)
+    _rows, skipped = ledger_rows(_brain)
+    _rows = _rows[:args.limit] if args.limit else _rows
+    if not _rows:
+        print("❌ No usable transactions in the ledger")
+        return
+    _prepared = list(statement_frame(_rows).itertuples(index=False, name=None))
+
+    # Same query text as retrieve_matches, embedded in one batch instead of per row
+    print(f"🔎 Embedding {len(_prepared)} queries...")
+    _queries = _brain.model.encode([f"{row[2]} {row[3]}".strip() for row in _prepared])
+    if PROMPT_TOKEN_BUDGET:
+        get_token_counter()  # Load the tokenizer once, before the fork
+
+    print(f"⚙️ Rendering with {args.workers} workers...")
+    # fork: workers inherit the brain, rows and query embeddings, so only positions are sent
+    with get_context("fork").Pool(args.workers) as pool:
+        results = pool.map(partial(build_pair, k=args.k), range(len(_rows)),
+                           chunksize=max(1, len(_rows) // (args.workers * 4)))
+
+    pairs = [r for r in results if isinstance(r, dict)]
+    reasons = [r for r in results if isinstance(r, str)]
+    dropped = {reason: reasons.count(reason) for reason in set(reasons)}
+    artefact_io.save(pairs, args.out)
+
+    elapsed = time.perf_counter() - started
+    print(f"⏭️ Skipped {skipped} splits/transfers" + (f", dropped {dropped}" if dropped else ""))
+    print(f"✅ Wrote {len(pairs)} pairs to {args.out} in {elapsed:.1f}s ({len(pairs) / elapsed:.0f} pairs/s)")
+
+
+if __name__ == "__main__":
+    main()
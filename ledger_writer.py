@@ -0,0 +1,239 @@
+"""
+Incremental ledger writer: appends approved <entry> blocks to a Beancount file in batches
+and validates only the new transactions, instead of re-running loader.load_file over the
+whole ledger after every append.
+
+The ledger is loaded once when the writer starts; after that each batch is checked against
+cached state and kept up to date as entries are written:
+
+  parse      the <entry> is one Beancount transaction (one posting may omit its amount)
+  balance    postings sum to zero per currency
+  accounts   every account is open on the entry's date, not closed, and allows the currency
+  assertions the entry doesn't land before an existing balance assertion on one of its
+             accounts (that assertion would stop holding)
+
+Entries that fail are reported with their errors and not written. Running balances of
+the touched accounts are kept too, so the new end balances can be reported without a reload.
+
+Written entries carry their task's transaction_id as metadata. Ids already in the ledger
+(or written earlier in the run) are rejected as "duplicate", so re-running an export, or
+the same task twice in one batch, doesn't book it again.
+
+    python ledger_writer.py --ledger my_accounts.beancount --input data/json/refined_data.json --report ledger_report.json
+"""
+import argparse
+import time
+from collections import defaultdict
+from decimal import Decimal
+
+from beancount import loader
+from beancount.core.amount import Amount
+from beancount.core.data import Balance, Close, Open, Transaction
+from beancount.core.number import MISSING
+from beancount.parser import parser, printer
+
+import artefact_io
+from accounting_entry import ACCOUNT_SPACE_RE, ENTRY_RE
+from task_store import load_tasks
+
+# ================= CONFIGURATION =================
+BATCH_SIZE = 100                 # Entries validated and appended per write
+TOLERANCE = Decimal("0.005")     # Largest residual treated as balanced
+
+
+def entry_source(text):
+    """The Beancount text inside <entry>...</entry>: header at column 0, postings indented, account spaces fixed."""
+    match = ENTRY_RE.search(text or "")
+    if not match:
+        return None
+    lines = [ACCOUNT_SPACE_RE.sub(r"\1:", line.strip()) for line in match.group(1).splitlines() if line.strip()]
+    if not lines:
+        return None
+    return "\n".join([lines[0]] + ["  " + line for line in lines[1:]]) + "\n"
+
+
+def approved_text(task):
+    """The reviewed output of a task: the senior/human annotation, else a training response (None if neither)."""
+    if task.get('annotations'):
+        try:
+            return task['annotations'][0]['result'][0]['value']['text'][0]
+        except (KeyError, IndexError, TypeError):
+            pass  # Annotated but with an empty/odd result, e.g. the reviewer cleared the text
+    return task.get('response')
+
+
+class LedgerWriter:
+    def __init__(self, ledger_file, batch_size=BATCH_SIZE):
+        self.ledger_file = ledger_file
+        self.batch_size = batch_size
+        self.opens = {}                  # account -> (open date, allowed currencies or None)
+        self.closes = {}                 # account -> close date
+        self.balances = defaultdict(lambda: defaultdict(Decimal))  # account -> currency -> running total
+        self.assertions = defaultdict(list)                        # account -> [(date, currency)]
+        self.last_assertion = {}         # (account, currency) -> latest balance assertion date
+        self.transaction_ids = set()     # transaction_id metadata already in the ledger
+        self.pending = []                # (source id, entry text)
+        self.written = 0
+        self.touched = set()
+
+        print(f"📒 Ledger Writer: loading {ledger_file} once...")
+        started = time.perf_counter()
+        entries, errors, _ = loader.load_file(ledger_file)
+        for entry in entries:
+            self._remember(entry)
+        self.load_errors = len(errors)
+        print(f"📒 Cached {len(self.opens)} accounts, {sum(map(len, self.assertions.values()))} balance assertions "
+              f"in {time.perf_counter() - started:.1f}s ({self.load_errors} existing errors)")
+
+    def _remember(self, entry):
+        if isinstance(entry, Open):
+            self.opens[entry.account] = (entry.date, set(entry.currencies) if entry.currencies else None)
+        elif isinstance(entry, Close):
+            self.closes[entry.account] = entry.date
+        elif isinstance(entry, Balance):
+            self.assertions[entry.account].append((entry.date, entry.amount.currency))
+            key = (entry.account, entry.amount.currency)
+            self.last_assertion[key] = max(entry.date, self.last_assertion.get(key, entry.date))
+        elif isinstance(entry, Transaction):
+            if entry.meta and entry.meta.get("transaction_id") is not None:
+                self.transaction_ids.add(str(entry.meta["transaction_id"]))
+            for posting in entry.postings:
+                if posting.units is not None and posting.units is not MISSING:
+                    self.balances[posting.account][posting.units.currency] += posting.units.number
+
+    def parse(self, source):
+        """(transaction with every amount filled in, []) or (None, [errors])."""
+        entries, errors, _ = parser.parse_string(source)
+        if errors:
+            return None, [f"parse: {e.message}" for e in errors]
+        transactions = [e for e in entries if isinstance(e, Transaction)]
+        if len(transactions) != 1 or len(entries) != 1:
+            return None, [f"parse: expected one transaction, got {len(entries)} entries"]
+        txn = transactions[0]
+
+        missing = [i for i, p in enumerate(txn.postings) if p.units is MISSING or p.units.number is MISSING]
+        residual = defaultdict(Decimal)
+        for i, posting in enumerate(txn.postings):
+            if i not in missing:
+                residual[posting.units.currency] += posting.units.number
+        if len(missing) > 1:
+            return None, ["balance: more than one posting without an amount"]
+        if missing:
+            if len(residual) != 1:
+                return None, ["balance: can't infer the missing amount across several currencies"]
+            (currency, total), = residual.items()
+            postings = list(txn.postings)
+            postings[missing[0]] = postings[missing[0]]._replace(units=Amount(-total, currency))
+            txn = txn._replace(postings=postings)
+        return txn, []
+
+    def validate(self, txn):
+        """Errors for a parsed transaction against the cached ledger state (empty = OK)."""
+        errors = []
+        totals = defaultdict(Decimal)
+        for posting in txn.postings:
+            totals[posting.units.currency] += posting.units.number
+        for currency, total in totals.items():
+            if abs(total) > TOLERANCE:
+                errors.append(f"balance: postings sum to {total} {currency}")
+
+        for posting in txn.postings:
+            account, currency = posting.account, posting.units.currency
+            if account not in self.opens:
+                errors.append(f"accounts: {account} is not opened in the ledger")
+                continue
+            opened, currencies = self.opens[account]
+            if txn.date < opened:
+                errors.append(f"accounts: {account} is only open from {opened}")
+            if account in self.closes and txn.date >= self.closes[account]:
+                errors.append(f"accounts: {account} was closed on {self.closes[account]}")
+            if currencies is not None and currency not in currencies:
+                errors.append(f"accounts: {account} doesn't allow {currency}")
+            # A balance assertion on a parent account covers its sub-accounts too
+            parts = account.split(":")
+            for asserted in (":".join(parts[:n]) for n in range(len(parts), 0, -1)):
+                last = self.last_assertion.get((asserted, currency))
+                if last is not None and last > txn.date and posting.units.number:
+                    first = min(d for d, c in self.assertions[asserted] if c == currency and d > txn.date)
+                    errors.append(f"assertions: would break the {first} balance assertion on {asserted}")
+        return errors
+
+    def add(self, text, source_id=None):
+        """
+        Queues an approved output (anything containing <entry>); writes a batch once it's full.
+        source_id becomes the entry's transaction_id; None skips the duplicate check.
+        """
+        self.pending.append((source_id, text))
+        return self.flush() if len(self.pending) >= self.batch_size else []
+
+    def flush(self):
+        """Validates the queued entries in order and appends the good ones in one write. Returns per-entry reports."""
+        reports, blocks = [], []
+        for source_id, text in self.pending:
+            source = entry_source(text)
+            if source_id is not None and str(source_id) in self.transaction_ids:
+                txn, errors = None, [f"duplicate: transaction_id {source_id} is already in the ledger"]
+            elif text is None:
+                txn, errors = None, ["parse: no approved output"]
+            else:
+                txn, errors = self.parse(source) if source else (None, ["parse: no <entry> block"])
+            if txn is not None:
+                errors = self.validate(txn)
+            if not errors:
+                if source_id is not None:
+                    txn = txn._replace(meta={**txn.meta, "transaction_id": str(source_id)})
+                blocks.append(printer.format_entry(txn))
+                self._remember(txn)  # Later entries in the batch see this one's balances
+                self.touched.update(p.account for p in txn.postings)
+            reports.append({"id": source_id, "ok": not errors, "date": str(txn.date) if txn else None,
+                            "errors": errors})
+        self.pending = []
+
+        if blocks:
+            with open(self.ledger_file, 'a') as f:
+                f.write("\n" + "\n".join(blocks))
+            self.written += len(blocks)
+        return reports
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Append approved entries to a ledger with incremental validation')
+    parser.add_argument('--ledger', default="my_accounts.beancount")
+    parser.add_argument('--input', required=True, help='Reviewed tasks (Label Studio export, refined or training pairs)')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--report', default=None, help='Optional per-entry report (JSON/JSONL via artefact_io)')
+    parser.add_argument('--verify', action='store_true', help='Reload the full ledger at the end and compare errors')
+    args = parser.parse_args()
+
+    writer = LedgerWriter(args.ledger, args.batch_size)
+    tasks = load_tasks(args.input)
+    started = time.perf_counter()
+    reports = []
+    for task in tasks:
+        data = task.get('data', task)
+        reports += writer.add(approved_text(task), data.get('transaction_id'))
+    reports += writer.flush()
+    elapsed = time.perf_counter() - started
+
+    rejected = [r for r in reports if not r['ok']]
+    print(f"✅ Appended {writer.written} of {len(reports)} entries in {elapsed:.2f}s")
+    if rejected:
+        reasons = defaultdict(int)
+        for r in rejected:
+            for error in r['errors']:
+                reasons[error.split(":")[0]] += 1
+        print(f"❌ Rejected {len(rejected)}: " + ", ".join(f"{n} {kind}" for kind, n in sorted(reasons.items())))
+        for r in rejected[:5]:
+            print(f"   {r['id']}: {'; '.join(r['errors'])}")
+    for account in sorted(writer.touched):
+        totals = ", ".join(f"{total} {currency}" for currency, total in writer.balances[account].items())
+        print(f"   {account}: {totals}")
+    if args.report:
+        artefact_io.save(reports, args.report)
+    if args.verify:
+        _, errors, _ = loader.load_file(args.ledger)
+        print(f"🔍 Full reload: {len(errors)} errors (was {writer.load_errors})")
+
+
+if __name__ == "__main__":
+    main()
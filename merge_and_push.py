@@ -1,70 +1,292 @@
 """
-Merge LoRA adapter with base model and push to Hugging Face Hub.
-Uses latest transformers with float16 loading (no bitsandbytes) to avoid version conflicts.
+Merge LoRA adapter with base model and (optionally) push to Hugging Face Hub.
+
+Two merge modes:
+  --mode full       Loads the base model in float16 (no bitsandbytes, to avoid version conflicts),
+                    applies the adapter with PEFT and calls merge_and_unload(). Needs the whole
+                    model resident (~6GB).
+  --mode streaming  Walks the base checkpoint's safetensors shards one at a time (memory-mapped),
+                    adds scale * B @ A to every weight the adapter targets and writes the merged
+                    shard. Peak memory stays near one shard; no GPU or PEFT model needed.
+
+    python merge_and_push.py --checkpoint outputs/checkpoint-180 --mode streaming
+    python merge_and_push.py --checkpoint outputs/checkpoint-180 --mode streaming --push
 """
 import os
-import torch
-from huggingface_hub import login
-from peft import PeftModel, PeftConfig
+import re
+import json
+import math
+import shutil
+import argparse
+import resource
 
 # Configuration
 CHECKPOINT_PATH = "outputs/checkpoint-180"
 REPO_NAME = "david-barnes/ministral-3B-Beancount-v1"
+OUTPUT_PATH = "merged_model"
+
+# Files copied from the base checkpoint next to the merged shards (config, tokenizer, chat template)
+SIDECAR_EXTENSIONS = (".json", ".model", ".txt", ".jinja", ".tiktoken")
+ADAPTER_PREFIX = "base_model.model."
+
+
+def hub_login():
+    from huggingface_hub import login
+    hf_token = os.getenv('HF_TOKEN')
+    if hf_token:
+        login(token=hf_token)
+        print("✅ Logged in with HF_TOKEN")
+    else:
+        raise ValueError("❌ No HF_TOKEN found! Set it with: export HF_TOKEN=your_token")
+    return hf_token
+
+
+def peak_memory_mb():
+    """Peak resident memory of this process so far, in MB."""
+    # VmHWM starts fresh at exec; ru_maxrss can carry over the parent's peak
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KiB on Linux
+
+
+# ================= FULL MERGE (PEFT) =================
+def merge_full(checkpoint_path, output_path, base_model_name=None):
+    import torch
+    from peft import PeftModel, PeftConfig
+    # For Mistral3 models, we need to use AutoModel since it's a conditional generation model
+    from transformers import AutoModel, AutoTokenizer
+
+    # Step 1: Load the adapter config to find the base model
+    print("📂 Loading adapter config...")
+    peft_config = PeftConfig.from_pretrained(checkpoint_path)
+    base_model_name = base_model_name or peft_config.base_model_name_or_path
+    print(f"   Base model: {base_model_name}")
+
+    # Step 2: Load the base model in float16 (no 4-bit quantization to avoid bitsandbytes)
+    print("🔧 Loading base model in float16 (this may take ~6GB VRAM)...")
+    model = AutoModel.from_pretrained(
+        base_model_name,
+        torch_dtype=torch.float16,
+        device_map="auto",
+        trust_remote_code=True,
+    )
+
+    # Step 3: Load tokenizer
+    print("📝 Loading tokenizer...")
+    tokenizer = AutoTokenizer.from_pretrained(base_model_name, trust_remote_code=True)
+
+    # Step 4: Apply the adapter
+    print("🔗 Applying LoRA adapter...")
+    model = PeftModel.from_pretrained(model, checkpoint_path)
+
+    # Step 5: Merge adapter weights into the base model
+    print("🔀 Merging adapter into base model...")
+    model = model.merge_and_unload()
+
+    # Step 6: Save locally first (for GGUF conversion)
+    print(f"💾 Saving merged model locally to {output_path}...")
+    model.save_pretrained(output_path)
+    tokenizer.save_pretrained(output_path)
+
+
+# ================= STREAMING MERGE (SAFETENSORS) =================
+def resolve_base_dir(base_model_name):
+    """Local checkpoint directory for the base model (downloads only weights/config/tokenizer files)."""
+    if os.path.isdir(base_model_name):
+        return base_model_name
+    from huggingface_hub import snapshot_download
+    print(f"⬇️ Fetching {base_model_name} safetensors from the Hub (to disk, not memory)...")
+    return snapshot_download(base_model_name, allow_patterns=["*.safetensors"] + [f"*{ext}" for ext in SIDECAR_EXTENSIONS])
+
+
+def base_shards(base_dir):
+    """{tensor name: shard file name} from the safetensors index, or the single model.safetensors."""
+    index_file = os.path.join(base_dir, "model.safetensors.index.json")
+    if os.path.exists(index_file):
+        with open(index_file, 'r') as f:
+            return json.load(f)["weight_map"]
+    single = os.path.join(base_dir, "model.safetensors")
+    if not os.path.exists(single):
+        raise FileNotFoundError(f"No safetensors checkpoint in {base_dir} (streaming merge needs .safetensors)")
+    from safetensors import safe_open
+    with safe_open(single, framework="pt") as f:
+        return {key: "model.safetensors" for key in f.keys()}
+
+
+def pattern_value(patterns, module, default):
+    """PEFT's rank_pattern/alpha_pattern lookup: a key matches a module name ending in it."""
+    for key, value in (patterns or {}).items():
+        if re.match(rf"(.*\.)?({key})$", module):
+            return value
+    return default
+
+
+def match_base_key(name, base_keys):
+    """
+    Base tensor for an adapter tensor name. Tries the name as-is, then ever shorter
+    dotted suffixes, so adapters saved from a wrapper class (extra/missing "model."
+    prefixes) still line up. Ambiguous or missing matches are errors.
+    """
+    if name in base_keys:
+        return name
+    parts = name.split(".")
+    for i in range(1, len(parts) - 1):
+        suffix = "." + ".".join(parts[i:])
+        matches = [k for k in base_keys if k.endswith(suffix) or k == suffix[1:]]
+        if len(matches) == 1:
+            return matches[0]
+        if len(matches) > 1:
+            raise ValueError(f"Adapter weight {name} matches several base weights: {matches[:3]}...")
+    raise KeyError(f"Adapter weight {name} has no matching base weight")
+
+
+def plan_merge(checkpoint_path, base_keys):
+    """
+    Reads the adapter and returns {base tensor name: [op, ...]} where an op is
+    ("lora", A, B, scale, transpose) or ("replace", tensor) for modules_to_save weights.
+    """
+    from safetensors.torch import load_file
+
+    with open(os.path.join(checkpoint_path, "adapter_config.json"), 'r') as f:
+        config = json.load(f)
+    if config.get("use_dora"):
+        raise ValueError("DoRA adapters aren't supported by the streaming merge; use --mode full")
+    adapter = load_file(os.path.join(checkpoint_path, "adapter_model.safetensors"))  # small: only the LoRA weights
+
+    plan = {}
+    modules = {}
+    for key, tensor in adapter.items():
+        name = key[len(ADAPTER_PREFIX):] if key.startswith(ADAPTER_PREFIX) else key
+        # Embedding LoRA weights are bare parameters (no ".weight")
+        lora = re.match(r"(.+)\.(lora_A|lora_B|lora_embedding_A|lora_embedding_B)(?:\.default)?(?:\.(weight|bias))?$", name)
+        if lora:
+            modules.setdefault(lora.group(1), {})[f"{lora.group(2)}.{lora.group(3) or 'weight'}"] = tensor
+        elif "lora_" in name:
+            raise ValueError(f"Unsupported adapter weight {key}")
+        else:
+            # modules_to_save (e.g. lm_head / embed_tokens trained in full): replaces the base weight
+            name = name.replace(".modules_to_save.default", "")
+            plan.setdefault(match_base_key(name, base_keys), []).append(("replace", tensor))
+
+    for module, weights in modules.items():
+        embedding = "lora_embedding_A.weight" in weights
+        A = weights["lora_embedding_A.weight" if embedding else "lora_A.weight"]
+        B = weights["lora_embedding_B.weight" if embedding else "lora_B.weight"]
+        if A.dim() != 2:
+            raise ValueError(f"Only linear/embedding LoRA layers can be streamed ({module} is {A.dim()}D)")
+        rank = A.shape[0]
+        alpha = pattern_value(config.get("alpha_pattern"), module, config.get("lora_alpha", rank))
+        scale = alpha / math.sqrt(rank) if config.get("use_rslora") else alpha / rank
+        # Embeddings store (B @ A) transposed; fan_in_fan_out layers (GPT-2 Conv1D) store weights as (in, out)
+        transpose = embedding or config.get("fan_in_fan_out", False)
+        plan.setdefault(match_base_key(f"{module}.weight", base_keys), []).append(("lora", A, B, scale, transpose))
+        if "lora_B.bias" in weights:
+            plan.setdefault(match_base_key(f"{module}.bias", base_keys), []).append(("bias", weights["lora_B.bias"], scale))
+    return plan, config
+
+
+def apply_ops(tensor, ops):
+    """Merged tensor (same dtype as the base), computed in float32."""
+    merged = tensor.float()
+    for op in ops:
+        if op[0] == "replace":
+            merged = op[1].float()
+        elif op[0] == "bias":
+            merged += op[2] * op[1].float()
+        else:
+            _, A, B, scale, transpose = op
+            delta = (B.float() @ A.float()) * scale
+            merged += delta.T if transpose else delta
+    return merged.to(tensor.dtype)
+
+
+def merge_streaming(checkpoint_path, output_path, base_model_name=None):
+    from safetensors import safe_open
+    from safetensors.torch import save_file
+
+    with open(os.path.join(checkpoint_path, "adapter_config.json"), 'r') as f:
+        base_model_name = base_model_name or json.load(f)["base_model_name_or_path"]
+    print(f"   Base model: {base_model_name}")
+    base_dir = resolve_base_dir(base_model_name)
+
+    with open(os.path.join(base_dir, "config.json"), 'r') as f:
+        if "quantization_config" in json.load(f):
+            raise ValueError(f"{base_model_name} is a quantized checkpoint; merge into the full-precision base instead")
+
+    weight_map = base_shards(base_dir)
+    plan, _ = plan_merge(checkpoint_path, set(weight_map))
+    print(f"🔗 Adapter touches {len(plan)} base tensors across {len(set(weight_map.values()))} shards")
+
+    os.makedirs(output_path, exist_ok=True)
+    merged_count = 0
+    for shard in sorted(set(weight_map.values())):
+        merged = {}
+        with safe_open(os.path.join(base_dir, shard), framework="pt") as f:
+            metadata = f.metadata() or {}
+            for key in f.keys():
+                tensor = f.get_tensor(key)
+                if key in plan:
+                    tensor = apply_ops(tensor, plan[key])
+                    merged_count += 1
+                merged[key] = tensor
+        save_file(merged, os.path.join(output_path, shard), metadata={**metadata, "format": "pt"})
+        print(f"   🔀 {shard}: {len(merged)} tensors written (peak RSS {peak_memory_mb():,.0f} MB)")
+        del merged
+
+    if merged_count != len(plan):
+        raise RuntimeError(f"Only {merged_count} of {len(plan)} adapter targets were found in the shards")
+
+    for filename in os.listdir(base_dir):
+        if filename.endswith(SIDECAR_EXTENSIONS) and os.path.isfile(os.path.join(base_dir, filename)):
+            shutil.copy(os.path.join(base_dir, filename), os.path.join(output_path, filename))
+    print(f"💾 Merged model written to {output_path}")
+
+
+def push(output_path, repo_name):
+    from huggingface_hub import HfApi
+    hf_token = hub_login()
+    print(f"🚀 Pushing to {repo_name}...")
+    api = HfApi(token=hf_token)
+    api.create_repo(repo_name, exist_ok=True)
+    api.upload_folder(folder_path=output_path, repo_id=repo_name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Merge the LoRA adapter into its base model (and optionally push)')
+    parser.add_argument('--checkpoint', default=CHECKPOINT_PATH, help='Adapter checkpoint directory')
+    parser.add_argument('--base', default=None, help='Base model (hub id or local dir); default from adapter_config.json')
+    parser.add_argument('--output', default=OUTPUT_PATH)
+    parser.add_argument('--mode', choices=['full', 'streaming'], default='full')
+    parser.add_argument('--push', action='store_true', help='Upload the merged model to the Hub (needs HF_TOKEN)')
+    parser.add_argument('--repo', default=REPO_NAME)
+    args = parser.parse_args()
+
+    if args.push:
+        hub_login()  # Fail fast, before spending minutes merging
+
+    if args.mode == "streaming":
+        merge_streaming(args.checkpoint, args.output, args.base)
+    else:
+        merge_full(args.checkpoint, args.output, args.base)
+    print(f"📈 Peak memory: {peak_memory_mb():,.0f} MB")
+
+    if args.push:
+        push(args.output, args.repo)
+
+    print(f"""
+✅ Done!
+   - Local merged model: {args.output}/""" + (f"""
+   - Hub: https://huggingface.co/{args.repo}""" if args.push else "") + f"""
 
-# Login to Hugging Face
-hf_token = os.getenv('HF_TOKEN')
-if hf_token:
-    login(token=hf_token)
-    print("✅ Logged in with HF_TOKEN")
-else:
-    raise ValueError("❌ No HF_TOKEN found! Set it with: export HF_TOKEN=your_token")
-
-# Step 1: Load the adapter config to find the base model
-print("📂 Loading adapter config...")
-peft_config = PeftConfig.from_pretrained(CHECKPOINT_PATH)
-base_model_name = peft_config.base_model_name_or_path
-print(f"   Base model: {base_model_name}")
-
-# Step 2: Load the base model in float16 (no 4-bit quantization to avoid bitsandbytes)
-print("🔧 Loading base model in float16 (this may take ~6GB VRAM)...")
-# For Mistral3 models, we need to use AutoModel since it's a conditional generation model
-from transformers import AutoModel, AutoTokenizer
-
-model = AutoModel.from_pretrained(
-    base_model_name,
-    torch_dtype=torch.float16,
-    device_map="auto",
-    trust_remote_code=True,
-)
-
-# Step 3: Load tokenizer
-print("📝 Loading tokenizer...")
-tokenizer = AutoTokenizer.from_pretrained(base_model_name, trust_remote_code=True)
-
-# Step 4: Apply the adapter
-print("🔗 Applying LoRA adapter...")
-model = PeftModel.from_pretrained(model, CHECKPOINT_PATH)
-
-# Step 5: Merge adapter weights into the base model
-print("🔀 Merging adapter into base model...")
-model = model.merge_and_unload()
-
-# Step 6: Save locally first (for GGUF conversion)
-local_path = "merged_model"
-print(f"💾 Saving merged model locally to {local_path}...")
-model.save_pretrained(local_path)
-tokenizer.save_pretrained(local_path)
-
-# Step 7: Push to Hub
-print(f"🚀 Pushing to {REPO_NAME}...")
-model.push_to_hub(REPO_NAME, token=hf_token)
-tokenizer.push_to_hub(REPO_NAME, token=hf_token)
-
-print(f"""
-✅ Done! 
-   - Local merged model: {local_path}/
-   - Hub: https://huggingface.co/{REPO_NAME}
-   
 🔧 To convert to GGUF, run:
-   python -m llama_cpp.convert {local_path} --outfile model.gguf
+   python -m llama_cpp.convert {args.output} --outfile model.gguf
 """)
+
+
+if __name__ == "__main__":
+    main()
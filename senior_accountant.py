@@ -1,19 +1,24 @@
 import os
-import json
-import requests
 from tqdm import tqdm
 import re
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-import vertexai
-from vertexai.generative_models import GenerativeModel, SafetySetting
-import anthropic
+import telemetry
+from endpoint_pool import get_llm_pool
+from task_store import load_tasks
+import artefact_io
+from artefact_store import maybe_ingest
 
 load_dotenv()
 
 # ================= CONFIGURATION =================
 INPUT_FILE = "training_data.json"   # The file from your Junior Agent
 OUTPUT_FILE = "final_train.json"   # The file for Label Studio
-LLM_API_URL = "http://localhost:1234/v1/chat/completions"
+LLM_API_URL = os.getenv("LLM_API_URL", "http://localhost:1234/v1/chat/completions")
+# Several inference boxes (comma-separated URLs): requests are balanced across them and fail over
+LLM_API_URLS = [u.strip() for u in os.getenv("LLM_API_URLS", "").split(",") if u.strip()]
+CONCURRENCY = int(os.getenv("SENIOR_CONCURRENCY", "1"))  # Reviews in flight at once
 # Ideally use Qwen-2.5-Coder-7B-Instruct or similar strict model here
 MODEL_NAME = "local-model" 
 PROVIDER = os.getenv("SENIOR_ACCOUNTANT_PROVIDER", "lm-studio")
@@ -21,10 +26,22 @@ PROJECT_ID = "persona-forge-470514" # Extracted from key filename implication, b
 LOCATION = "us-central1"
 ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY")
 
+# Cascade: junior predictions scoring at least this confidence skip the senior review.
+# Pick it from `python -m benchmarks.calibrate_confidence`; unset = review everything.
+# Scores made without logprobs (score_mode "retrieval") are on another scale and need their
+# own threshold; predictions without a score_mode are always reviewed.
+CONFIDENCE_THRESHOLD = float(os.environ["SENIOR_CONFIDENCE_THRESHOLD"]) if os.getenv("SENIOR_CONFIDENCE_THRESHOLD") else None
+RETRIEVAL_CONFIDENCE_THRESHOLD = (float(os.environ["SENIOR_RETRIEVAL_CONFIDENCE_THRESHOLD"])
+                                  if os.getenv("SENIOR_RETRIEVAL_CONFIDENCE_THRESHOLD") else None)
+THRESHOLDS = {"blended": CONFIDENCE_THRESHOLD, "retrieval": RETRIEVAL_CONFIDENCE_THRESHOLD}
+
+# Cloud SDKs are imported lazily so the LM Studio path (and benchmarks) run without them
 def init_google():
+    import vertexai
     vertexai.init(location=LOCATION)
 
 def call_google_gemini(system_instruction, prompt):
+    from vertexai.generative_models import GenerativeModel, SafetySetting
     model = GenerativeModel(
         "gemini-2.5-pro",
         system_instruction=[system_instruction]
@@ -55,9 +72,13 @@ def call_google_gemini(system_instruction, prompt):
         ],
         stream=False,
     )
+    usage = getattr(responses, "usage_metadata", None)
+    if usage is not None:
+        telemetry.annotate(prompt_tokens=usage.prompt_token_count, completion_tokens=usage.candidates_token_count)
     return responses.text 
 
 def call_anthropic_claude(system_instruction, prompt):
+    import anthropic
     client = anthropic.Anthropic(api_key=ANTHROPIC_API_KEY)
     message = client.messages.create(
         model="claude-sonnet-4-20250514",
@@ -67,6 +88,7 @@ def call_anthropic_claude(system_instruction, prompt):
             {"role": "user", "content": prompt}
         ]
     )
+    telemetry.annotate(prompt_tokens=message.usage.input_tokens, completion_tokens=message.usage.output_tokens)
     return message.content[0].text
 
 # ================= SENIOR ACCOUNTANT LOGIC =================
@@ -74,6 +96,10 @@ def critique_and_fix(prompt, junior_xml):
     """
     Asks the Senior Model to review and fix the Junior's work.
     """
+    with telemetry.span("senior_review", provider=PROVIDER):
+        return _critique_and_fix(prompt, junior_xml)
+
+def _critique_and_fix(prompt, junior_xml):
     review_prompt = f"""You are a Senior Accounting Auditor. 
 Your job is to review the work of a Junior Accountant. The Junior AI Accountant will be trained on the output of the data you have checked and adjusted.
 
@@ -104,6 +130,7 @@ Output the FINAL CORRECTED XML block (starting with <accounting_entry>).
             return call_google_gemini(system_msg, review_prompt)
         except Exception as e:
             print(f"Google Error: {e}")
+            telemetry.incr("llm_errors", provider=PROVIDER)
             return junior_xml
 
     if PROVIDER == "anthropic":
@@ -111,6 +138,7 @@ Output the FINAL CORRECTED XML block (starting with <accounting_entry>).
             return call_anthropic_claude(system_msg, review_prompt)
         except Exception as e:
             print(f"Anthropic Error: {e}")
+            telemetry.incr("llm_errors", provider=PROVIDER)
             return junior_xml
 
     # Fallback / Default to LM Studio
@@ -125,15 +153,68 @@ Output the FINAL CORRECTED XML block (starting with <accounting_entry>).
             "max_tokens": 2000
         }
         
-        response = requests.post(LLM_API_URL, json=payload, headers={"Content-Type": "application/json"})
-        response.raise_for_status()
-        return response.json()['choices'][0]['message']['content']
+        with telemetry.span("http_request"):
+            body = get_llm_pool(LLM_API_URLS or [LLM_API_URL]).post(payload)
+        usage = body.get('usage') or {}
+        telemetry.annotate(prompt_tokens=usage.get('prompt_tokens'), completion_tokens=usage.get('completion_tokens'))
+        return body['choices'][0]['message']['content']
     except Exception as e:
         print(f"LM Studio Error: {e}")
+        telemetry.incr("llm_errors", provider=PROVIDER)
         return junior_xml # Fallback to original if review fails
 
 # ================= MAIN LOOP =================
-def run_audit():
+def review_task(task):
+    """
+    Senior pass over one junior task. Returns (Label Studio task with the annotation,
+    auto_accepted), or None if the task has no prediction.
+    """
+    # 1. Extract what the Junior did
+    # The Junior output is inside 'predictions'
+    try:
+        junior_output = task['predictions'][0]['result'][0]['value']['text'][0]
+        original_prompt = task['data']['prompt']
+    except (KeyError, IndexError):
+        print(f"Skipping task {task.get('id', 'unknown')} - missing predictions.")
+        return None
+
+    # 2. The Senior Review (The "Thinking" Step), unless the junior was confident enough
+    score = task['predictions'][0].get('score')
+    threshold = THRESHOLDS.get(task['predictions'][0].get('score_mode'))
+    auto_accepted = threshold is not None and score is not None and score >= threshold
+    if auto_accepted:
+        senior_output = junior_output
+        model_version = "Junior-Auto-Accepted"
+        telemetry.incr("senior_skipped", score_mode=task['predictions'][0].get('score_mode'))
+    else:
+        senior_output = critique_and_fix(original_prompt, junior_output)
+        model_version = "Senior-Auditor-Auto-Review"
+    
+    # 3. Clean up (Remove Markdown if Senior added it)
+    # This removes ```xml and ``` wrappers
+    senior_output = senior_output.replace("```xml", "").replace("```", "").strip()
+    
+    # 4. Create the Label Studio Structure
+    # We create a new task object where the 'result' is inside 'annotations'
+    
+    # Copy the structure of the prediction result...
+    annotation_result = task['predictions'][0]['result']
+    # ...but update the text value with the Senior's output
+    annotation_result[0]['value']['text'] = [senior_output]
+
+    task_with_annotation = {
+        "data": task['data'],
+        "annotations": [{
+            "result": annotation_result,
+            "was_cancelled": False,
+            "ground_truth": False,
+            "model_version": model_version
+        }]
+        # Note: We do NOT include 'predictions' here, so Label Studio treats it as a draft
+    }
+    return task_with_annotation, auto_accepted
+
+def run_audit(input_file=INPUT_FILE, output_file=OUTPUT_FILE):
     if PROVIDER == "google":
         init_google()
         print("Using Google Vertex AI Provider")
@@ -142,55 +223,40 @@ def run_audit():
     else:
         print("Using LM Studio Provider")
 
-    with open(INPUT_FILE, 'r') as f:
-        data = json.load(f)
+    # Plain or compact (task_store.py) junior output
+    data = load_tasks(input_file)
     
     print(f"🧐 Senior Accountant starting audit on {len(data)} records...")
+    for mode, threshold in THRESHOLDS.items():
+        if threshold is not None:
+            print(f"🎯 Only reviewing {mode}-scored junior predictions with confidence below {threshold}")
     
     refined_data = []
+    accepted = defaultdict(int)  # score_mode -> auto-accepted rows
     
-    for task in tqdm(data):
-        # 1. Extract what the Junior did
-        # The Junior output is inside 'predictions'
-        try:
-            junior_output = task['predictions'][0]['result'][0]['value']['text'][0]
-            original_prompt = task['data']['prompt']
-        except (KeyError, IndexError):
-            print(f"Skipping task {task.get('id', 'unknown')} - missing predictions.")
-            continue
+    if CONCURRENCY > 1 and PROVIDER == "lm-studio":
+        # Reviews go out CONCURRENCY at a time, spread over LLM_API_URLS; map() keeps the order
+        with ThreadPoolExecutor(max_workers=CONCURRENCY) as executor:
+            reviewed = list(tqdm(executor.map(review_task, data), total=len(data)))
+    else:
+        reviewed = [review_task(task) for task in tqdm(data)]
 
-        # 2. The Senior Review (The "Thinking" Step)
-        senior_output = critique_and_fix(original_prompt, junior_output)
-        
-        # 3. Clean up (Remove Markdown if Senior added it)
-        # This removes ```xml and ``` wrappers
-        senior_output = senior_output.replace("```xml", "").replace("```", "").strip()
-        
-        # 4. Create the Label Studio Structure
-        # We create a new task object where the 'result' is inside 'annotations'
-        
-        # Copy the structure of the prediction result...
-        annotation_result = task['predictions'][0]['result']
-        # ...but update the text value with the Senior's output
-        annotation_result[0]['value']['text'] = [senior_output]
-
-        task_with_annotation = {
-            "data": task['data'],
-            "annotations": [{
-                "result": annotation_result,
-                "was_cancelled": False,
-                "ground_truth": False,
-                "model_version": "Senior-Auditor-Auto-Review"
-            }]
-            # Note: We do NOT include 'predictions' here, so Label Studio treats it as a draft
-        }
-        
+    for task, outcome in zip(data, reviewed):
+        if outcome is None:
+            continue
+        task_with_annotation, auto_accepted = outcome
         refined_data.append(task_with_annotation)
+        if auto_accepted:
+            accepted[task['predictions'][0].get('score_mode')] += 1
         
     # Save
-    with open(OUTPUT_FILE, 'w') as f:
-        json.dump(refined_data, f, indent=2)
-    print(f"✅ Audit complete. Import '{OUTPUT_FILE}' into Label Studio.")
+    artefact_io.save(refined_data, output_file)
+    maybe_ingest(refined_data, output_file)  # Only when ARTEFACT_DB is set
+    if accepted:
+        print(f"⏭️ {sum(accepted.values())} confident junior predictions accepted without review "
+              f"({100 * sum(accepted.values()) / max(len(refined_data), 1):.1f}% of senior calls saved; "
+              + ", ".join(f"{n} {mode}" for mode, n in sorted(accepted.items())) + ")")
+    print(f"✅ Audit complete. Import '{output_file}' into Label Studio.")
 
 if __name__ == "__main__":
     run_audit()
\ No newline at end of file
@@ -0,0 +1,171 @@
+"""
+Template-deduplicated storage for pipeline tasks (junior/senior Label Studio files and
+flat training pairs).
+
+Every task carries the full ~1k-token junior prompt, nearly all of it the same
+boilerplate. A compact file keeps each distinct prompt template once and, per task,
+only the template id plus the variables (context, date, payee, description, amount,
+currency, source account):
+
+    {"format": "templated-tasks/1",
+     "templates": {"3f2a...": "You are an expert accountant... {{context}} ... Date: {{date}} ..."},
+     "tasks": [{"data": {"prompt_ref": {"template": "3f2a...", "vars": {...}}, ...}, ...}]}
+
+Templates are recovered from the prompts themselves, so files written by older
+versions of render_prompt compact too. A prompt that doesn't round-trip exactly is
+kept verbatim. Full prompts are only rebuilt when tasks are read (iter_tasks is lazy),
+e.g. for a Label Studio import or training:
+
+    python task_store.py pack data/json/training_data.json data/json/training_data.tasks.json.zst
+    python task_store.py unpack data/json/training_data.tasks.json label_studio_import.json
+
+Unpacking to plain .json writes the same bytes as json.dump(indent=2) of the original tasks.
+"""
+import argparse
+import hashlib
+import re
+
+import artefact_io
+
+# ================= CONFIGURATION =================
+STORE_FORMAT = "templated-tasks/1"
+CONTEXT_RE = re.compile(r"<context>\n[ \t]*(.*?)\n[ \t]*</context>", re.DOTALL)
+# Transaction block fields, in prompt order (each replaced once, after the context)
+FIELD_RES = [
+    ("date", re.compile(r"(Date: )(.*)")),
+    ("payee", re.compile(r"(Payee: )(.*)")),
+    ("desc", re.compile(r"(Description: )(.*)")),
+    ("amount", re.compile(r"(Amount: )(\S+)(?= )")),
+    ("currency", re.compile(r"(Amount: \{\{amount\}\} )(\S+)")),
+    ("source_account", re.compile(r"(Source Account: )(.*)")),
+]
+SLOT_RE = re.compile(r"\{\{(\w+)\}\}")
+
+
+def slot(name):
+    return "{{" + name + "}}"
+
+
+def fill(template, values):
+    """A full prompt from a template and its variables."""
+    return SLOT_RE.sub(lambda m: values[m.group(1)], template)
+
+
+def split_prompt(prompt):
+    """(template, variables) for a junior prompt, or None if it doesn't round-trip exactly."""
+    match = CONTEXT_RE.search(prompt)
+    if not match or SLOT_RE.search(prompt):
+        return None
+    values = {"context": match.group(1)}
+    tail = prompt[match.end(1):]
+    for name, regex in FIELD_RES:
+        found = regex.search(tail)
+        if not found:
+            return None
+        values[name] = found.group(2)
+        tail = tail[:found.start(2)] + slot(name) + tail[found.end(2):]
+
+    # The source account and currency are repeated in the instructions and the example entry
+    if values["source_account"]:
+        tail = tail.replace(values["source_account"], slot("source_account"))
+    if values["currency"]:
+        tail = tail.replace(f" {values['currency']}\n", f" {slot('currency')}\n")
+
+    template = prompt[:match.start(1)] + slot("context") + tail
+    if fill(template, values) != prompt:
+        return None
+    return template, values
+
+
+def template_id(template):
+    return hashlib.sha1(template.encode("utf-8")).hexdigest()[:12]
+
+
+def _prompt_holder(task):
+    """The dict holding the prompt: task['data'] for Label Studio tasks, the task itself for flat pairs."""
+    return task["data"] if isinstance(task.get("data"), dict) else task
+
+
+def compact_tasks(tasks):
+    """The compact store for a list of tasks (the tasks themselves are not modified)."""
+    templates, compacted = {}, []
+    for task in tasks:
+        holder = _prompt_holder(task)
+        split = split_prompt(holder["prompt"]) if isinstance(holder.get("prompt"), str) else None
+        if split is None:
+            compacted.append(task)
+            continue
+        template, values = split
+        tid = template_id(template)
+        templates.setdefault(tid, template)
+        # prompt_ref takes the prompt's place, so unpacking restores the original key order
+        ref = {}
+        for key, value in holder.items():
+            if key == "prompt":
+                ref["prompt_ref"] = {"template": tid, "vars": values}
+            else:
+                ref[key] = value
+        compacted.append({**task, "data": ref} if holder is not task else ref)
+    return {"format": STORE_FORMAT, "templates": templates, "tasks": compacted}
+
+
+def materialise(task, templates):
+    """A task with its full prompt rebuilt (tasks stored verbatim are returned as they are)."""
+    holder = _prompt_holder(task)
+    ref = holder.get("prompt_ref")
+    if ref is None:
+        return task
+    prompt = fill(templates[ref["template"]], ref["vars"])
+    restored = {("prompt" if key == "prompt_ref" else key): (prompt if key == "prompt_ref" else value)
+                for key, value in holder.items()}
+    return {**task, "data": restored} if holder is not task else restored
+
+
+def is_compact(store):
+    return isinstance(store, dict) and store.get("format") == STORE_FORMAT
+
+
+def iter_tasks(store):
+    """Full tasks, one at a time, from a compact store or a plain task list."""
+    if not is_compact(store):
+        yield from store
+        return
+    templates = store["templates"]
+    for task in store["tasks"]:
+        yield materialise(task, templates)
+
+
+def load_tasks(filename):
+    """All tasks of a compact or plain task file (any artefact_io format), with full prompts."""
+    return list(iter_tasks(artefact_io.load(filename)))
+
+
+def save_tasks(tasks, filename, compact=True):
+    if compact:
+        artefact_io.save(compact_tasks(tasks), filename, indent=0)
+    else:
+        artefact_io.save(tasks, filename)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pack/unpack template-deduplicated task files')
+    parser.add_argument('command', choices=['pack', 'unpack'])
+    parser.add_argument('input')
+    parser.add_argument('output')
+    args = parser.parse_args()
+
+    tasks = load_tasks(args.input)
+    if args.command == 'unpack':
+        save_tasks(tasks, args.output, compact=False)
+        print(f"📤 Unpacked {len(tasks)} tasks -> {args.output}")
+        return
+
+    store = compact_tasks(tasks)
+    artefact_io.save(store, args.output, indent=0)
+    verbatim = sum('prompt' in _prompt_holder(t) for t in store['tasks'])
+    print(f"📦 Packed {len(tasks)} tasks into {len(store['templates'])} templates "
+          f"({verbatim} prompts kept verbatim) -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""
+Lightweight pipeline instrumentation: timed spans, token counts and counters.
+
+Disabled by default, in which case span() hands back a shared no-op object and
+the cost is one global lookup per call. Turn it on with either:
+
+    PIPELINE_METRICS=metrics.jsonl      # one JSON line per finished span / counter bump
+    PIPELINE_METRICS_PORT=9108          # Prometheus text format on http://localhost:9108/metrics
+    TELEMETRY_PROMETHEUS_HOST=0.0.0.0   # ...to let another box scrape it (default: localhost only)
+
+Usage:
+    with telemetry.span("llm_call", provider="lm-studio"):
+        ...
+        telemetry.annotate(prompt_tokens=812, completion_tokens=240)
+    telemetry.incr("cache_hits", cache="llama_cpp_prefix")
+
+Counters in use: cache_hits / cache_misses (cache=llama_cpp_prefix, eval_generations,
+tokenized_dataset), llm_retries, llm_errors, context_trimmed, prompt_over_budget, senior_skipped.
+"""
+import atexit
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Interface the Prometheus endpoint binds: localhost unless asked otherwise, as the metrics
+# describe the pipeline's workload (span names, providers, error and cache counts)
+PROMETHEUS_HOST = os.getenv("TELEMETRY_PROMETHEUS_HOST", "127.0.0.1")
+
+# Span durations are bucketed (seconds) for the Prometheus histogram
+BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Numeric span attributes that are also summed into counters
+TOKEN_ATTRS = ("prompt_tokens", "completion_tokens")
+
+_enabled = False
+_sink = None
+_sink_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_local = threading.local()
+_server = None
+
+_span_count = defaultdict(int)
+_span_sum = defaultdict(float)
+_span_buckets = defaultdict(lambda: [0] * len(BUCKETS))
+_counters = defaultdict(float)
+
+
+class _NoopSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+class Span:
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+        self.parent = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        stack = _stack()
+        self.parent = stack[-1].name if stack else None
+        stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self.start
+        _stack().pop()
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        _record_span(self, duration)
+        return False
+
+
+def _stack():
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+def enabled():
+    return _enabled
+
+
+def span(name, **attrs):
+    """Times a block of work. Returns a no-op when telemetry is off."""
+    if not _enabled:
+        return _NOOP
+    return Span(name, attrs)
+
+
+def annotate(**attrs):
+    """Adds attributes (e.g. token counts) to the innermost open span on this thread."""
+    if not _enabled:
+        return
+    stack = _stack()
+    if stack:
+        stack[-1].set(**attrs)
+
+
+def incr(name, value=1, **labels):
+    """Bumps a counter such as cache_hits, retries or llm_errors."""
+    if not _enabled:
+        return
+    key = (name, tuple(sorted(labels.items())))
+    with _stats_lock:
+        _counters[key] += value
+    _write({"type": "counter", "name": name, "value": value, "labels": labels, "ts": time.time()})
+
+
+def _record_span(s, duration):
+    with _stats_lock:
+        _span_count[s.name] += 1
+        _span_sum[s.name] += duration
+        buckets = _span_buckets[s.name]
+        for i, bound in enumerate(BUCKETS):
+            if duration <= bound:
+                buckets[i] += 1
+        for attr in TOKEN_ATTRS:
+            if isinstance(s.attrs.get(attr), (int, float)):
+                _counters[(attr, (("span", s.name),))] += s.attrs[attr]
+    _write({"type": "span", "name": s.name, "parent": s.parent, "duration_ms": round(duration * 1000, 3),
+            "attrs": s.attrs, "ts": time.time(), "thread": threading.get_ident()})
+
+
+def _write(record):
+    if _sink is None:
+        return
+    line = json.dumps(record, default=str)
+    with _sink_lock:
+        if _sink is not None:
+            _sink.write(line + "\n")
+
+
+def _label(value):
+    """A label value escaped for the exposition format (backslash, quote, newline)."""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def prometheus_text():
+    """Renders span histograms and counters in the Prometheus exposition format."""
+    lines = ["# TYPE pipeline_span_seconds histogram"]
+    with _stats_lock:
+        for name in sorted(_span_count):
+            # _record_span bumps every bucket the duration fits in, so counts are already cumulative
+            for bound, count in zip(BUCKETS, _span_buckets[name]):
+                lines.append(f'pipeline_span_seconds_bucket{{span="{_label(name)}",le="{bound}"}} {count}')
+            lines.append(f'pipeline_span_seconds_bucket{{span="{_label(name)}",le="+Inf"}} {_span_count[name]}')
+            lines.append(f'pipeline_span_seconds_sum{{span="{_label(name)}"}} {_span_sum[name]:.6f}')
+            lines.append(f'pipeline_span_seconds_count{{span="{_label(name)}"}} {_span_count[name]}')
+        lines.append("# TYPE pipeline_events_total counter")
+        for (name, labels), value in sorted(_counters.items()):
+            label_str = ",".join([f'name="{_label(name)}"'] + [f'{k}="{_label(v)}"' for k, v in labels])
+            lines.append(f"pipeline_events_total{{{label_str}}} {value:g}")
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.rstrip("/") != "/metrics":
+            self.send_response(404)
+            self.end_headers()
+            return
+        body = prometheus_text().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def configure(jsonl_path=None, prometheus_port=None, prometheus_host=PROMETHEUS_HOST):
+    """Enables telemetry. Either sink is optional; with neither, stats are kept in memory only."""
+    global _enabled, _sink, _server
+    if jsonl_path and _sink is None:
+        _sink = open(jsonl_path, "a", buffering=1024 * 64)
+        atexit.register(shutdown)
+    if prometheus_port and _server is None:
+        _server = ThreadingHTTPServer((prometheus_host, int(prometheus_port)), _MetricsHandler)
+        _server.daemon_threads = True
+        threading.Thread(target=_server.serve_forever, daemon=True).start()
+        print(f"📈 Metrics at http://{prometheus_host}:{prometheus_port}/metrics")
+    _enabled = True
+
+
+def shutdown():
+    """Flushes the JSONL sink and stops the metrics endpoint."""
+    global _enabled, _sink, _server
+    with _sink_lock:
+        if _sink is not None:
+            _sink.close()
+            _sink = None
+    if _server is not None:
+        _server.shutdown()
+        _server = None
+    _enabled = False
+
+
+if os.getenv("PIPELINE_METRICS") or os.getenv("PIPELINE_METRICS_PORT"):
+    configure(os.getenv("PIPELINE_METRICS"), os.getenv("PIPELINE_METRICS_PORT"))